@@ -1,5 +1,65 @@
+import hashlib
+import re
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+
+# --- IMPORTS ---
+try: import zip_index
+except ImportError: zip_index = None
+
+# --- USPS PUBLICATION 28 ABBREVIATIONS (common subset) ---
+STREET_SUFFIXES = {
+    "ALLEY": "ALY", "AVENUE": "AVE", "AV": "AVE", "AVEN": "AVE", "BOULEVARD": "BLVD", "BOUL": "BLVD", "BRIDGE": "BRG",
+    "CENTER": "CTR", "CENTRE": "CTR", "CIRCLE": "CIR", "CIRC": "CIR", "COURT": "CT", "COVE": "CV", "CREEK": "CRK",
+    "CRESCENT": "CRES", "CROSSING": "XING", "DRIVE": "DR", "DRV": "DR", "EXPRESSWAY": "EXPY", "EXTENSION": "EXT",
+    "FREEWAY": "FWY", "GARDENS": "GDNS", "GROVE": "GRV", "HEIGHTS": "HTS", "HIGHWAY": "HWY", "HIWAY": "HWY",
+    "HILL": "HL", "HOLLOW": "HOLW", "ISLAND": "IS", "JUNCTION": "JCT", "LAKE": "LK", "LANDING": "LNDG", "LANE": "LN",
+    "LOOP": "LOOP", "MANOR": "MNR", "MEADOWS": "MDWS", "MOUNT": "MT", "MOUNTAIN": "MTN", "PARKWAY": "PKWY",
+    "PKY": "PKWY", "PLACE": "PL", "PLAZA": "PLZ", "POINT": "PT", "RIDGE": "RDG", "ROAD": "RD", "ROUTE": "RTE",
+    "SQUARE": "SQ", "STATION": "STA", "STREET": "ST", "STR": "ST", "SUMMIT": "SMT", "TERRACE": "TER", "TRAIL": "TRL",
+    "TRACE": "TRCE", "TURNPIKE": "TPKE", "VALLEY": "VLY", "VIEW": "VW", "VILLAGE": "VLG", "VISTA": "VIS", "WAY": "WAY",
+}
+DIRECTIONALS = {
+    "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+    "NORTHEAST": "NE", "NORTHWEST": "NW", "SOUTHEAST": "SE", "SOUTHWEST": "SW",
+}
+UNIT_DESIGNATORS = {
+    "APARTMENT": "APT", "BUILDING": "BLDG", "DEPARTMENT": "DEPT", "FLOOR": "FL", "ROOM": "RM", "SUITE": "STE", "UNIT": "UNIT",
+}
+ABBREVIATIONS = {**STREET_SUFFIXES, **DIRECTIONALS, **UNIT_DESIGNATORS}
+_ABBREVIATION_RE = re.compile(r"\b(" + "|".join(sorted(ABBREVIATIONS, key=len, reverse=True)) + r")\b")
+_NON_ALNUM_RE = r"[^A-Z0-9]+"
+_ZIP_RE = r"^\s*(\d{3,5})(?:\s*-?\s*\d{4})?\s*$"
+
+_LOCALITY_ZIP_RE = re.compile(r"[\s,]*\b(\d{5})(?:\s*-\s*(\d{4})|(\d{4}))?\s*$")
+_STREET_START_RE = re.compile(r"^\s*(\d|P\.?\s*O\.?\s*BOX\b|POST OFFICE BOX\b|(?:RR|HC|RURAL ROUTE)\s*\d)", re.IGNORECASE)
+_UNIT_START_RE = re.compile(r"^\s*(#|(" + "|".join(list(UNIT_DESIGNATORS) + list(UNIT_DESIGNATORS.values())) + r")\b)", re.IGNORECASE)
+_COUNTRY_LINES = {"US", "USA", "U S A", "UNITED STATES", "UNITED STATES OF AMERICA"}
+
+def _abbreviate(match):
+    return ABBREVIATIONS[match.group(1)]
+
+def normalize_text(value) -> str:
+    """Upper case, punctuation and runs of whitespace -> one space."""
+    return re.sub(_NON_ALNUM_RE, " ", str(value or "").upper()).strip()
+
+def normalize_street(value) -> str:
+    """normalize_text plus USPS suffix / directional / unit abbreviations ("12 Elm Street" -> "12 ELM ST")."""
+    return _ABBREVIATION_RE.sub(_abbreviate, normalize_text(value))
+
+def zip5(value) -> str:
+    """5-digit ZIP: ZIP+4 dropped, leading zeros restored ("2101" -> "02101")."""
+    text = str(value or "")
+    match = re.match(_ZIP_RE, text)
+    if match: return match.group(1).zfill(5)
+    return re.sub(r"[^0-9]", "", text)[:5]
+
+def _hash(text) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+def recipient_key(name, fingerprint) -> str:
+    """Dedupe key for one mail piece: normalized recipient name + address fingerprint."""
+    return _hash(f"{normalize_text(name)}|{fingerprint}")
 
 @dataclass
 class StandardAddress:
@@ -22,6 +82,20 @@ class StandardAddress:
             'country_code': self.country
         }
     
+    def canonical(self) -> str:
+        """The mailing part (no name) in USPS-normalized form, fields joined by '|'."""
+        return "|".join([
+            normalize_street(self.street), normalize_street(self.address_line2), normalize_text(self.city),
+            normalize_text(self.state), zip5(self.zip_code), normalize_text(self.country or "US")
+        ])
+
+    def fingerprint(self) -> str:
+        """
+        Stable hash of canonical(): "12 Elm St." / "12 ELM STREET" /
+        ZIP 78701-1234 all share one fingerprint.
+        """
+        return _hash(self.canonical())
+
     def to_pdf_string(self) -> str:
         lines = [self.name, self.street]
         if self.address_line2: lines.append(self.address_line2)
@@ -52,7 +126,7 @@ class StandardAddress:
         
         city = data.get('city') or data.get('address_city') or ""
         state = data.get('state') or data.get('provinceOrState') or data.get('address_state') or ""
-        zip_code = data.get('zip') or data.get('postalOrZip') or data.get('address_zip') or ""
+        zip_code = data.get('zip') or data.get('zip_code') or data.get('postalOrZip') or data.get('address_zip') or ""
         country = data.get('country') or data.get('country_code') or "US"
 
         return cls(
@@ -63,4 +137,147 @@ class StandardAddress:
             state=state,
             zip_code=zip_code,
             country=country
-        )
\ No newline at end of file
+        )
+
+    @classmethod
+    def from_text(cls, raw_text: str) -> 'StandardAddress':
+        """
+        Parses a pasted address block offline: "Name / street / [unit] /
+        City, ST 12345[-6789]" on separate lines, or the same parts on one
+        line separated by commas. The state may be spelled out; a missing
+        city is filled from the ZIP index when it has one.
+        """
+        lines = [p.strip(" ,") for p in re.split(r"[\r\n]+", str(raw_text or "")) if p.strip(" ,")]
+        if len(lines) == 1: lines = [p.strip() for p in lines[0].split(",") if p.strip()]
+        if lines and normalize_text(lines[-1]) in _COUNTRY_LINES: lines.pop()
+
+        city, state, zip_code = _parse_locality(lines[-1]) if lines else ("", "", "")
+        if state or zip_code:
+            lines.pop()
+            # "12 Elm St, Austin, TX 78701" split on commas puts the city on its own line
+            if not city and len(lines) >= 2 and not _STREET_START_RE.match(lines[-1]) and not _UNIT_START_RE.match(lines[-1]):
+                city = lines.pop()
+
+        street_at = next((i for i, line in enumerate(lines) if _STREET_START_RE.match(line)), None)
+        if street_at is None: street_at = 1 if len(lines) >= 2 else len(lines)
+        name_lines, rest = lines[:street_at], lines[street_at:]
+        street = rest[0] if rest else ""
+        line2 = " ".join(rest[1:])
+
+        if zip_index and zip_code and not city:
+            info = zip_index.lookup(zip5(zip_code))
+            if info and info["city"]: city = info["city"].title()
+        return cls(name=", ".join(name_lines), street=street, address_line2=line2, city=city, state=state, zip_code=zip_code)
+
+def _parse_locality(line):
+    """"Austin, TX 78701-1234" -> ("Austin", "TX", "78701-1234"); ("", "", "") if the line isn't one."""
+    zip_code = ""
+    match = _LOCALITY_ZIP_RE.search(line)
+    if match:
+        plus4 = match.group(2) or match.group(3)
+        zip_code = match.group(1) + (f"-{plus4}" if plus4 else "")
+        line = line[:match.start()]
+    words = line.replace(",", " , ").split()
+    # Longest state name first ("West Virginia" before "Virginia")
+    for size in (4, 3, 2, 1):
+        if len(words) < size or "," in words[-size:]: continue
+        code = _state_code(" ".join(words[-size:]))
+        if code:
+            return " ".join(words[:-size]).strip(" ,"), code, zip_code
+    if zip_code: return line.strip(" ,"), "", zip_code
+    return "", "", ""
+
+def _state_code(value):
+    if zip_index: return zip_index.state_code(value)
+    value = normalize_text(value)
+    return value if len(value) == 2 else ""
+
+def zip_verdict(zip_code, state) -> Tuple[Optional[str], bool]:
+    """
+    ("Unknown ZIP" / "ZIP/State mismatch" / None, confirmed) for a ZIP and
+    state code. confirmed is False when only the ZIP3 table backs the verdict.
+    """
+    if not zip_index: return None, False
+    info = zip_index.lookup(zip5(zip_code))
+    if not info: return "Unknown ZIP", zip_index.has_full_index()
+    if state and state not in info["states"]: return "ZIP/State mismatch", info["confirmed"]
+    return None, info["confirmed"]
+
+def zip_warning(data) -> Optional[str]:
+    """
+    The ZIP check check_address lets through: "Unknown ZIP" / "ZIP/State
+    mismatch" from the ZIP3 table alone, worth showing but left to PostGrid.
+    """
+    addr = data if isinstance(data, StandardAddress) else StandardAddress.from_dict(data)
+    match = re.match(_ZIP_RE, str(addr.zip_code or ""))
+    if normalize_text(addr.country or "US") not in _COUNTRY_LINES or not match or len(match.group(1)) != 5: return None
+    verdict, confirmed = zip_verdict(addr.zip_code, _state_code(addr.state))
+    return None if confirmed else verdict
+
+def check_address(data) -> Tuple[StandardAddress, Optional[str]]:
+    """
+    Offline sanity check, run before anything is sent to PostGrid: required
+    fields, state, ZIP format, and (with the full ZIP index) ZIP assigned and
+    in that state. Also normalizes the state to its code and fills a blank
+    city/state from the ZIP. Non-US addresses only get the required-field
+    check. ZIP3-only verdicts are not errors, see zip_warning.
+    Returns: (StandardAddress, error or None)
+    """
+    addr = data if isinstance(data, StandardAddress) else StandardAddress.from_dict(data)
+    if not normalize_text(addr.street): return addr, "Missing street"
+    if normalize_text(addr.country or "US") not in _COUNTRY_LINES:
+        if not normalize_text(addr.city): return addr, "Missing city"
+        return addr, None
+
+    match = re.match(_ZIP_RE, str(addr.zip_code or ""))
+    if not match or len(match.group(1)) != 5: return addr, "Invalid ZIP"
+    code = zip5(addr.zip_code)
+    state = _state_code(addr.state) if normalize_text(addr.state) else ""
+    if normalize_text(addr.state) and not state: return addr, "Invalid State"
+
+    verdict, confirmed = zip_verdict(code, state)
+    if verdict and confirmed: return addr, verdict
+    info = zip_index.lookup(code) if zip_index else None
+    if info and not verdict:
+        state = state or info["state"] or ""
+        if not normalize_text(addr.city) and info["city"]: addr.city = info["city"].title()
+    addr.state = state
+    if not state: return addr, "Missing state"
+    if not normalize_text(addr.city): return addr, "Missing city"
+    return addr, None
+
+# ==========================================
+# 🐼 VECTORIZED (pandas columns)
+# ==========================================
+# Same rules as canonical() / fingerprint() / recipient_key(), applied with
+# column string ops so 100k-row lists normalize in about a second.
+
+def _normalize_column(col):
+    return col.fillna("").astype(str).str.upper().str.replace(_NON_ALNUM_RE, " ", regex=True).str.strip()
+
+def _street_column(col):
+    return _normalize_column(col).str.replace(_ABBREVIATION_RE, _abbreviate, regex=True)
+
+def _zip5_column(col):
+    col = col.fillna("").astype(str)
+    matched = col.str.extract(_ZIP_RE)[0].str.zfill(5)
+    return matched.fillna(col.str.replace(r"[^0-9]", "", regex=True).str[:5])
+
+def fingerprint_columns(df, street="street", line2=None, city="city", state="state", zip_code="zip", country=None) -> List[str]:
+    """StandardAddress.fingerprint() for every row of a DataFrame (column names as given)."""
+    import pandas as pd
+    blank = pd.Series("", index=df.index)
+    canonical = (
+        _street_column(df[street]) + "|" +
+        (_street_column(df[line2]) if line2 else blank) + "|" +
+        _normalize_column(df[city]) + "|" +
+        _normalize_column(df[state]) + "|" +
+        _zip5_column(df[zip_code]) + "|" +
+        (_normalize_column(df[country]).replace("", "US") if country else pd.Series("US", index=df.index))
+    )
+    return [_hash(text) for text in canonical.tolist()]
+
+def recipient_keys(df, fingerprints, name="name") -> List[str]:
+    """recipient_key() for every row, given fingerprint_columns() output."""
+    names = _normalize_column(df[name]).tolist()
+    return [_hash(f"{n}|{fp}") for n, fp in zip(names, fingerprints)]
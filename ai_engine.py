@@ -8,6 +8,8 @@ from datetime import datetime
 # --- IMPORTS ---
 try: import secrets_manager
 except ImportError: secrets_manager = None
+try: import client_registry
+except ImportError: client_registry = None
 
 logger = logging.getLogger(__name__)
 
@@ -19,12 +21,54 @@ def get_secret(key):
     return val
 
 def get_openai_client():
+    # Reuse the process-wide client (and its connection pool) when available
+    if client_registry: return client_registry.get_openai_client()
     api_key = get_secret("openai.api_key")
     if not api_key: 
         logger.warning("⚠️ OpenAI API Key is missing. Transcription will be skipped.")
         return None
     return openai.OpenAI(api_key=api_key)
 
+def get_twilio_client():
+    if client_registry: return client_registry.get_twilio_client()
+    sid = get_secret("twilio.account_sid")
+    token = get_secret("twilio.auth_token")
+    if not sid or not token: return None
+    from twilio.rest import Client
+    return Client(sid, token)
+
+def _http():
+    """Pooled session for Twilio media downloads; falls back to plain requests."""
+    if client_registry:
+        session = client_registry.get_http_session()
+        if session: return session
+    return requests
+
+def _normalize_phone(raw):
+    """
+    Normalizes a phone number to E.164 (the key used by the phone index).
+    10 digits -> +1XXXXXXXXXX, 11 digits must lead with 1, '+' numbers are kept as international.
+    Raises ValueError for anything else.
+    """
+    raw = str(raw or "").strip()
+    digits = "".join(filter(str.isdigit, raw))
+    if raw.startswith("+"):
+        if 8 <= len(digits) <= 15: return f"+{digits}"
+        raise ValueError(f"Invalid international number: {raw}")
+    if len(digits) == 10: return f"+1{digits}"
+    if len(digits) == 11:
+        if not digits.startswith("1"): raise ValueError("11-digit number must start with 1")
+        return f"+{digits}"
+    raise ValueError(f"Invalid phone number: {raw}")
+
+def get_webhook_base_url():
+    """Public URL where webhook_server.py is reachable (e.g. https://hooks.verbapost.com)."""
+    url = get_secret("webhook.base_url")
+    return url.rstrip("/") if url else None
+
+def webhooks_enabled():
+    return bool(get_webhook_base_url())
+
 # ==========================================
 # 📞 B2B TELEPHONY
 # ==========================================
@@ -46,6 +90,18 @@ def trigger_outbound_call(to_phone, advisor_name, firm_name, project_id, questio
 
     safe_advisor = advisor_name or "your financial advisor"
 
+    # Webhook ingestion (webhook_server.py): Twilio pushes call/recording status
+    # instead of the UI polling for it. Omitted when no public URL is configured.
+    webhook_base = get_webhook_base_url()
+    record_callback = ""
+    callback_kwargs = {}
+    if webhook_base:
+        record_callback = f' recordingStatusCallback="{webhook_base}/twilio/recording-status" recordingStatusCallbackEvent="completed"'
+        callback_kwargs = {
+            "status_callback": f"{webhook_base}/twilio/call-status",
+            "status_callback_event": ["completed"]
+        }
+
     twiml = f"""
     <Response>
         <Pause length="1"/>
@@ -65,18 +121,19 @@ def trigger_outbound_call(to_phone, advisor_name, firm_name, project_id, questio
             Please take a moment to think. Then, record your answer after the beep.
         </Say>
         <Pause length="1"/>
-        <Record maxLength="600" finishOnKey="#" playBeep="true" />
+        <Record maxLength="600" finishOnKey="#" playBeep="true"{record_callback} />
         <Say voice="Polly.Joanna-Neural">Thank you. Goodbye.</Say>
     </Response>
     """
 
     try:
-        from twilio.rest import Client
-        client = Client(sid, token)
+        client = get_twilio_client()
+        if not client: return None, "Missing Credentials"
         call = client.calls.create(
             twiml=twiml,
             to=to_phone,
-            from_=from_number
+            from_=from_number,
+            **callback_kwargs
         )
         return call.sid, None
     except Exception as e:
@@ -94,8 +151,8 @@ def find_and_transcribe_recording(call_sid):
     if not sid or not token: return None, None
     
     try:
-        from twilio.rest import Client
-        client = Client(sid, token)
+        client = get_twilio_client()
+        if not client: return None, None
         
         # 1. Fetch Recordings for this Call
         recordings = client.recordings.list(call_sid=call_sid, limit=1)
@@ -108,41 +165,60 @@ def find_and_transcribe_recording(call_sid):
         base_uri = rec.uri.replace(".json", "")
         audio_url = f"https://api.twilio.com{base_uri}.mp3"
         
-        # 2. Download Audio to Temp File
-        response = requests.get(audio_url, auth=(sid, token))
-        
-        transcript_text = "[Audio captured. Transcription unavailable.]"
-
-        if response.status_code == 200:
-            filename = f"temp_{call_sid}.mp3"
-            with open(filename, 'wb') as f:
-                f.write(response.content)
-            
-            # 3. Transcribe (Robust)
-            try:
-                result = transcribe_audio(filename)
-                if result:
-                    transcript_text = result
-            except Exception as e:
-                logger.error(f"Transcription Failed (but audio saved): {e}")
-
-            # 4. Cleanup
-            try:
-                os.remove(filename)
-            except: pass
-            
-            # Return Text (even if placeholder) and the URL
-            return transcript_text, audio_url
+        # 2-4. Download, Transcribe, Cleanup
+        transcript_text = transcribe_recording_url(audio_url, call_sid)
+        if transcript_text is None:
+            return None, None
             
-        return None, None
+        # Return Text (even if placeholder) and the URL
+        return transcript_text, audio_url
 
     except Exception as e:
         logger.error(f"Find/Transcribe Error: {e}")
         return None, None
 
+def transcribe_recording_url(audio_url, call_sid="recording"):
+    """
+    Downloads a Twilio recording (server-side auth) and transcribes it.
+    Shared by the polling path above and the webhook ingest workers.
+    Returns the transcript (or a placeholder if Whisper fails), None if the download failed.
+    """
+    sid = get_secret("twilio.account_sid")
+    token = get_secret("twilio.auth_token")
+    if not sid or not token: return None
+
+    # Download Audio to Temp File
+    response = _http().get(audio_url, auth=(sid, token))
+    
+    transcript_text = "[Audio captured. Transcription unavailable.]"
+
+    if response.status_code != 200:
+        logger.error(f"Recording Download Failed ({response.status_code}) for {call_sid}")
+        return None
+
+    filename = f"temp_{call_sid}.mp3"
+    with open(filename, 'wb') as f:
+        f.write(response.content)
+    
+    # Transcribe (Robust)
+    try:
+        result = transcribe_audio(filename)
+        if result:
+            transcript_text = result
+    except Exception as e:
+        logger.error(f"Transcription Failed (but audio saved): {e}")
+
+    # Cleanup
+    try:
+        os.remove(filename)
+    except: pass
+    
+    return transcript_text
+
 def transcribe_audio(file_path):
     """
     Sends audio file to OpenAI Whisper.
+    Accepts a path or an in-memory file object (with a .name hint like 'story.mp3').
     Returns None if client is missing (handled by caller).
     """
     client = get_openai_client()
@@ -150,8 +226,11 @@ def transcribe_audio(file_path):
         return None # Caller will use fallback text
 
     try:
-        with open(file_path, "rb") as audio_file:
-            transcript = client.audio.transcriptions.create(model="whisper-1", file=audio_file)
+        if hasattr(file_path, "read"):
+            transcript = client.audio.transcriptions.create(model="whisper-1", file=file_path)
+        else:
+            with open(file_path, "rb") as audio_file:
+                transcript = client.audio.transcriptions.create(model="whisper-1", file=audio_file)
         return transcript.text
     except Exception as e:
         logger.error(f"OpenAI API Error: {e}")
@@ -182,8 +261,8 @@ def get_all_twilio_recordings(limit=50):
     if not sid or not token: return []
     
     try:
-        from twilio.rest import Client
-        client = Client(sid, token)
+        client = get_twilio_client()
+        if not client: return []
         recordings = client.recordings.list(limit=limit)
         
         results = []
@@ -221,7 +300,7 @@ def fetch_recording_audio(partial_uri):
     
     try:
         # Perform authenticated request on the SERVER side
-        response = requests.get(url, auth=(sid, token))
+        response = _http().get(url, auth=(sid, token))
         if response.status_code == 200:
             return response.content
     except Exception as e:
@@ -8,13 +8,25 @@ logger = logging.getLogger(__name__)
 try: import secrets_manager
 except ImportError: secrets_manager = None
 
+try: import client_registry
+except ImportError: client_registry = None
+
 # Singleton Client
 _supabase_client = None
 
 def get_client():
     global _supabase_client
     if _supabase_client: return _supabase_client
-    
+
+    # Auth gets its own registry slot: sign-in swaps the session token onto
+    # the client, so it must not be the instance database/storage share.
+    if client_registry:
+        _supabase_client = client_registry.get_client("supabase_auth", _build_client)
+        return _supabase_client
+    _supabase_client = _build_client()
+    return _supabase_client
+
+def _build_client():
     try:
         url = None
         key = None
@@ -28,8 +40,7 @@ def get_client():
             key = st.secrets["supabase"]["key"]
             
         if url and key:
-            _supabase_client = create_client(url, key)
-            return _supabase_client
+            return create_client(url, key)
         return None
     except Exception as e:
         logger.error(f"Supabase Init Error: {e}")
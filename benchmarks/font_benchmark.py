@@ -0,0 +1,74 @@
+"""
+Letters/second with and without the process-wide font cache.
+
+    python benchmarks/font_benchmark.py
+    python benchmarks/font_benchmark.py --letters 100 --words 800 --json font.json
+
+"before" registers TypeRight with pdf.add_font() per document (the old
+path); "after" attaches the cached parse from font_cache. fontTools subset
+logging stays silenced in both runs, so the reported speedup is a lower
+bound on what the old per-letter path cost. render_cache is off, so every
+iteration is a real render (and nothing is written to data/render_cache).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # font paths are repo-relative
+
+import font_cache  # noqa: E402
+import render_cache  # noqa: E402
+import letter_format  # noqa: E402
+import envelope_format  # noqa: E402
+
+WORDS = "my grandfather kept the farm ledger in a tin box by the stove and every spring we counted seed".split()
+TO_ADDR = {"name": "Jane Heir", "address_line1": "12 Elm St", "city": "Austin", "state": "TX", "zip_code": "78701"}
+FROM_ADDR = {"name": "Walter Smith", "address_line1": "9 Oak Ave", "city": "Dallas", "state": "TX", "zip_code": "75201"}
+
+def _body(words):
+    return " ".join(WORDS[i % len(WORDS)] for i in range(words))
+
+def _rate(fn, count):
+    started = time.perf_counter()
+    for _ in range(count): fn()
+    wall = time.perf_counter() - started
+    return {"count": count, "wall_s": round(wall, 3), "per_s": round(count / wall, 2), "mean_ms": round(wall / count * 1000, 1)}
+
+def run(letters=50, words=600):
+    body = _body(words)
+    letter = lambda: letter_format.create_pdf(body, TO_ADDR, FROM_ADDR, "Heritage Wealth", audio_url="1234")
+    envelope = lambda: envelope_format.create_envelope(TO_ADDR, FROM_ADDR)
+
+    results = {"letters": letters, "words": words}
+    render_cache.ENABLED = False
+    for label, enabled in (("before", False), ("after", True)):
+        font_cache.reset()
+        font_cache.CACHE_ENABLED = enabled
+        if enabled: font_cache.warm()
+        results[label] = {"letter": _rate(letter, letters), "envelope": _rate(envelope, letters)}
+    font_cache.CACHE_ENABLED = True
+    render_cache.ENABLED = True
+    results["speedup"] = {k: round(results["after"][k]["per_s"] / results["before"][k]["per_s"], 2) for k in ("letter", "envelope")}
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Letters/second with and without font_cache")
+    parser.add_argument("--letters", type=int, default=50)
+    parser.add_argument("--words", type=int, default=600)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    r = run(args.letters, args.words)
+    print(f"{args.letters} documents, {args.words}-word letters")
+    for kind in ("letter", "envelope"):
+        b, a = r["before"][kind], r["after"][kind]
+        print(f"{kind:9} before {b['per_s']:>7}/s ({b['mean_ms']} ms)   after {a['per_s']:>7}/s ({a['mean_ms']} ms)   x{r['speedup'][kind]}")
+    if args.json:
+        with open(args.json, "w") as f: json.dump(r, f, indent=2)
+    return r
+
+if __name__ == "__main__":
+    main()
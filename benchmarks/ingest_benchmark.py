@@ -0,0 +1,123 @@
+"""
+End-to-end audio ingest benchmark (vault upload || transcription tee,
+re-ingest dedupe, batch signing, streamed reads).
+
+    python benchmarks/ingest_benchmark.py                      # hermetic, local backend in a temp dir
+    python benchmarks/ingest_benchmark.py --backend supabase   # same workload against the real bucket
+    python benchmarks/ingest_benchmark.py --count 50 --size-kb 2048 --json results.json
+
+Whisper is replaced by a fixed sleep (--transcribe-ms) so runs are
+repeatable and only the storage side varies between backends.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage_engine  # noqa: E402
+import heirloom_engine  # noqa: E402
+
+def _payloads(count, size_kb, seed):
+    # Distinct, incompressible-ish bodies so content addressing can't collapse them
+    body = os.urandom(size_kb * 1024)
+    return [f"ID3bench-{seed}-{i}".encode() + body for i in range(count)]
+
+def _summary(name, latencies, total_bytes, wall):
+    latencies = sorted(latencies)
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return {
+        "phase": name,
+        "ops": len(latencies),
+        "wall_s": round(wall, 3),
+        "ops_per_s": round(len(latencies) / wall, 2) if wall else None,
+        "mb_per_s": round(total_bytes / 1e6 / wall, 2) if wall else None,
+        "p50_ms": round(pct(0.50), 1),
+        "p95_ms": round(pct(0.95), 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1)
+    }
+
+def _timed(fn, items):
+    latencies, results = [], []
+    started = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        results.append(fn(item))
+        latencies.append(time.perf_counter() - t)
+    return results, latencies, time.perf_counter() - started
+
+def run(backend_name="local", count=20, size_kb=1024, transcribe_ms=200, owner="bench@verbapost.test"):
+    tmp = None
+    if backend_name == "local":
+        tmp = tempfile.TemporaryDirectory(prefix="verbapost-bench-")
+        storage_engine.set_backend(storage_engine.LocalBackend(tmp.name, os.urandom(32), "http://localhost:8081"))
+    else:
+        storage_engine.set_backend(None)
+    if not storage_engine.get_backend(): raise SystemExit(f"Storage backend '{backend_name}' is not configured")
+
+    # Hermetic stand-ins: fixed-latency "Whisper", no background transcoding
+    heirloom_engine._transcribe_stage = lambda audio_bytes: time.sleep(transcribe_ms / 1000) or "transcript"
+    heirloom_engine.rendition_engine = None
+
+    payloads = _payloads(count, size_kb, int(time.time()))
+    total = sum(len(p) for p in payloads)
+    phases = []
+    try:
+        results, lat, wall = _timed(lambda p: heirloom_engine.store_and_transcribe(p, owner), payloads)
+        paths = [path for _, path in results]
+        if not all(paths): raise SystemExit("Ingest failed; see log output")
+        phases.append(_summary("ingest (upload || transcribe)", lat, total, wall))
+
+        before = storage_engine.get_upload_stats()["duplicates_skipped"]
+        _, lat, wall = _timed(lambda p: storage_engine.upload_audio(owner, p), payloads)
+        phases.append(_summary("re-ingest (dedupe)", lat, total, wall))
+        deduped = storage_engine.get_upload_stats()["duplicates_skipped"] - before
+
+        storage_engine.clear_signed_url_cache()
+        t = time.perf_counter()
+        urls = storage_engine.get_signed_urls(paths)
+        phases.append(_summary("batch sign", [time.perf_counter() - t], 0, time.perf_counter() - t))
+
+        def _read(path):
+            return sum(len(c) for c in storage_engine.stream_object(path))
+        sizes, lat, wall = _timed(_read, paths)
+        phases.append(_summary("streamed read", lat, sum(sizes), wall))
+    finally:
+        storage_engine.set_backend(None)
+        if tmp: tmp.cleanup()
+
+    return {
+        "backend": backend_name,
+        "count": count,
+        "size_kb": size_kb,
+        "transcribe_ms": transcribe_ms,
+        "deduped": deduped,
+        "signed": sum(1 for u in urls.values() if u),
+        "phases": phases
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["local", "supabase"], default="local")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--size-kb", type=int, default=1024)
+    parser.add_argument("--transcribe-ms", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    report = run(args.backend, args.count, args.size_kb, args.transcribe_ms)
+    print(f"backend={report['backend']} count={report['count']} size={report['size_kb']}KB transcribe={report['transcribe_ms']}ms")
+    print(f"{'phase':32} {'ops/s':>8} {'MB/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for p in report["phases"]:
+        print(f"{p['phase']:32} {p['ops_per_s'] or 0:>8} {p['mb_per_s'] or 0:>8} {p['p50_ms']:>8} {p['p95_ms']:>8}")
+    print(f"deduped on re-ingest: {report['deduped']}/{report['count']}, signed: {report['signed']}/{report['count']}")
+    if args.json:
+        with open(args.json, "w") as f: json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
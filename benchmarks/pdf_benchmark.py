@@ -0,0 +1,196 @@
+"""
+Letter / envelope PDF rendering benchmark (transcript length x font x QR).
+
+    python benchmarks/pdf_benchmark.py                                   # full matrix, 200..20,000 words
+    python benchmarks/pdf_benchmark.py --words 200,1000 --iterations 10
+    python benchmarks/pdf_benchmark.py --only campaign                    # template stamping only
+    python benchmarks/pdf_benchmark.py --json pdf.json                   # save results
+    python benchmarks/pdf_benchmark.py --baseline pdf.json               # exit 1 if p50 regressed
+
+Each scenario runs in its own subprocess so peak RSS is per scenario and
+one run's caches can't warm the next. The render cache is off and every
+letter gets its own audio id, so each iteration pays for layout, QR and
+font subsetting like a fresh letter would. The first (cold) render is
+reported separately and excluded from the percentiles.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORD_COUNTS = [200, 1000, 5000, 20000]
+WORDS = ("my grandfather kept the farm ledger in a tin box by the stove and every spring we "
+         "counted seed by lamplight while the radio played and mother wrote letters to her sister").split()
+TO_ADDR = {"name": "Jane Heir", "address_line1": "12 Elm St", "city": "Austin", "state": "TX", "zip_code": "78701"}
+FROM_ADDR = {"name": "Walter Smith", "address_line1": "9 Oak Ave", "city": "Dallas", "state": "TX", "zip_code": "75201"}
+PAGE_RE = re.compile(rb"/Type\s*/Page\b(?!s)")
+
+def _body(words):
+    # Paragraphs of ~120 words, like a cleaned-up transcript
+    out = []
+    for i in range(words):
+        out.append(WORDS[i % len(WORDS)])
+        if i % 120 == 119: out.append("\n\n")
+    return " ".join(out)
+
+def scenarios(word_counts=None, only=None):
+    found = []
+    if only in (None, "letter"):
+        for words in word_counts or WORD_COUNTS:
+            for font in ("TypeRight", "Courier"):
+                for qr in (True, False):
+                    found.append({"name": f"letter-{words}w-{font.lower()}-{'qr' if qr else 'noqr'}", "kind": "letter", "words": words, "font": font, "qr": qr})
+    if only in (None, "envelope"):
+        for font in ("TypeRight", "Courier"):
+            found.append({"name": f"envelope-{font.lower()}", "kind": "envelope", "words": 0, "font": font, "qr": False})
+    if only in (None, "campaign"):
+        # Per-recipient cost of a campaign letter stamped onto a render-once template
+        for words in word_counts or WORD_COUNTS:
+            found.append({"name": f"campaign-{words}w-stamp", "kind": "campaign", "words": words, "font": "TypeRight", "qr": False})
+    return found
+
+def _iterations_for(scenario, iterations):
+    # Long transcripts take seconds each; keep the matrix to a few minutes
+    if scenario["words"] <= 1000: return iterations
+    return max(3, iterations * 1000 // scenario["words"])
+
+def _peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)  # bytes on macOS, KB elsewhere
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+# ==========================================
+# 🧪 CHILD: ONE SCENARIO
+# ==========================================
+
+def run_scenario(scenario, iterations):
+    import font_cache
+    import render_cache
+    import letter_format
+    import envelope_format
+    import campaign_template
+
+    render_cache.ENABLED = False
+    if scenario["font"] != "TypeRight":
+        font_cache.FONT_CANDIDATES["TypeRight"] = []  # renderers fall back to Courier
+    import_rss = _peak_rss_mb()
+
+    body = _body(scenario["words"])
+    counter = iter(range(10 ** 9))
+    template = None
+    def render():
+        nonlocal template
+        if scenario["kind"] == "envelope":
+            return envelope_format.create_envelope(TO_ADDR, FROM_ADDR)
+        if scenario["kind"] == "campaign":
+            # Cold render = typesetting the template; the rest are stamps
+            template = template or campaign_template.CampaignTemplate("Dear {name},\n\n" + body, FROM_ADDR)
+            return template.stamp({**TO_ADDR, "name": f"Recipient {next(counter)}"})
+        audio = f"bench-{next(counter)}" if scenario["qr"] else None
+        return letter_format.create_pdf(body, TO_ADDR, FROM_ADDR, "Heritage Wealth", audio_url=audio)
+
+    t = time.perf_counter()
+    pdf = render()
+    cold = time.perf_counter() - t
+    pages = len(PAGE_RE.findall(pdf))
+
+    latencies = []
+    for _ in range(_iterations_for(scenario, iterations)):
+        t = time.perf_counter()
+        render()
+        latencies.append(time.perf_counter() - t)
+
+    total = sum(latencies)
+    return {
+        **scenario,
+        "iterations": len(latencies),
+        "pages": pages,
+        "bytes": len(pdf),
+        "cold_ms": round(cold * 1000, 1),
+        "p50_ms": round(_pct(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(_pct(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_pct(latencies, 0.99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "docs_per_s": round(len(latencies) / total, 2),
+        "pages_per_s": round(len(latencies) * pages / total, 1),
+        "import_rss_mb": import_rss,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+# ==========================================
+# 📊 PARENT: MATRIX + REGRESSION CHECK
+# ==========================================
+
+def _spawn(scenario, iterations):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", json.dumps(scenario), "--iterations", str(iterations)]
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {**scenario, "error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def run(word_counts=None, only=None, iterations=20):
+    results = [_spawn(s, iterations) for s in scenarios(word_counts, only)]
+    return {"python": sys.version.split()[0], "cpu_count": os.cpu_count(), "iterations": iterations, "results": results}
+
+def compare(report, baseline, max_regression):
+    """Scenarios whose p50 grew by more than max_regression (0.2 = 20%) vs the baseline."""
+    before = {r["name"]: r for r in baseline.get("results", []) if "p50_ms" in r}
+    regressions = []
+    for r in report["results"]:
+        old = before.get(r["name"])
+        if not old or "p50_ms" not in r: continue
+        change = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] if old["p50_ms"] else 0.0
+        if change > max_regression:
+            regressions.append({"name": r["name"], "baseline_p50_ms": old["p50_ms"], "p50_ms": r["p50_ms"], "change": round(change, 3)})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", help="comma-separated word counts (default: 200,1000,5000,20000)")
+    parser.add_argument("--only", choices=["letter", "envelope", "campaign"])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to check against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p50 slowdown vs baseline (default 0.2 = 20%%)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_scenario(json.loads(args.child), args.iterations)))
+        return None
+
+    word_counts = [int(w) for w in args.words.split(",")] if args.words else None
+    report = run(word_counts, args.only, args.iterations)
+    print(f"python={report['python']} cpus={report['cpu_count']}")
+    print(f"{'scenario':34} {'pages':>5} {'cold ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'pages/s':>8} {'peak MB':>8}")
+    for r in report["results"]:
+        if "error" in r:
+            print(f"{r['name']:34} ERROR {r['error']}")
+            continue
+        print(f"{r['name']:34} {r['pages']:>5} {r['cold_ms']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['pages_per_s']:>8} {r['peak_rss_mb']:>8}")
+    if args.json:
+        with open(args.json, "w") as f: json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+        regressions = compare(report, baseline, args.max_regression)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['name']}: p50 {r['baseline_p50_ms']} -> {r['p50_ms']} ms (+{r['change']:.0%})")
+        if regressions: sys.exit(1)
+        print(f"No p50 regressions over {args.max_regression:.0%} vs {args.baseline}")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import logging
+from datetime import datetime
+
+# --- IMPORTS ---
+try: import database
+except ImportError: database = None
+try: import letter_format
+except ImportError: letter_format = None
+try: import font_cache
+except ImportError: font_cache = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Transcripts are fetched this many at a time and dropped once laid out, so
+# a 300-page archive never holds every story in memory. fpdf only keeps the
+# (small) page content streams until output.
+STORY_BATCH_SIZE = 20
+TOC_LINE_MM = 7
+# "CONTENTS" heading and the gap under it, first ToC page only
+TOC_TITLE_MM = 10
+TOC_GAP_MM = 4
+
+def _story_title(story):
+    prompt = (story.get("prompt") or "").strip()
+    return prompt if prompt and prompt != "Ad-hoc Interview" else f"Story #{story['id']}"
+
+def _story_date(story):
+    created = story.get("created_at")
+    if isinstance(created, datetime): return created.strftime("%B %d, %Y")
+    return str(created)[:10] if created else ""
+
+def _fit(pdf, text, width):
+    """Truncates one line of text to width with an ellipsis."""
+    if pdf.get_string_width(text) <= width: return text
+    while text and pdf.get_string_width(text + "...") > width: text = text[:-1]
+    return text.rstrip() + "..."
+
+# ==========================================
+# 📑 LAYOUT
+# ==========================================
+
+def _title_page(pdf, font, client, story_count):
+    pdf.add_page()
+    pdf.set_y(90)
+    pdf.set_font(font, '', 22)
+    pdf.cell(0, 12, "THE FAMILY LEGACY ARCHIVE", align='C', ln=1)
+    pdf.set_font(font, '', 14)
+    pdf.ln(6)
+    pdf.cell(0, 8, letter_format._sanitize_text(f"The Stories of {client.get('name') or 'Our Family'}"), align='C', ln=1)
+    if client.get("heir_name"):
+        pdf.set_font(font, '', 11)
+        pdf.cell(0, 7, letter_format._sanitize_text(f"Collected for {client['heir_name']}"), align='C', ln=1)
+    pdf.ln(20)
+    pdf.set_font(font, '', 10)
+    pdf.cell(0, 6, f"{story_count} {'story' if story_count == 1 else 'stories'} - compiled {datetime.now().strftime('%B %d, %Y')}", align='C', ln=1)
+    pdf.cell(0, 6, letter_format._sanitize_text(f"Preserved by {client.get('firm_name') or 'VerbaPost'}"), align='C', ln=1)
+
+def _toc_renderer(font):
+    def render_toc(pdf, outline):
+        pdf.set_font(font, '', 16)
+        pdf.cell(0, TOC_TITLE_MM, "CONTENTS", align='C', ln=1)
+        pdf.ln(TOC_GAP_MM)
+        pdf.set_font(font, '', 10)
+        width = pdf.w - pdf.l_margin - pdf.r_margin
+        num_w = 14
+        for section in outline:
+            # Continue on the next page the placeholder reserved
+            if pdf.get_y() > pdf.h - pdf.b_margin - TOC_LINE_MM:
+                pdf.add_page()
+            link = pdf.add_link(page=section.page_number)
+            title = _fit(pdf, section.name, width - num_w - 4)
+            pdf.cell(width - num_w, TOC_LINE_MM, title, link=link)
+            pdf.cell(num_w, TOC_LINE_MM, str(section.page_number), align='R', ln=1, link=link)
+    return render_toc
+
+def _toc_pages(pdf, entries):
+    """Pages render_toc will fill: the same line-by-line walk, so fpdf gets exactly the count it needs."""
+    limit = pdf.h - pdf.b_margin - TOC_LINE_MM
+    pages, y = 1, pdf.t_margin + TOC_TITLE_MM + TOC_GAP_MM
+    for _ in range(entries):
+        if y > limit: pages, y = pages + 1, pdf.t_margin
+        y += TOC_LINE_MM
+    return pages
+
+def _story(pdf, font, story, content, include_qr):
+    # The ToC placeholder already broke onto a fresh page for the first chapter
+    if pdf.get_y() > pdf.t_margin: pdf.add_page()
+    title = letter_format._sanitize_text(_story_title(story))
+    pdf.start_section(title)
+
+    pdf.set_font(font, '', 14)
+    pdf.multi_cell(0, 7, title, align='C')
+    pdf.set_font(font, '', 9)
+    date = _story_date(story)
+    if date: pdf.cell(0, 5, f"Recorded: {date}", align='C', ln=1)
+    pdf.set_draw_color(50, 50, 50)
+    y_line = pdf.get_y() + 2
+    pdf.line(x1=pdf.l_margin, y1=y_line, x2=pdf.w - pdf.r_margin, y2=y_line)
+    pdf.ln(8)
+
+    pdf.set_font(font, '', 11)
+    pdf.multi_cell(0, 6, letter_format._sanitize_text(content) or "(Transcript unavailable)")
+
+    if include_qr:
+        letter_format._add_audio_qr(pdf, story["id"], letter_format.PAGE_WIDTH_MM, letter_format.PAGE_HEIGHT_MM, letter_format.MARGIN_MM)
+
+# ==========================================
+# 📚 COMPILER
+# ==========================================
+
+def render_book(client, stories, fetch_contents, include_qr=True, batch_size=None, on_progress=None):
+    """
+    Lays out a book: title page, table of contents, one chapter per story.
+    stories: outline entries ({"id", "prompt", "created_at"}), in book order.
+    fetch_contents(ids) -> {id: transcript} is called one batch at a time;
+    None (lookup failed) aborts the book rather than printing blank chapters.
+    Returns PDF bytes.
+    """
+    batch_size = batch_size or STORY_BATCH_SIZE
+    pdf = letter_format.LetterPDF(footer_text=f"Preserved by {client.get('firm_name') or 'VerbaPost'}")
+    font = 'TypeRight' if font_cache and font_cache.register_font(pdf, 'TypeRight') else 'Courier'
+
+    _title_page(pdf, font, client, len(stories))
+    pdf.add_page()
+    pdf.insert_toc_placeholder(_toc_renderer(font), pages=_toc_pages(pdf, len(stories)))
+
+    for start in range(0, len(stories), batch_size):
+        batch = stories[start:start + batch_size]
+        contents = fetch_contents([s["id"] for s in batch])
+        if contents is None: raise RuntimeError(f"Could not load stories {start + 1}-{start + len(batch)}")
+        for story in batch:
+            _story(pdf, font, story, contents.get(story["id"]), include_qr)
+        del contents
+        if on_progress: on_progress(min(start + batch_size, len(stories)), len(stories))
+
+    return bytes(pdf.output())
+
+def compile_book(client_id, include_qr=True, on_progress=None):
+    """
+    One manuscript PDF with every approved/sent story for a client.
+    Returns: (pdf_bytes, error_message)
+    """
+    if not database or not letter_format: return None, "Engines Missing"
+    outline = database.get_book_outline(client_id)
+    if not outline: return None, "Client Not Found"
+    if not outline["stories"]: return None, "No Approved Stories"
+    try:
+        pdf_bytes = render_book(outline["client"], outline["stories"], database.get_story_contents, include_qr=include_qr, on_progress=on_progress)
+        logger.info(f"Family book for client {client_id}: {len(outline['stories'])} stories, {len(pdf_bytes)} bytes")
+        return pdf_bytes, None
+    except Exception as e:
+        logger.error(f"Book Compile Error ({client_id}): {e}")
+        return None, str(e)
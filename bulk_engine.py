@@ -1,8 +1,13 @@
 import pandas as pd
 import io
+import csv
+import json
+import hashlib
+import uuid
 import streamlit as st
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- IMPORTS ---
 try: import letter_format
@@ -11,107 +16,454 @@ try: import mailer
 except ImportError: mailer = None
 try: import audit_engine
 except ImportError: audit_engine = None
+try: import secrets_manager
+except ImportError: secrets_manager = None
+try: import database
+except ImportError: database = None
+try: import campaign_worker
+except ImportError: campaign_worker = None
+try: import campaign_template
+except ImportError: campaign_template = None
+try: import pricing_engine
+except ImportError: pricing_engine = None
+try: import zip_index
+except ImportError: zip_index = None
+import address_standard
+from address_standard import StandardAddress
+from rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
 
-def parse_csv(uploaded_file):
+# --- CONFIGURATION ---
+# Sends are network-bound (PostGrid round trips), so workers are threads.
+# The shared bucket, not the worker count, caps PostGrid requests/sec;
+# raise postgrid.requests_per_second if the account allows more.
+DEFAULT_WORKERS = 4
+DEFAULT_REQUESTS_PER_SECOND = 5
+MAX_SEND_ATTEMPTS = 3
+
+_limiter = None
+
+def _get_secret(key):
+    if secrets_manager: return secrets_manager.get_secret(key)
+    return None
+
+def get_limiter():
+    """Process-wide bucket so concurrent campaigns share one PostGrid budget."""
+    global _limiter
+    if _limiter is None:
+        try: rps = float(_get_secret("postgrid.requests_per_second") or DEFAULT_REQUESTS_PER_SECOND)
+        except ValueError: rps = DEFAULT_REQUESTS_PER_SECOND
+        _limiter = TokenBucket(rate=rps, capacity=max(1, int(rps)))
+    return _limiter
+
+def get_worker_count():
+    try: return max(1, int(_get_secret("bulk.workers") or DEFAULT_WORKERS))
+    except ValueError: return DEFAULT_WORKERS
+
+# ==========================================
+# 📥 CSV INGESTION
+# ==========================================
+
+# Standard: name, street, city, state, zip
+REQUIRED_COLUMNS = ["name", "street", "city", "state", "zip"]
+# Header variations (after lower-casing and collapsing spaces/underscores/dashes)
+COLUMN_MAP = {
+    "full name": "name", "recipient": "name",
+    "address": "street", "address 1": "street", "addr": "street", "address line1": "street", "address line 1": "street", "street address": "street",
+    "town": "city",
+    "province": "state",
+    "postal": "zip", "zip code": "zip", "zipcode": "zip", "postal code": "zip"
+}
+# Rows per pandas chunk: memory is bounded by this, not by the upload size
+CSV_CHUNK_ROWS = 5000
+# Rejected rows kept for the report (the count is always exact)
+MAX_REJECTS_REPORTED = 1000
+
+def _normalize_headers(columns):
+    cols = pd.Index(columns).astype(str).str.strip().str.lower().str.replace(r"[\s_\-]+", " ", regex=True)
+    return [COLUMN_MAP.get(c, c) for c in cols]
+
+def _clean_chunk(df, first_row):
     """
-    Parses CSV and normalizes column headers.
-    Returns: List of dicts [{"name": "...", "street": "...", ...}]
+    Vectorized cleanup + checks for one chunk (all columns are str).
+    Returns (valid_df, rejected_df); rejected rows get a "reason" column,
+    valid rows a "zip_warning" column (ZIP3-only verdict, sent anyway).
+    """
+    df = df.reindex(columns=REQUIRED_COLUMNS)
+    for col in REQUIRED_COLUMNS:
+        df[col] = df[col].fillna("").astype(str).str.strip().str.replace(r"\s+", " ", regex=True)
+    df["state"] = df["state"].str.upper()
+
+    # ZIP: Excel drops leading zeros ("2101" -> 02101); keep ZIP+4 as 12345-6789
+    parts = df["zip"].str.replace(r"[^0-9\-]", "", regex=True).str.extract(r"^(\d{3,5})(?:-?(\d{4}))?$")
+    zip5 = parts[0].str.zfill(5)
+    df["zip"] = zip5.where(parts[1].isna(), zip5 + "-" + parts[1]).fillna(df["zip"])
+
+    reason = pd.Series("", index=df.index)
+    warning = pd.Series("", index=df.index)
+    if zip_index:
+        # Full ZIP index: unassigned ZIPs and ZIPs from another state never reach PostGrid.
+        # ZIP3-table guesses are only flagged; PostGrid decides.
+        problems, warnings = zip_index.zip_state_problems(zip5.fillna("").tolist(), df["state"].tolist())
+        reason, warning = pd.Series(problems, index=df.index), pd.Series(warnings, index=df.index)
+    reason = reason.mask(~df["state"].str.fullmatch(r"[A-Z]{2}"), "Invalid State")
+    reason = reason.mask(parts[0].isna(), "Invalid ZIP")
+    for col in reversed(REQUIRED_COLUMNS):
+        reason = reason.mask(df[col] == "", f"Missing {col}")
+
+    df.insert(0, "row", range(first_row, first_row + len(df)))
+    bad = reason != ""
+    rejected = df[bad].assign(reason=reason[bad])
+    valid = df[~bad].assign(zip_warning=warning[~bad])
+    # Column-wise USPS normalization + hashing (same key idempotency_key would compute per row)
+    valid["dedupe_key"] = address_standard.recipient_keys(valid, address_standard.fingerprint_columns(valid))
+    return valid, rejected
+
+def _records(df):
+    # Column lists zipped into dicts: several times faster than to_dict("records") on string columns
+    cols = list(df.columns)
+    return [dict(zip(cols, values)) for values in zip(*(df[c].tolist() for c in cols))]
+
+def stream_csv(uploaded_file, chunk_size=None):
+    """
+    Chunked CSV reader: headers are normalized once, each chunk is cleaned
+    (whitespace, state case, ZIP zero-padding) and checked with column ops.
+    Valid rows also carry "dedupe_key" (address_standard.recipient_key,
+    computed column-wise), which plan_campaign uses as the recipient identity,
+    and "zip_warning" ("" or a ZIP3-table verdict left to PostGrid).
+    Returns: (batches, error) - batches yields
+      {"contacts": [{"row", "name", "street", "city", "state", "zip", "zip_warning", "dedupe_key"}], "rejected": [... + "reason"]}
+    one chunk at a time, so only chunk_size rows are in memory.
     """
     try:
-        df = pd.read_csv(uploaded_file)
-        
-        # 1. Normalize Headers (Case insensitive)
-        df.columns = [c.strip().lower() for c in df.columns]
-        
-        # 2. Map variations to standard keys
-        # Standard: name, street, city, state, zip
-        column_map = {
-            "full name": "name", "recipient": "name",
-            "address": "street", "address 1": "street", "addr": "street", "address_line1": "street",
-            "town": "city",
-            "province": "state",
-            "postal": "zip", "zip code": "zip", "zipcode": "zip"
-        }
-        df.rename(columns=column_map, inplace=True)
-        
-        # 3. Validate Required Fields
-        required = ["name", "street", "city", "state", "zip"]
-        missing = [req for req in required if req not in df.columns]
-        
-        if missing:
-            logger.warning(f"CSV Missing columns: {missing}")
-            return None
-            
-        # 4. Fill NaNs
-        df.fillna("", inplace=True)
-        
-        return df.to_dict(orient="records")
-        
+        reader = pd.read_csv(uploaded_file, dtype=str, keep_default_na=False, chunksize=chunk_size or CSV_CHUNK_ROWS,
+                             skipinitialspace=True, encoding_errors="replace")
+        first = next(reader, None)
     except Exception as e:
         logger.error(f"CSV Parse Error: {e}")
+        return None, f"Could not read CSV: {e}"
+    if first is None: return None, "CSV is empty"
+
+    columns = _normalize_headers(first.columns)
+    missing = [req for req in REQUIRED_COLUMNS if req not in columns]
+    if missing:
+        logger.warning(f"CSV Missing columns: {missing}")
+        return None, f"CSV Missing columns: {', '.join(missing)}"
+
+    def batches():
+        offset = 0
+        chunk = first
+        while chunk is not None:
+            chunk.columns = columns
+            # Duplicate mapped headers (e.g. "address" and "street"): the first one wins
+            chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+            valid, rejected = _clean_chunk(chunk, offset)
+            offset += len(chunk)
+            yield {"contacts": _records(valid), "rejected": _records(rejected)}
+            chunk = next(reader, None)
+    return batches(), None
+
+def preview_csv(uploaded_file, chunk_size=None):
+    """
+    Dry run of a campaign list before it is priced and queued: rows that
+    would be rejected and duplicates (same recipient after USPS
+    normalization, e.g. "St" vs "Street", case, punctuation, ZIP+4) that
+    would be suppressed, plus valid rows whose ZIP looks wrong by the ZIP3
+    table alone (still sent; PostGrid decides).
+    Returns: (summary, error)
+      summary = {"rows", "valid", "rejected", "duplicates", "warnings", "mail_pieces", "estimated_total",
+                 "rejected_rows", "duplicate_rows", "warning_rows"} (row lists capped at MAX_REJECTS_REPORTED)
+    """
+    batches, error = stream_csv(uploaded_file, chunk_size)
+    if error: return None, error
+    seen = {}
+    summary = {"rows": 0, "valid": 0, "rejected": 0, "duplicates": 0, "warnings": 0,
+               "rejected_rows": [], "duplicate_rows": [], "warning_rows": []}
+    for batch in batches:
+        summary["rows"] += len(batch["contacts"]) + len(batch["rejected"])
+        summary["valid"] += len(batch["contacts"])
+        summary["rejected"] += len(batch["rejected"])
+        summary["rejected_rows"].extend(batch["rejected"][:MAX_REJECTS_REPORTED - len(summary["rejected_rows"])])
+        for contact in batch["contacts"]:
+            if contact["zip_warning"]:
+                summary["warnings"] += 1
+                if len(summary["warning_rows"]) < MAX_REJECTS_REPORTED:
+                    summary["warning_rows"].append({"row": contact["row"], "name": contact["name"], "state": contact["state"],
+                                                    "zip": contact["zip"], "warning": contact["zip_warning"]})
+            first = seen.setdefault(contact["dedupe_key"], contact["row"])
+            if first == contact["row"]: continue
+            summary["duplicates"] += 1
+            if len(summary["duplicate_rows"]) < MAX_REJECTS_REPORTED:
+                summary["duplicate_rows"].append({"row": contact["row"], "name": contact["name"], "street": contact["street"],
+                                                  "zip": contact["zip"], "duplicate_of_row": first})
+    summary["mail_pieces"] = summary["valid"] - summary["duplicates"]
+    summary["estimated_total"] = pricing_engine.calculate_total("Campaign", qty=summary["mail_pieces"]) if pricing_engine and summary["mail_pieces"] else 0.0
+    return summary, None
+
+def parse_csv(uploaded_file):
+    """
+    Parses CSV and normalizes column headers (whole file, see stream_csv).
+    Returns: List of dicts [{"name": "...", "street": "...", ...}], or None if unreadable / missing columns.
+    """
+    batches, error = stream_csv(uploaded_file)
+    if error: return None
+    contacts, rejected = [], 0
+    for batch in batches:
+        contacts.extend(batch["contacts"])
+        rejected += len(batch["rejected"])
+    if rejected: logger.warning(f"CSV: {rejected} rows rejected")
+    return contacts
+
+# ==========================================
+# 🔑 IDEMPOTENCY
+# ==========================================
+
+def _digest(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def campaign_key(user_email, letter_body, from_addr, run_id=None):
+    """
+    Prefix of every row's idempotency key. run_id (new_run_id(), one per job)
+    keeps a deliberate second campaign with the same sender and letter from
+    reusing the first one's keys, which PostGrid would answer with the old
+    letters. Resuming a job reuses its stored key, so nothing mails twice.
+    """
+    return _digest(user_email, letter_body, from_addr, run_id)[:16]
+
+def new_run_id():
+    return uuid.uuid4().hex
+
+def recipient_address(contact):
+    return {
+        "name": contact.get("name"),
+        "street": contact.get("street"),
+        "city": contact.get("city"),
+        "state": contact.get("state"),
+        "zip": contact.get("zip")
+    }
+
+def idempotency_key(campaign_id, to_addr, recipient=None):
+    """
+    recipient: address_standard.recipient_key for this row, if already
+    computed (stream_csv does it column-wise). USPS-normalized, not raw text:
+    "12 Elm Street" and "12 ELM ST." are one mail piece.
+    """
+    recipient = recipient or address_standard.recipient_key(to_addr.get("name"), StandardAddress.from_dict(to_addr).fingerprint())
+    return f"vp-{campaign_id}-{recipient[:24]}"
+
+# ==========================================
+# 📬 SEND ENGINE
+# ==========================================
+
+def plan_campaign(contacts, campaign_id, start=0, seen=None):
+    """
+    One row per contact, in list order: {"row", "name", "zip", "to_addr",
+    "idempotency_key", "status", "letter_id", "error"}. Rows without an
+    address are 'Failed' and repeated recipients 'Duplicate' before anything
+    is sent; everything else is 'Pending'.
+    Contacts from stream_csv keep their CSV "row" (so row numbers match
+    preview_csv and the rejected report); others are numbered from start.
+    For batches, pass the same seen dict each time.
+    """
+    rows = []
+    seen = {} if seen is None else seen
+    for i, contact in enumerate(contacts, start=start):
+        i = contact.get("row", i)
+        to_addr = recipient_address(contact)
+        row = {"row": i, "name": to_addr["name"], "zip": to_addr["zip"], "to_addr": to_addr,
+               "idempotency_key": None, "status": "Pending", "letter_id": None, "error": None}
+        if not to_addr["street"] or not (to_addr["zip"] or to_addr["city"]):
+            row.update(status="Failed", error="Missing Address")
+        else:
+            row["idempotency_key"] = idempotency_key(campaign_id, to_addr, contact.get("dedupe_key"))
+            if row["idempotency_key"] in seen:
+                row.update(status="Duplicate", error=f"Same recipient as row {seen[row['idempotency_key']]}")
+            else:
+                seen[row["idempotency_key"]] = i
+        rows.append(row)
+    return rows
+
+def build_template(letter_body, from_addr):
+    """
+    The campaign body typeset once (see campaign_template), so each row only
+    stamps its address block. None = render every row in full instead
+    (no pypdf, or {name} used beyond the salutation line).
+    """
+    if not campaign_template or not campaign_template.available(): return None
+    if not campaign_template.supports(letter_body):
+        logger.info("Campaign body uses {name} outside the salutation; rendering each letter in full")
+        return None
+    try:
+        return campaign_template.CampaignTemplate(letter_body, from_addr)
+    except Exception as e:
+        logger.error(f"Campaign Template Error: {e}")
         return None
 
+def render_row(to_addr, letter_body, from_addr, template=None):
+    if template: return template.stamp(to_addr)
+    # Full render: fill every {name} placeholder in the text itself
+    body = letter_body.replace("{name}", str(to_addr.get("name") or "").strip() or "Friend")
+    return letter_format.create_pdf(body, to_addr, from_addr, advisor_firm=from_addr.get("name") or "VerbaPost", is_marketing=True)
+
+def send_row(row, letter_body, from_addr, user_email, limiter, template=None):
+    """
+    Renders and mails one planned row (runs in a pool thread).
+    Returns {"row", "status": 'Sent' | 'Failed', "letter_id", "error", "seconds"}.
+    """
+    started = time.perf_counter()
+    to_addr, key = row["to_addr"], row["idempotency_key"]
+    result = {"row": row["row"], "status": "Failed", "letter_id": None, "error": None}
+    try:
+        pdf_bytes = render_row(to_addr, letter_body, from_addr, template)
+        letter_id, error = mailer.submit_letter(
+            pdf_bytes, to_addr, from_addr, description=f"Bulk {user_email}",
+            idempotency_key=key, limiter=limiter, max_attempts=MAX_SEND_ATTEMPTS
+        )
+        if letter_id:
+            result.update(status="Sent", letter_id=letter_id)
+            if audit_engine:
+                audit_engine.log_event(user_email, "BULK_SENT", metadata={"recipient": to_addr['name'], "id": letter_id, "key": key})
+        else:
+            result["error"] = error or "Send Failed"
+    except Exception as e:
+        logger.error(f"Bulk Error on row {row['row']}: {e}")
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+def summarize(rows):
+    return {
+        "total": len(rows),
+        "sent": sum(1 for r in rows if r["status"] == "Sent"),
+        "failed": sum(1 for r in rows if r["status"] == "Failed"),
+        "duplicates": sum(1 for r in rows if r["status"] == "Duplicate")
+    }
+
+def send_campaign(contacts, letter_body, from_addr, user_email, campaign_id=None, workers=None, limiter=None, on_progress=None):
+    """
+    Sends one letter per contact from a thread pool under the PostGrid rate
+    limit, in the calling process (see queue_campaign for the persistent,
+    resumable version). Every row carries an idempotency key (campaign +
+    recipient), so retries never double-mail; to re-run a campaign that died
+    halfway, pass the report's campaign_id back in. Repeated recipients in
+    the same list are reported as duplicates and sent once.
+    on_progress(done, total, row_result) is called from the calling thread.
+    Returns the campaign report:
+      {"campaign_id", "total", "sent", "failed", "duplicates", "seconds", "rows": [...]}
+    """
+    started = time.perf_counter()
+    campaign_id = campaign_id or campaign_key(user_email, letter_body, from_addr, new_run_id())
+    limiter = limiter or get_limiter()
+
+    rows = plan_campaign(contacts, campaign_id)
+    by_row = {r["row"]: r for r in rows}  # CSV row numbers can have gaps (rejected rows)
+    pending = [r for r in rows if r["status"] == "Pending"]
+    total, done = len(rows), len(rows) - len(pending)
+    if pending:
+        template = build_template(letter_body, from_addr)
+        with ThreadPoolExecutor(max_workers=min(workers or get_worker_count(), len(pending))) as pool:
+            futures = [pool.submit(send_row, r, letter_body, from_addr, user_email, limiter, template) for r in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                by_row[result["row"]].update(result)
+                done += 1
+                if on_progress: on_progress(done, total, by_row[result["row"]])
+
+    # Duplicates share their first row's outcome
+    first = {r["idempotency_key"]: r for r in rows if r["status"] in ("Sent", "Failed") and r["idempotency_key"]}
+    for r in rows:
+        if r["status"] == "Duplicate": r["letter_id"] = first[r["idempotency_key"]]["letter_id"]
+
+    report = {"campaign_id": campaign_id, "user_email": user_email, **summarize(rows),
+              "seconds": round(time.perf_counter() - started, 2), "rows": rows}
+    logger.info(f"Campaign {campaign_id}: {report['sent']} sent, {report['failed']} failed, {report['duplicates']} duplicates in {report['seconds']}s")
+    if audit_engine:
+        audit_engine.log_event(user_email, "BULK_CAMPAIGN", metadata={k: report[k] for k in ("campaign_id", "total", "sent", "failed", "duplicates", "seconds")})
+    return report
+
+def queue_campaign(contacts, letter_body, from_addr, user_email):
+    """
+    Persists a campaign as a job (campaign_jobs + one campaign_recipients
+    row per contact) and wakes the background worker (campaign_worker).
+    The browser can close; progress lives in the job rows.
+    Returns: (job_id, error_message)
+    """
+    if not database: return None, "Database Missing"
+    if not contacts: return None, "No Recipients"
+    key = campaign_key(user_email, letter_body, from_addr, new_run_id())
+    job_id = database.create_campaign_job(user_email, letter_body, from_addr, key, plan_campaign(contacts, key))
+    if not job_id: return None, "Could Not Save Campaign"
+    if campaign_worker: campaign_worker.ensure_running()
+    logger.info(f"Campaign job {job_id} queued: {len(contacts)} recipients for {user_email}")
+    return job_id, None
+
+def report_csv(rows):
+    """Per-row campaign results (report["rows"] or campaign_recipients rows) as CSV bytes."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=["row", "name", "zip", "status", "letter_id", "error", "idempotency_key"], extrasaction="ignore")
+    writer.writeheader()
+    for r in rows:
+        writer.writerow({**r, "zip": r.get("zip") or (r.get("to_addr") or {}).get("zip")})
+    return buf.getvalue().encode("utf-8")
+
+def queue_campaign_csv(uploaded_file, letter_body, from_addr, user_email, chunk_size=None):
+    """
+    Streams a CSV straight into a campaign job (see stream_csv): each chunk
+    is planned and inserted, so memory stays at one chunk however long the
+    list. Rejected rows are reported, not queued.
+    Returns: (job_id, summary, error_message)
+      summary = {"accepted", "rejected", "duplicates", "rejected_rows": [first MAX_REJECTS_REPORTED]}
+    """
+    if not database: return None, None, "Database Missing"
+    batches, error = stream_csv(uploaded_file, chunk_size)
+    if error: return None, None, error
+
+    key = campaign_key(user_email, letter_body, from_addr, new_run_id())
+    job_id, seen = None, {}
+    summary = {"accepted": 0, "rejected": 0, "duplicates": 0, "rejected_rows": []}
+    for batch in batches:
+        summary["rejected"] += len(batch["rejected"])
+        summary["rejected_rows"].extend(batch["rejected"][:MAX_REJECTS_REPORTED - len(summary["rejected_rows"])])
+        if not batch["contacts"]: continue
+        rows = plan_campaign(batch["contacts"], key, seen=seen)
+        summary["accepted"] += len(rows)
+        summary["duplicates"] += sum(1 for r in rows if r["status"] == "Duplicate")
+        if job_id is None:
+            job_id = database.create_campaign_job(user_email, letter_body, from_addr, key, rows, status='Loading')
+            ok = job_id is not None
+        else:
+            ok = database.add_campaign_recipients(job_id, rows)
+        if not ok:
+            if job_id: database.finish_campaign_job(job_id, 'Cancelled')
+            return None, summary, "Could Not Save Campaign"
+
+    if job_id is None: return None, summary, "No Valid Rows"
+    if not database.open_campaign_job(job_id):
+        # Left 'Loading', no worker would ever pick it up
+        database.finish_campaign_job(job_id, 'Cancelled')
+        return None, summary, "Could Not Save Campaign"
+    if campaign_worker: campaign_worker.ensure_running()
+    logger.info(f"Campaign job {job_id} queued from CSV: {summary['accepted']} rows, {summary['rejected']} rejected")
+    return job_id, summary, None
+
+def process_campaign_csv(uploaded_file, letter_body, from_addr, user_email):
+    """queue_campaign_csv for the UI; remembers the job like process_campaign."""
+    job_id, summary, error = queue_campaign_csv(uploaded_file, letter_body, from_addr, user_email)
+    if job_id: st.session_state["campaign_job_id"] = job_id
+    return job_id, summary, error
+
 def process_campaign(contacts, letter_body, from_addr, user_email):
     """
-    Iterates through contacts and sends letters via Mailer API.
+    Queues a campaign for the background worker (see queue_campaign) and
+    remembers the job in st.session_state["campaign_job_id"] for the
+    progress view, which reads job state rather than holding this rerun.
+    Returns: (job_id, error_message)
     """
     if not mailer or not letter_format:
-        return 0, "Engines Missing"
-        
-    success_count = 0
-    fail_count = 0
-    
-    # Progress Bar
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    total = len(contacts)
-    
-    for i, contact in enumerate(contacts):
-        # Update UI
-        status_text.text(f"Processing {i+1}/{total}: {contact.get('name')}")
-        progress_bar.progress((i + 1) / total)
-        
-        try:
-            # 1. Prepare To-Address
-            to_addr = {
-                "name": contact.get("name"),
-                "street": contact.get("street"),
-                "city": contact.get("city"),
-                "state": contact.get("state"),
-                "zip": contact.get("zip")
-            }
-            
-            # 2. Generate PDF
-            pdf_bytes = letter_format.create_pdf(letter_body, to_addr, from_addr, tier="Campaign")
-            
-            # 3. Send (PCM API)
-            # Use 'Campaign' tier so mailer defaults to Standard/Metered
-            track_id = mailer.send_letter(
-                pdf_bytes, 
-                to_addr, 
-                from_addr, 
-                tier="Campaign", 
-                description=f"Bulk {user_email}",
-                user_email=user_email # <--- PASS USER EMAIL HERE
-            )
-            
-            if track_id:
-                success_count += 1
-                # Log Success (Now redundant if mailer logs, but harmless to keep)
-                if audit_engine:
-                    audit_engine.log_event(user_email, "BULK_SENT", metadata={"recipient": to_addr['name'], "id": track_id})
-            else:
-                fail_count += 1
-                
-            # Rate limit safety
-            time.sleep(0.5) 
-            
-        except Exception as e:
-            logger.error(f"Bulk Error on row {i}: {e}")
-            fail_count += 1
-
-    status_text.text(f"Done! Sent: {success_count}, Failed: {fail_count}")
-    return success_count, fail_count
\ No newline at end of file
+        return None, "Engines Missing"
+
+    job_id, error = queue_campaign(contacts, letter_body, from_addr, user_email)
+    if job_id: st.session_state["campaign_job_id"] = job_id
+    return job_id, error
@@ -0,0 +1,95 @@
+"""
+Render-once campaign letters.
+
+A campaign sends the same body to every recipient, so the body is typeset
+once into a template laid out exactly like letter_format.create_pdf(...,
+is_marketing=True). When the body's first line is e.g. "Dear {name},", that
+line is left blank and each letter is the template plus a one-line overlay
+with the recipient's salutation; otherwise every letter is the template.
+"""
+import io
+import logging
+import threading
+
+from fpdf import FPDF
+
+# --- IMPORTS ---
+import font_cache
+import letter_format
+try: from pypdf import PdfReader, PdfWriter
+except ImportError: PdfReader = PdfWriter = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+NAME_PLACEHOLDER = "{name}"
+DEFAULT_NAME = "Friend"
+
+def available():
+    return PdfWriter is not None
+
+def split_salutation(body_text):
+    """
+    First line with {name} becomes the per-recipient salutation. Returns
+    (salutation or None, body); body keeps its leading blank lines so the
+    template's line positions match the full render.
+    """
+    first, _, rest = (body_text or "").partition("\n")
+    if NAME_PLACEHOLDER in first: return first, rest
+    return None, body_text
+
+def supports(body_text):
+    """
+    True if the body can be typeset once: {name} may only appear on the
+    salutation line, which the overlay fills. Anywhere else the shared body
+    would print it literally, so such campaigns render each letter in full.
+    """
+    _, body = split_salutation(body_text)
+    return NAME_PLACEHOLDER not in (body or "")
+
+class CampaignTemplate:
+    """
+    One campaign's typeset body. stamp(to_addr) -> that recipient's PDF.
+    Safe to share between send threads.
+    """
+    def __init__(self, body_text, from_addr):
+        if not available(): raise RuntimeError("pypdf Missing")
+        if not supports(body_text): raise ValueError("{name} outside the salutation line needs a full render per letter")
+        self.salutation, body = split_salutation(body_text)
+        self.pdf_bytes, self.layout = letter_format.create_campaign_template(body, from_addr, salutation=bool(self.salutation))
+        self.page_count = len(PdfReader(io.BytesIO(self.pdf_bytes)).pages)
+        self._local = threading.local()
+
+    def _template_reader(self):
+        # pypdf readers parse lazily and aren't thread-safe; one per send thread
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            reader = self._local.reader = PdfReader(io.BytesIO(self.pdf_bytes))
+        return reader
+
+    def overlay(self, to_addr):
+        """Transparent Letter page with only the salutation line, in the body's font and position."""
+        pdf = FPDF(orientation='P', unit='mm', format='Letter')
+        pdf.set_margins(letter_format.MARGIN_MM, letter_format.MARGIN_MM, letter_format.MARGIN_MM)
+        pdf.set_auto_page_break(False)
+        font_family = self.layout["font"]
+        if font_family != 'Courier' and not font_cache.register_font(pdf, font_family): font_family = 'Courier'
+        pdf.add_page()
+        pdf.set_text_color(0, 0, 0)
+
+        name = str((to_addr or {}).get("name") or "").strip() or DEFAULT_NAME
+        pdf.set_font(font_family, '', letter_format.BODY_FONT_SIZE)
+        pdf.set_xy(letter_format.MARGIN_MM, self.layout["salutation_y"])
+        pdf.multi_cell(0, letter_format.BODY_LINE_MM, letter_format._sanitize_text(self.salutation.replace(NAME_PLACEHOLDER, name)))
+        return bytes(pdf.output())
+
+    def stamp(self, to_addr):
+        """The template with this recipient's salutation merged onto page 1. Returns PDF bytes."""
+        if not self.salutation: return self.pdf_bytes
+        writer = PdfWriter(clone_from=self._template_reader())
+        page = writer.pages[0]
+        page.merge_page(PdfReader(io.BytesIO(self.overlay(to_addr))).pages[0])
+        page.compress_content_streams()  # merging leaves page 1 uncompressed
+        out = io.BytesIO()
+        writer.write(out)
+        return out.getvalue()
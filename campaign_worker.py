@@ -0,0 +1,112 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# --- IMPORTS ---
+try: import secrets_manager
+except ImportError: secrets_manager = None
+try: import database
+except ImportError: database = None
+try: import bulk_engine
+except ImportError: bulk_engine = None
+try: import audit_engine
+except ImportError: audit_engine = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Rows are leased and checkpointed this many at a time: a crash re-sends at
+# most one batch, and those re-sends reuse their idempotency keys.
+CHECKPOINT_ROWS = 50
+# A Running job with no checkpoint for this long is taken over by the next
+# worker (container restart, killed process).
+STALE_AFTER_SECONDS = 300
+POLL_INTERVAL_SECONDS = 10
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+_thread = None
+_thread_lock = threading.Lock()
+_wake = threading.Event()
+
+def _get_secret(key):
+    if secrets_manager: return secrets_manager.get_secret(key)
+    return None
+
+def run_job(job, limiter=None, workers=None, batch_size=CHECKPOINT_ROWS):
+    """
+    Sends a claimed job's remaining rows, checkpointing after every batch.
+    Returns the job's final status, or None if it was left for a later resume.
+    """
+    job_id = job["id"]
+    limiter = limiter or bulk_engine.get_limiter()
+    status = job["status"]
+    started = time.perf_counter()
+    # Typeset once per run (a resumed job rebuilds it), then stamp per row
+    template = bulk_engine.build_template(job["letter_body"], job["from_addr"]) if status == 'Running' else None
+
+    with ThreadPoolExecutor(max_workers=workers or bulk_engine.get_worker_count()) as pool:
+        while status == 'Running':
+            batch = database.lease_campaign_recipients(job_id, limit=batch_size)
+            if not batch: break
+            results = list(pool.map(lambda row: bulk_engine.send_row(row, job["letter_body"], job["from_addr"], job["user_email"], limiter, template), batch))
+            status = database.record_campaign_results(job_id, [{**r, "id": row["id"]} for row, r in zip(batch, results)])
+            if status is None:
+                # Checkpoint failed: stop here; the job goes stale and is resumed (same keys, no double mail)
+                logger.error(f"Campaign {job_id}: checkpoint failed, leaving job for resume")
+                return None
+
+    final = 'Cancelled' if status == 'Cancelling' else 'Done'
+    database.finish_campaign_job(job_id, final)
+    summary = database.get_campaign_job(job_id) or {}
+    logger.info(f"Campaign {job_id} {final}: {summary.get('sent')} sent, {summary.get('failed')} failed in {time.perf_counter() - started:.1f}s")
+    if audit_engine:
+        audit_engine.log_event(job["user_email"], "BULK_CAMPAIGN", metadata={
+            "job_id": job_id, "campaign_id": job["campaign_key"], "status": final,
+            **{k: summary.get(k) for k in ("total", "sent", "failed", "duplicates")}
+        })
+    return final
+
+def process_next_job(limiter=None, workers=None):
+    """One worker tick: claim a queued (or stale) job and run it. Returns the job id or None."""
+    if not database or not bulk_engine: return None
+    stale_before = datetime.utcnow() - timedelta(seconds=STALE_AFTER_SECONDS)
+    job = database.claim_campaign_job(WORKER_ID, stale_before)
+    if not job: return None
+    logger.info(f"Campaign {job['id']}: claimed by {WORKER_ID} ({job['sent'] + job['failed'] + job['duplicates']}/{job['total']} already done)")
+    run_job(job, limiter=limiter, workers=workers)
+    return job["id"]
+
+def run_forever(poll_interval=POLL_INTERVAL_SECONDS, stop_event=None):
+    while not (stop_event and stop_event.is_set()):
+        try:
+            job_id = process_next_job()
+        except Exception as e:
+            logger.error(f"Campaign Worker Error: {e}")
+            job_id = None
+        # Drain queued jobs back-to-back; otherwise wait for a new one or the next poll
+        if job_id: continue
+        _wake.wait(poll_interval)
+        _wake.clear()
+
+def ensure_running():
+    """
+    Starts the worker thread once per process (on by default; set
+    campaigns.worker_enabled = false on instances that should only queue).
+    Also wakes it, so a freshly queued campaign starts right away.
+    """
+    global _thread
+    if str(_get_secret("campaigns.worker_enabled") or "true").lower() in ("0", "false", "no"): return None
+    with _thread_lock:
+        if not (_thread and _thread.is_alive()):
+            _thread = threading.Thread(target=run_forever, name="campaign-worker", daemon=True)
+            _thread.start()
+    _wake.set()
+    return _thread
+
+if __name__ == "__main__":
+    run_forever()
@@ -0,0 +1,184 @@
+import logging
+import threading
+import time
+
+# --- IMPORT SECRETS MANAGER ---
+try: import secrets_manager
+except ImportError: secrets_manager = None
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# 🔌 VENDOR CLIENT REGISTRY
+# ==========================================
+# One lazily-built client per vendor, per process.
+# Every engine used to build its own Twilio / OpenAI / Supabase client on
+# every call, which threw away the HTTP connection pool each time.
+# Builders run under a per-name lock so two Streamlit sessions racing on a
+# cold start only construct the client once.
+
+_clients = {}
+_locks = {}
+_registry_lock = threading.Lock()
+_stats = {}
+
+def _get_secret(key):
+    if secrets_manager: return secrets_manager.get_secret(key)
+    import os
+    return os.environ.get(key) or os.environ.get(key.upper().replace(".", "_"))
+
+def _lock_for(name):
+    with _registry_lock:
+        if name not in _locks:
+            _locks[name] = threading.Lock()
+            _stats[name] = {"hits": 0, "misses": 0, "builds": 0, "failures": 0, "build_seconds": 0.0, "last_build_seconds": 0.0}
+        return _locks[name]
+
+def get_client(name, factory):
+    """
+    Returns the cached client for 'name', building it with factory() on first use.
+    If the factory returns None (e.g. missing credentials) nothing is cached,
+    so the next call retries once secrets become available.
+    """
+    lock = _lock_for(name)
+    client = _clients.get(name)
+    if client is not None:
+        with _registry_lock: _stats[name]["hits"] += 1
+        return client
+
+    with lock:
+        # Double-checked: another thread may have finished the build while we waited
+        client = _clients.get(name)
+        if client is not None:
+            with _registry_lock: _stats[name]["hits"] += 1
+            return client
+
+        _stats[name]["misses"] += 1
+        start = time.perf_counter()
+        try:
+            client = factory()
+        except Exception as e:
+            _stats[name]["failures"] += 1
+            logger.error(f"Client Registry: {name} init failed: {e}")
+            return None
+        elapsed = time.perf_counter() - start
+
+        if client is None:
+            _stats[name]["failures"] += 1
+            return None
+
+        _stats[name]["builds"] += 1
+        _stats[name]["build_seconds"] += elapsed
+        _stats[name]["last_build_seconds"] = elapsed
+        _clients[name] = client
+        logger.info(f"Client Registry: built {name} in {elapsed * 1000:.1f}ms")
+        return client
+
+def reset(name=None):
+    """Drops cached clients (all, or one by name). Used after credential rotation and in tests."""
+    with _registry_lock:
+        if name is None:
+            _clients.clear()
+        else:
+            _clients.pop(name, None)
+
+def get_stats():
+    """
+    Returns a snapshot of per-client cache stats:
+    {name: {hits, misses, builds, failures, build_seconds, last_build_seconds, cached}}
+    """
+    with _registry_lock:
+        snapshot = {}
+        for name, s in _stats.items():
+            snapshot[name] = dict(s)
+            snapshot[name]["cached"] = name in _clients
+        return snapshot
+
+# ==========================================
+# 🏭 VENDOR FACTORIES
+# ==========================================
+
+def _build_openai():
+    api_key = _get_secret("openai.api_key")
+    if not api_key:
+        logger.warning("⚠️ OpenAI API Key is missing. Transcription will be skipped.")
+        return None
+    import openai
+    return openai.OpenAI(api_key=api_key)
+
+def _build_twilio():
+    sid = _get_secret("twilio.account_sid")
+    token = _get_secret("twilio.auth_token")
+    if not sid or not token:
+        logger.error("Twilio Credentials Missing")
+        return None
+    from twilio.rest import Client
+    return Client(sid, token)
+
+def _get_supabase_credentials():
+    url = _get_secret("supabase.url") or _get_secret("SUPABASE_URL")
+    key = _get_secret("supabase.key") or _get_secret("SUPABASE_KEY")
+    return url, key
+
+def _build_supabase():
+    url, key = _get_supabase_credentials()
+    if not url or not key:
+        logger.error("Supabase Error: Missing SUPABASE_URL or SUPABASE_KEY")
+        return None
+    from supabase import create_client
+    return create_client(url, key)
+
+def _build_http_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# ==========================================
+# 🧩 PUBLIC ACCESSORS
+# ==========================================
+
+def get_openai_client():
+    return get_client("openai", _build_openai)
+
+def get_twilio_client():
+    return get_client("twilio", _build_twilio)
+
+def get_supabase_client():
+    """Shared data/storage client (service key). Never call auth sign-in on this one."""
+    return get_client("supabase", _build_supabase)
+
+def get_supabase_auth_client():
+    """
+    Separate instance for auth flows: sign_in/verify_otp swap the session token
+    onto the client, which must not leak into database/storage requests.
+    """
+    return get_client("supabase_auth", _build_supabase)
+
+def get_http_session():
+    """Pooled requests.Session for raw vendor downloads (Twilio media, PostGrid)."""
+    return get_client("http", _build_http_session)
+
+def get_stripe(api_key):
+    """
+    Configures the stripe module once per key instead of on every call.
+    Returns the stripe module, or None if unavailable.
+    """
+    if not api_key: return None
+
+    def _configure():
+        try:
+            import stripe
+        except ImportError:
+            return None
+        stripe.api_key = api_key
+        return stripe
+
+    stripe_mod = get_client("stripe", _configure)
+    if stripe_mod is not None and stripe_mod.api_key != api_key:
+        # Key was rotated in secrets; re-point the module without rebuilding
+        stripe_mod.api_key = api_key
+    return stripe_mod
@@ -2,20 +2,23 @@ import os
 import logging
 import urllib.parse
 import json
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, Float, DateTime, ForeignKey, text
+from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, Float, DateTime, ForeignKey, text, func
 from sqlalchemy.orm import sessionmaker, declarative_base
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timedelta
 import streamlit as st
 
 # --- IMPORT SECRETS ---
 try: import secrets_manager
 except ImportError: secrets_manager = None
 
+try: import client_registry
+except ImportError: client_registry = None
+
 # --- 1. SUPABASE CLIENT SETUP ---
-try:
-    from supabase import create_client, Client
-    
+def _build_supabase_client():
+    from supabase import create_client
+
     sb_url = os.environ.get("SUPABASE_URL")
     sb_key = os.environ.get("SUPABASE_KEY")
     
@@ -28,9 +31,17 @@ try:
         sb_key = st.secrets["supabase"]["key"]
 
     if sb_url and sb_key:
-        supabase: Client = create_client(sb_url, sb_key)
+        return create_client(sb_url, sb_key)
+    return None
+
+try:
+    from supabase import create_client, Client
+    
+    # Shared with storage_engine via the registry (one client + pool per process)
+    if client_registry:
+        supabase = client_registry.get_client("supabase", _build_supabase_client)
     else:
-        supabase = None
+        supabase = _build_supabase_client()
 except ImportError:
     supabase = None
 
@@ -56,6 +67,38 @@ def get_db_url():
         return None
     except Exception: return None
 
+# Columns added after the table was first deployed. create_all() never alters
+# existing tables; on SQLite (tests) the fresh table already has them.
+_EXTRA_COLUMNS = [
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS interview_phone VARCHAR",
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS leased_at TIMESTAMP",
+]
+
+# Indexes on pre-existing tables. create_all() only builds indexes for NEW
+# tables, so these are applied idempotently on startup.
+_EXTRA_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_projects_call_sid ON projects (call_sid)",
+    "CREATE INDEX IF NOT EXISTS ix_projects_tracking_number ON projects (tracking_number)",
+    "CREATE INDEX IF NOT EXISTS ix_letter_drafts_call_sid ON letter_drafts (call_sid)",
+    "CREATE INDEX IF NOT EXISTS ix_letter_drafts_tracking_number ON letter_drafts (tracking_number)",
+    # Scheduler scan: only rows still waiting to be dialed are indexed
+    "CREATE INDEX IF NOT EXISTS ix_projects_scheduled_due ON projects (scheduled_time) WHERE status = 'Scheduled'",
+    # Stale-lease sweep: only rows currently being dialed
+    "CREATE INDEX IF NOT EXISTS ix_projects_dialing_lease ON projects (leased_at) WHERE status = 'Dialing'",
+]
+
+def _ensure_indexes(engine):
+    if engine.dialect.name == "postgresql":
+        ddls = _EXTRA_COLUMNS + _EXTRA_INDEXES
+    else:
+        ddls = _EXTRA_INDEXES
+    for ddl in ddls:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(ddl))
+        except Exception as e:
+            logger.warning(f"Index Skipped ({ddl}): {e}")
+
 def init_db():
     global _engine, _SessionLocal
     if _engine is not None: return _engine, _SessionLocal
@@ -65,6 +108,7 @@ def init_db():
         _engine = create_engine(url, pool_pre_ping=True)
         _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
         Base.metadata.create_all(_engine)
+        _ensure_indexes(_engine)
         return _engine, _SessionLocal
     except Exception: return None, None
 
@@ -147,6 +191,8 @@ class Project(Base):
     strategic_prompt = Column(Text)
     call_sid = Column(String)
     scheduled_time = Column(DateTime, nullable=True)
+    interview_phone = Column(String) # Number the scheduler dials (E.164)
+    leased_at = Column(DateTime, nullable=True) # When the scheduler flipped it to 'Dialing'
     audio_released = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -177,6 +223,103 @@ class PaymentFulfillment(Base):
     user_email = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class TwilioRecording(Base):
+    """Local mirror of Twilio recordings (fed by recording_sync.py)."""
+    __tablename__ = 'twilio_recordings'
+    recording_sid = Column(String, primary_key=True)
+    call_sid = Column(String, index=True)
+    date_created = Column(DateTime, index=True)
+    duration = Column(Integer)
+    uri = Column(String)
+    media_url = Column(String, index=True) # Same https://api.twilio.com/...mp3 form stored in tracking_number
+    synced_at = Column(DateTime, default=datetime.utcnow)
+
+class TwilioCall(Base):
+    """Call legs seen by the mirror/callbacks; phone is the far end in E.164 (phone index)."""
+    __tablename__ = 'twilio_calls'
+    call_sid = Column(String, primary_key=True)
+    phone = Column(String, index=True)
+    direction = Column(String)
+    status = Column(String)
+    date_created = Column(DateTime)
+    synced_at = Column(DateTime, default=datetime.utcnow)
+
+class SyncState(Base):
+    """Key/value checkpoints for background jobs (e.g. recordings high-water mark)."""
+    __tablename__ = 'sync_state'
+    key = Column(String, primary_key=True)
+    value = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class PrintRun(Base):
+    """One batch render of the Master Queue (see print_engine)."""
+    __tablename__ = 'print_runs'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_by = Column(String)
+    status = Column(String, default='Rendering') # Rendering -> Ready / Failed
+    item_count = Column(Integer, default=0)
+    letter_pages = Column(Integer, default=0)
+    envelope_count = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    seconds = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class PrintRunItem(Base):
+    """Queue item (projects / letter_drafts row) included in a print run."""
+    __tablename__ = 'print_run_items'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(Integer, ForeignKey('print_runs.id'), index=True)
+    item_type = Column(String) # 'Heirloom' (projects) or 'Store' (letter_drafts)
+    item_id = Column(Integer, index=True)
+    position = Column(Integer) # Order in the merged file
+    status = Column(String, default='Queued') # Queued -> Printed / Failed
+    error = Column(Text)
+
+class CampaignJob(Base):
+    """A bulk mail campaign, sent in the background by campaign_worker."""
+    __tablename__ = 'campaign_jobs'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    campaign_key = Column(String, index=True) # bulk_engine.campaign_key: prefix of every idempotency key
+    user_email = Column(String, index=True)
+    letter_body = Column(Text)
+    from_addr = Column(Text) # JSON
+    status = Column(String, default='Queued') # (Loading ->) Queued -> Running (-> Cancelling) -> Done / Cancelled
+    total = Column(Integer, default=0)
+    sent = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    duplicates = Column(Integer, default=0)
+    worker_id = Column(String)
+    heartbeat_at = Column(DateTime, nullable=True) # Last checkpoint; a stale Running job is resumed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class CampaignRecipient(Base):
+    """One row of a campaign's CSV and what happened to it."""
+    __tablename__ = 'campaign_recipients'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, ForeignKey('campaign_jobs.id'), index=True)
+    row = Column(Integer) # Position in the uploaded list
+    name = Column(String)
+    to_addr = Column(Text) # JSON
+    idempotency_key = Column(String, index=True)
+    status = Column(String, default='Pending', index=True) # Pending -> Sending -> Sent / Failed; Duplicate; Cancelled
+    letter_id = Column(String) # PostGrid id
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class AddressValidation(Base):
+    """Cached PostGrid verdict (+ reusable contact) per address fingerprint (see mailer)."""
+    __tablename__ = 'address_validations'
+    key = Column(String, primary_key=True) # "<address_fp>:<name_key>"
+    address_fp = Column(String, index=True)
+    name_key = Column(String, default='') # '' = verdict only, no contact for a named recipient
+    valid = Column(Boolean)
+    message = Column(Text)
+    contact_id = Column(String, nullable=True)
+    checked_at = Column(DateTime, default=datetime.utcnow)
+
 # ==========================================
 # 🛠️ HELPER FUNCTIONS
 # ==========================================
@@ -268,13 +411,14 @@ def create_draft(user_email, content, status="Recording", call_sid=None, prompt=
         logger.error(f"Create Draft Error: {e}")
         return False
     
-def update_draft_by_sid(call_sid, content, recording_url):
+def update_draft_by_sid(call_sid, content, recording_url, audio_ref=None):
     try:
         with get_db_session() as session:
             p = session.query(Project).filter_by(call_sid=call_sid).first()
             if p:
                 p.content = content
                 p.tracking_number = recording_url 
+                if audio_ref: p.audio_ref = audio_ref # Permanent vault copy (storage path)
                 p.status = 'Draft'
                 p.call_sid = None 
                 session.commit()
@@ -292,6 +436,151 @@ def update_draft_by_sid(call_sid, content, recording_url):
         logger.error(f"Update SID Error: {e}")
         return False
 
+def get_owner_email_by_sid(call_sid):
+    """Email whose vault folder a call's audio belongs in (client for projects, user for drafts)."""
+    try:
+        with get_db_session() as session:
+            p = session.query(Project).filter_by(call_sid=call_sid).first()
+            if p:
+                client = session.query(Client).filter_by(id=p.client_id).first()
+                return client.email if client and client.email else p.advisor_email
+            d = session.query(LetterDraft).filter_by(call_sid=call_sid).first()
+            if d: return d.user_email
+        return None
+    except Exception as e:
+        logger.error(f"Owner Lookup Error: {e}")
+        return None
+
+def set_status_by_sid(call_sid, status):
+    """Marks a pending project/draft (e.g. 'Call Failed') without touching its content."""
+    try:
+        with get_db_session() as session:
+            p = session.query(Project).filter_by(call_sid=call_sid).first()
+            if p:
+                p.status = status
+                return True
+            d = session.query(LetterDraft).filter_by(call_sid=call_sid).first()
+            if d:
+                d.status = status
+                return True
+        return False
+    except Exception as e:
+        logger.error(f"Set Status Error: {e}")
+        return False
+
+# ==========================================
+# 🗓️ INTERVIEW SCHEDULER
+# ==========================================
+
+def schedule_interview(user_email, phone, prompt, scheduled_time):
+    """
+    Queues an interview call for the scheduler (status 'Scheduled').
+    scheduled_time is naive UTC, like every other timestamp in this schema.
+    """
+    user_email = user_email.strip().lower()
+    try:
+        with get_db_session() as session:
+            client = session.query(Client).filter_by(email=user_email).order_by(Client.created_at.desc()).first()
+            if not client: return None
+            proj = Project(
+                advisor_email=client.advisor_email,
+                client_id=client.id,
+                heir_name=client.heir_name,
+                strategic_prompt=prompt or "Ad-hoc Interview",
+                status='Scheduled',
+                scheduled_time=scheduled_time,
+                interview_phone=phone,
+                content="Waiting for scheduled call..."
+            )
+            session.add(proj)
+            session.flush()
+            return proj.id
+    except Exception as e:
+        logger.error(f"Schedule Interview Error: {e}")
+        return None
+
+def reclaim_stale_leases(stale_before, exclude_ids=()):
+    """
+    Puts 'Dialing' rows leased before stale_before (a scheduler died
+    mid-batch) back to 'Scheduled'. Rows that already have a call SID, or are
+    in exclude_ids (dialed, SID save still being retried), are never
+    re-dialed. Returns the number of rows reclaimed.
+    """
+    try:
+        with get_db_session() as session:
+            sql = "UPDATE projects SET status = 'Scheduled', leased_at = NULL WHERE status = 'Dialing' AND leased_at < :stale_before AND call_sid IS NULL"
+            params = {"stale_before": stale_before}
+            if exclude_ids:
+                sql += f" AND id NOT IN ({', '.join(f':x{i}' for i in range(len(exclude_ids)))})"
+                params.update({f"x{i}": pid for i, pid in enumerate(exclude_ids)})
+            return session.execute(text(sql), params).rowcount
+    except Exception as e:
+        logger.error(f"Reclaim Leases Error: {e}")
+        return 0
+
+def lease_due_interviews(limit=50, now=None):
+    """
+    Claims up to 'limit' due interviews and flips them to 'Dialing' in one
+    transaction. FOR UPDATE SKIP LOCKED lets several scheduler processes run
+    side by side without dialing the same project twice.
+    """
+    now = now or datetime.utcnow()
+    try:
+        with get_db_session() as session:
+            lock_clause = "FOR UPDATE OF p SKIP LOCKED" if session.bind.dialect.name == "postgresql" else ""
+            sql = text(f"""
+                SELECT p.id, p.strategic_prompt, p.advisor_email, p.interview_phone, c.phone AS client_phone,
+                       c.email AS client_email, a.firm_name
+                FROM projects p
+                JOIN clients c ON p.client_id = c.id
+                LEFT JOIN advisors a ON p.advisor_email = a.email
+                WHERE p.status = 'Scheduled' AND p.scheduled_time <= :now
+                ORDER BY p.scheduled_time
+                LIMIT :limit
+                {lock_clause}
+            """)
+            rows = session.execute(sql, {"now": now, "limit": limit}).fetchall()
+            if not rows: return []
+            session.execute(
+                text("UPDATE projects SET status = 'Dialing', leased_at = :now WHERE id = :id"),
+                [{"id": r.id, "now": now} for r in rows]
+            )
+            return [{
+                "id": r.id,
+                "phone": r.interview_phone or r.client_phone,
+                "prompt": r.strategic_prompt,
+                "advisor_email": r.advisor_email,
+                "client_email": r.client_email,
+                "firm_name": r.firm_name or "VerbaPost"
+            } for r in rows]
+    except Exception as e:
+        logger.error(f"Lease Interviews Error: {e}")
+        return []
+
+def record_call_sids(dispatched, failed_ids=None):
+    """
+    Write-back for dialed projects (the scheduler calls it per call, as soon
+    as Twilio returns the SID, so early callbacks can find the project).
+    dispatched: [{"id": project_id, "call_sid": sid}] -> 'Pending' (waiting for recording)
+    failed_ids: [project_id] -> 'Call Failed'
+    """
+    try:
+        with get_db_session() as session:
+            if dispatched:
+                session.execute(
+                    text("UPDATE projects SET call_sid = :call_sid, status = 'Pending' WHERE id = :id"),
+                    dispatched
+                )
+            if failed_ids:
+                session.execute(
+                    text("UPDATE projects SET status = 'Call Failed' WHERE id = :id"),
+                    [{"id": pid} for pid in failed_ids]
+                )
+        return True
+    except Exception as e:
+        logger.error(f"Record Call SIDs Error: {e}")
+        return False
+
 # --- 🔴 RESTORED: ADVISOR MEDIA LOOKUP ---
 def get_advisor_projects_for_media(advisor_email):
     advisor_email = advisor_email.strip().lower()
@@ -518,10 +807,374 @@ def add_advisor_credit(email, amount=1):
     except: return False
     return False
 
+# ==========================================
+# 🖨️ PRINT RUNS
+# ==========================================
+
+def create_print_run(items, created_by=None):
+    """
+    Opens a print run for queue items [{"type", "id"}] in merge order.
+    Returns the run id or None.
+    """
+    try:
+        with get_db_session() as session:
+            run = PrintRun(created_by=created_by, item_count=len(items))
+            session.add(run)
+            session.flush()
+            session.add_all([
+                PrintRunItem(run_id=run.id, item_type=item["type"], item_id=item["id"], position=i)
+                for i, item in enumerate(items)
+            ])
+            return run.id
+    except Exception as e:
+        logger.error(f"Create Print Run Error: {e}")
+        return None
+
+def finish_print_run(run_id, failed=None, letter_pages=0, envelope_count=0, seconds=None):
+    """
+    Closes a print run. failed: {(item_type, item_id): error}; every other item is 'Printed'.
+    """
+    failed = failed or {}
+    try:
+        with get_db_session() as session:
+            run = session.query(PrintRun).filter_by(id=run_id).first()
+            if not run: return False
+            session.execute(
+                text("UPDATE print_run_items SET status = 'Printed' WHERE run_id = :run_id"),
+                {"run_id": run_id}
+            )
+            if failed:
+                session.execute(
+                    text("UPDATE print_run_items SET status = 'Failed', error = :error WHERE run_id = :run_id AND item_type = :item_type AND item_id = :item_id"),
+                    [{"run_id": run_id, "item_type": t, "item_id": i, "error": str(err)[:500]} for (t, i), err in failed.items()]
+                )
+            run.status = 'Failed' if failed and len(failed) >= (run.item_count or 0) else 'Ready'
+            run.letter_pages = letter_pages
+            run.envelope_count = envelope_count
+            run.error_count = len(failed)
+            run.seconds = seconds
+            run.finished_at = datetime.utcnow()
+            return True
+    except Exception as e:
+        logger.error(f"Finish Print Run Error: {e}")
+        return False
+
+def get_latest_print_runs(item_keys):
+    """Most recent successful print run per queue item. item_keys: [(item_type, item_id)] -> {key: run_id}"""
+    if not item_keys: return {}
+    try:
+        with get_db_session() as session:
+            rows = session.query(PrintRunItem.item_type, PrintRunItem.item_id, PrintRunItem.run_id).filter(
+                PrintRunItem.item_id.in_({i for _, i in item_keys}),
+                PrintRunItem.status == 'Printed'
+            ).all()
+            wanted = set(item_keys)
+            latest = {}
+            for r in rows:
+                key = (r.item_type, r.item_id)
+                if key in wanted and r.run_id > latest.get(key, 0): latest[key] = r.run_id
+            return latest
+    except Exception as e:
+        logger.error(f"Print Run Lookup Error: {e}")
+        return {}
+
+# ==========================================
+# 📮 ADDRESS VALIDATION CACHE
+# ==========================================
+
+def get_address_validations(address_fp):
+    """Cached verdicts / contacts for one address fingerprint (all recipient names)."""
+    try:
+        with get_db_session() as session:
+            rows = session.query(AddressValidation).filter_by(address_fp=address_fp).all()
+            return [to_dict(r) for r in rows]
+    except Exception as e:
+        logger.error(f"Address Cache Read Error: {e}")
+        return []
+
+def save_address_validation(address_fp, name_key, valid, message=None, contact_id=None):
+    try:
+        with get_db_session() as session:
+            session.merge(AddressValidation(
+                key=f"{address_fp}:{name_key}", address_fp=address_fp, name_key=name_key,
+                valid=valid, message=message, contact_id=contact_id, checked_at=datetime.utcnow()
+            ))
+            return True
+    except Exception as e:
+        logger.error(f"Address Cache Write Error: {e}")
+        return False
+
+# ==========================================
+# 📢 CAMPAIGN JOBS
+# ==========================================
+
+def _insert_campaign_recipients(session, job_id, recipients):
+    session.bulk_insert_mappings(CampaignRecipient, [{
+        "job_id": job_id, "row": r["row"], "name": r.get("name"), "to_addr": json.dumps(r["to_addr"]),
+        "idempotency_key": r.get("idempotency_key"), "status": r["status"], "error": r.get("error")
+    } for r in recipients])
+
+def create_campaign_job(user_email, letter_body, from_addr, campaign_key, recipients, status='Queued'):
+    """
+    Persists a campaign and its rows in one transaction.
+    recipients: [{"row", "name", "to_addr", "idempotency_key", "status", "error"}]
+    Rows already settled at planning time (Failed / Duplicate) count immediately.
+    status='Loading' keeps workers off the job while more rows are appended
+    (add_campaign_recipients, then open_campaign_job).
+    Returns the job id or None.
+    """
+    try:
+        with get_db_session() as session:
+            job = CampaignJob(
+                campaign_key=campaign_key, user_email=user_email, letter_body=letter_body,
+                from_addr=json.dumps(from_addr), total=len(recipients), status=status,
+                failed=sum(1 for r in recipients if r["status"] == 'Failed'),
+                duplicates=sum(1 for r in recipients if r["status"] == 'Duplicate')
+            )
+            session.add(job)
+            session.flush()
+            _insert_campaign_recipients(session, job.id, recipients)
+            return job.id
+    except Exception as e:
+        logger.error(f"Create Campaign Error: {e}")
+        return None
+
+def add_campaign_recipients(job_id, recipients):
+    """Appends one batch of rows to a 'Loading' job."""
+    try:
+        with get_db_session() as session:
+            _insert_campaign_recipients(session, job_id, recipients)
+            return True
+    except Exception as e:
+        logger.error(f"Add Campaign Rows Error ({job_id}): {e}")
+        return False
+
+def open_campaign_job(job_id):
+    """Loading -> Queued once every row is in; counters come from the rows."""
+    try:
+        with get_db_session() as session:
+            counts = dict(session.query(CampaignRecipient.status, func.count(CampaignRecipient.id))
+                          .filter(CampaignRecipient.job_id == job_id).group_by(CampaignRecipient.status).all())
+            job = session.query(CampaignJob).filter_by(id=job_id).first()
+            if not job: return False
+            job.total, job.failed, job.duplicates = sum(counts.values()), counts.get('Failed', 0), counts.get('Duplicate', 0)
+            job.status = 'Queued'
+            return True
+    except Exception as e:
+        logger.error(f"Open Campaign Error ({job_id}): {e}")
+        return False
+
+def claim_campaign_job(worker_id, stale_before):
+    """
+    Takes the oldest Queued job, or a Running job whose worker stopped
+    checkpointing before stale_before (crash / restart). The conditional
+    UPDATE makes the claim safe when several workers poll the same table.
+    Returns the job dict (from_addr decoded) or None.
+    """
+    try:
+        with get_db_session() as session:
+            candidates = session.query(CampaignJob.id).filter(
+                (CampaignJob.status == 'Queued') |
+                (CampaignJob.status.in_(('Running', 'Cancelling')) & ((CampaignJob.heartbeat_at == None) | (CampaignJob.heartbeat_at < stale_before)))
+            ).order_by(CampaignJob.id).limit(5).all()
+            for (job_id,) in candidates:
+                claimed = session.execute(text("""
+                    UPDATE campaign_jobs SET status = CASE WHEN status = 'Cancelling' THEN status ELSE 'Running' END,
+                           worker_id = :worker, heartbeat_at = :now
+                    WHERE id = :id AND (status = 'Queued' OR (status IN ('Running', 'Cancelling') AND (heartbeat_at IS NULL OR heartbeat_at < :stale)))
+                """), {"worker": worker_id, "now": datetime.utcnow(), "id": job_id, "stale": stale_before})
+                if claimed.rowcount:
+                    job = to_dict(session.query(CampaignJob).filter_by(id=job_id).first())
+                    job["from_addr"] = json.loads(job["from_addr"] or "{}")
+                    return job
+            return None
+    except Exception as e:
+        logger.error(f"Claim Campaign Error: {e}")
+        return None
+
+def lease_campaign_recipients(job_id, limit=50):
+    """
+    Next rows to send, flipped to 'Sending'. Rows left in 'Sending' by a
+    crashed worker come back first; resending them is safe because PostGrid
+    dedupes on the row's idempotency key.
+    """
+    try:
+        with get_db_session() as session:
+            rows = session.query(CampaignRecipient).filter(
+                CampaignRecipient.job_id == job_id, CampaignRecipient.status.in_(('Sending', 'Pending'))
+            ).order_by(CampaignRecipient.status.desc(), CampaignRecipient.row).limit(limit).all()
+            now = datetime.utcnow()
+            leased = []
+            for r in rows:
+                r.status, r.attempts, r.updated_at = 'Sending', (r.attempts or 0) + 1, now
+                leased.append({"id": r.id, "row": r.row, "name": r.name, "to_addr": json.loads(r.to_addr or "{}"),
+                               "idempotency_key": r.idempotency_key, "attempts": r.attempts})
+            return leased
+    except Exception as e:
+        logger.error(f"Lease Campaign Rows Error: {e}")
+        return []
+
+def record_campaign_results(job_id, results):
+    """
+    Checkpoint: stores row outcomes [{"id", "status", "letter_id", "error"}],
+    refreshes the job counters and heartbeat. Returns the job status (so the
+    worker sees a cancel) or None on error.
+    """
+    try:
+        with get_db_session() as session:
+            now = datetime.utcnow()
+            if results:
+                session.bulk_update_mappings(CampaignRecipient, [
+                    {"id": r["id"], "status": r["status"], "letter_id": r.get("letter_id"), "error": r.get("error"), "updated_at": now}
+                    for r in results
+                ])
+            counts = dict(session.query(CampaignRecipient.status, func.count(CampaignRecipient.id))
+                          .filter(CampaignRecipient.job_id == job_id).group_by(CampaignRecipient.status).all())
+            job = session.query(CampaignJob).filter_by(id=job_id).first()
+            if not job: return None
+            job.sent, job.failed, job.duplicates = counts.get('Sent', 0), counts.get('Failed', 0), counts.get('Duplicate', 0)
+            job.heartbeat_at = now
+            return job.status
+    except Exception as e:
+        logger.error(f"Campaign Checkpoint Error ({job_id}): {e}")
+        return None
+
+def finish_campaign_job(job_id, status='Done'):
+    try:
+        with get_db_session() as session:
+            job = session.query(CampaignJob).filter_by(id=job_id).first()
+            if not job: return False
+            job.status, job.finished_at = status, datetime.utcnow()
+            if status == 'Cancelled':
+                session.query(CampaignRecipient).filter(
+                    CampaignRecipient.job_id == job_id, CampaignRecipient.status == 'Pending'
+                ).update({"status": 'Cancelled'}, synchronize_session=False)
+            return True
+    except Exception as e:
+        logger.error(f"Finish Campaign Error ({job_id}): {e}")
+        return False
+
+def cancel_campaign_job(job_id):
+    """Stops a campaign at its next checkpoint (rows already handed to PostGrid still go out)."""
+    try:
+        with get_db_session() as session:
+            job = session.query(CampaignJob).filter_by(id=job_id).first()
+            if not job or job.status in ('Done', 'Cancelled'): return False
+            if job.status == 'Queued':
+                job.status, job.finished_at = 'Cancelled', datetime.utcnow()
+                session.query(CampaignRecipient).filter(
+                    CampaignRecipient.job_id == job_id, CampaignRecipient.status == 'Pending'
+                ).update({"status": 'Cancelled'}, synchronize_session=False)
+            else:
+                job.status = 'Cancelling'
+            return True
+    except Exception as e:
+        logger.error(f"Cancel Campaign Error ({job_id}): {e}")
+        return False
+
+def get_campaign_job(job_id):
+    """Job row (without the letter body) for progress views."""
+    try:
+        with get_db_session() as session:
+            job = to_dict(session.query(CampaignJob).filter_by(id=job_id).first())
+            if job: job.pop("letter_body", None)
+            return job
+    except Exception as e:
+        logger.error(f"Campaign Lookup Error: {e}")
+        return None
+
+def get_campaign_jobs(user_email=None, limit=20):
+    try:
+        with get_db_session() as session:
+            query = session.query(CampaignJob)
+            if user_email: query = query.filter_by(user_email=user_email)
+            jobs = [to_dict(j) for j in query.order_by(CampaignJob.id.desc()).limit(limit).all()]
+            for j in jobs: j.pop("letter_body", None)
+            return jobs
+    except Exception as e:
+        logger.error(f"Campaign List Error: {e}")
+        return []
+
+def get_campaign_recipients(job_id, status=None):
+    try:
+        with get_db_session() as session:
+            query = session.query(CampaignRecipient).filter_by(job_id=job_id)
+            if status: query = query.filter_by(status=status)
+            rows = [to_dict(r) for r in query.order_by(CampaignRecipient.row).all()]
+            for r in rows: r["to_addr"] = json.loads(r["to_addr"] or "{}")
+            return rows
+    except Exception as e:
+        logger.error(f"Campaign Rows Error: {e}")
+        return []
+
+# ==========================================
+# 📚 FAMILY BOOKS
+# ==========================================
+
+BOOK_STATUSES = ('Approved', 'Sent')
+
+def get_book_clients():
+    """Clients with at least one approved/sent story, for the book compiler picker."""
+    try:
+        with get_db_session() as session:
+            rows = session.query(
+                Client.id, Client.name, Client.heir_name, Client.advisor_email, Advisor.firm_name,
+                func.count(Project.id).label("stories")
+            ).join(Project, Project.client_id == Client.id).outerjoin(Advisor, Advisor.email == Client.advisor_email).filter(
+                Project.status.in_(BOOK_STATUSES)
+            ).group_by(Client.id, Client.name, Client.heir_name, Client.advisor_email, Advisor.firm_name).order_by(Client.name).all()
+            return [dict(r._mapping) for r in rows]
+    except Exception as e:
+        logger.error(f"Book Clients Error: {e}")
+        return []
+
+def get_book_outline(client_id):
+    """
+    Book metadata plus the story list WITHOUT transcripts (ids, prompts, dates), oldest first.
+    Returns: {"client": {...}, "stories": [...]} or None
+    """
+    try:
+        with get_db_session() as session:
+            client = session.query(Client).filter_by(id=client_id).first()
+            if not client: return None
+            adv = session.query(Advisor).filter_by(email=client.advisor_email).first()
+            rows = session.query(Project.id, Project.strategic_prompt, Project.created_at).filter(
+                Project.client_id == client_id, Project.status.in_(BOOK_STATUSES)
+            ).order_by(Project.created_at, Project.id).all()
+            return {
+                "client": {"id": client.id, "name": client.name, "heir_name": client.heir_name,
+                           "firm_name": adv.firm_name if adv and adv.firm_name else "VerbaPost"},
+                "stories": [{"id": r.id, "prompt": r.strategic_prompt, "created_at": r.created_at} for r in rows]
+            }
+    except Exception as e:
+        logger.error(f"Book Outline Error: {e}")
+        return None
+
+def get_story_contents(project_ids):
+    """Transcripts for a batch of projects: {id: content}, or None on a DB error."""
+    if not project_ids: return {}
+    try:
+        with get_db_session() as session:
+            rows = session.query(Project.id, Project.content).filter(Project.id.in_(list(project_ids))).all()
+            return {r.id: r.content for r in rows}
+    except Exception as e:
+        logger.error(f"Story Contents Error: {e}")
+        return None
+
 # ==========================================
 # 🆕 PUBLIC PLAYER ACCESS (FIX FOR QR CODE)
 # ==========================================
 
+def get_vault_audio_refs(limit=500):
+    """Storage paths of vault copies, newest first (rendition backfill)."""
+    try:
+        with get_db_session() as db:
+            rows = db.query(Project.audio_ref).filter(Project.audio_ref.isnot(None), ~Project.audio_ref.like('http%')).order_by(Project.id.desc()).limit(limit).all()
+            return [r[0] for r in rows if r[0]]
+    except Exception as e:
+        logger.error(f"Vault Ref Query Error: {e}")
+        return []
+
 def get_public_draft(draft_id):
     """
     Fetches a draft by ID for the public player (QR Code).
@@ -542,6 +1195,7 @@ def get_public_draft(draft_id):
                 return {
                     "id": proj.id,
                     "url": proj.tracking_number, # This holds the Audio URL
+                    "audio_ref": proj.audio_ref, # Vault copy (storage path), if ingested
                     "title": f"Story #{proj.id}",
                     "date": proj.created_at.strftime("%B %d, %Y") if proj.created_at else "Unknown",
                     "storyteller": proj.heir_name or "Family Member"
@@ -560,4 +1214,113 @@ def get_public_draft(draft_id):
             return None
     except Exception as e:
         logger.error(f"Public Draft Fetch Error: {e}")
-        return None
\ No newline at end of file
+        return None
+
+# ==========================================
+# 🎙️ TWILIO RECORDINGS MIRROR
+# ==========================================
+
+def get_sync_state(key):
+    try:
+        with get_db_session() as session:
+            row = session.query(SyncState).filter_by(key=key).first()
+            return row.value if row else None
+    except Exception as e:
+        logger.error(f"Sync State Read Error: {e}")
+        return None
+
+def set_sync_state(key, value):
+    try:
+        with get_db_session() as session:
+            row = session.query(SyncState).filter_by(key=key).first()
+            if row:
+                row.value = value
+                row.updated_at = datetime.utcnow()
+            else:
+                session.add(SyncState(key=key, value=value))
+            return True
+    except Exception as e:
+        logger.error(f"Sync State Write Error: {e}")
+        return False
+
+def _bulk_upsert(model, rows, key):
+    """
+    INSERT ... ON CONFLICT (key) DO UPDATE for a list of dicts.
+    Re-syncing an overlapping window is safe: existing rows are refreshed, not duplicated.
+    Columns whose value is None don't overwrite what is already stored.
+    Returns the row count, or None if the write failed (so callers can tell
+    "nothing to write" from "not written").
+    """
+    if not rows: return 0
+    try:
+        with get_db_session() as session:
+            dialect = session.bind.dialect.name
+            if dialect in ("postgresql", "sqlite"):
+                if dialect == "postgresql":
+                    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                from sqlalchemy import func
+                stmt = dialect_insert(model).values(rows)
+                table = model.__table__
+                update_cols = {c: func.coalesce(stmt.excluded[c], table.c[c]) for c in rows[0] if c != key}
+                stmt = stmt.on_conflict_do_update(index_elements=[key], set_=update_cols)
+                session.execute(stmt)
+            else:
+                for r in rows: session.merge(model(**r))
+        return len(rows)
+    except Exception as e:
+        logger.error(f"{model.__tablename__} Upsert Error: {e}")
+        return None
+
+def upsert_twilio_recordings(rows):
+    """Bulk upsert of recording dicts keyed by recording_sid."""
+    return _bulk_upsert(TwilioRecording, rows, "recording_sid")
+
+def upsert_twilio_calls(rows):
+    """Bulk upsert of call dicts keyed by call_sid (feeds the phone index)."""
+    return _bulk_upsert(TwilioCall, rows, "call_sid")
+
+def get_latest_recording_for_phone(phone):
+    """
+    Phone index lookup: newest recording on any call to/from an E.164 number.
+    Returns {"call_sid", "recording_sid", "date_created", "media_url"} or None.
+    """
+    sql = text("""
+        SELECT c.call_sid, r.recording_sid, r.date_created, r.media_url
+        FROM twilio_calls c
+        JOIN twilio_recordings r ON r.call_sid = c.call_sid
+        WHERE c.phone = :phone
+        ORDER BY r.date_created DESC
+        LIMIT 1
+    """)
+    try:
+        with get_db_session() as session:
+            row = session.execute(sql, {"phone": phone}).fetchone()
+            if not row: return None
+            return {"call_sid": row.call_sid, "recording_sid": row.recording_sid, "date_created": row.date_created, "media_url": row.media_url}
+    except Exception as e:
+        logger.error(f"Phone Index Lookup Error: {e}")
+        return None
+
+def get_orphaned_recordings(limit=200):
+    """
+    Recordings with no matching project/draft (by pending call_sid OR by the
+    saved recording URL, since update_draft_by_sid clears call_sid once synced).
+    Returns None if the mirror is unavailable so callers can fall back to the API.
+    """
+    sql = text("""
+        SELECT r.call_sid, r.date_created, r.duration, r.uri
+        FROM twilio_recordings r
+        WHERE NOT EXISTS (SELECT 1 FROM projects p WHERE p.call_sid = r.call_sid OR p.tracking_number = r.media_url)
+          AND NOT EXISTS (SELECT 1 FROM letter_drafts d WHERE d.call_sid = r.call_sid OR d.tracking_number = r.media_url)
+        ORDER BY r.date_created DESC
+        LIMIT :limit
+    """)
+    try:
+        with get_db_session() as session:
+            res = session.execute(sql, {"limit": limit}).fetchall()
+            return [{"sid": row.call_sid, "date_created": row.date_created, "duration": row.duration, "uri": row.uri} for row in res]
+    except Exception as e:
+        logger.error(f"Orphan Query Error: {e}")
+        return None
@@ -1,6 +1,9 @@
 from fpdf import FPDF
 import os
 import logging
+import font_cache
+try: import render_cache
+except ImportError: render_cache = None
 
 logger = logging.getLogger(__name__)
 
@@ -8,74 +11,159 @@ logger = logging.getLogger(__name__)
 ENV_W_MM = 241.3
 ENV_H_MM = 104.8
 
+# Bump when the layout changes so cached renders (render_cache) are not reused
+TEMPLATE_VERSION = "2"
+
+# Label sheets (US Letter, mm). Pitch = label size + gutter.
+LABEL_LAYOUTS = {
+    # 1" x 2-5/8", 30 per sheet (address labels)
+    "5160": {"cols": 3, "rows": 10, "w": 66.675, "h": 25.4, "left": 4.7625, "top": 12.7, "pitch_x": 69.85, "pitch_y": 25.4, "font_size": 10},
+    # 2" x 4", 10 per sheet (shipping labels)
+    "5163": {"cols": 2, "rows": 5, "w": 101.6, "h": 50.8, "left": 3.96875, "top": 12.7, "pitch_x": 106.3625, "pitch_y": 50.8, "font_size": 12},
+}
+LABEL_PADDING_MM = 3
+MIN_LABEL_FONT_SIZE = 7
+
+def build_block(addr_dict):
+    """Address dict -> printable lines joined by newlines (no empty lines or dangling commas)."""
+    if not addr_dict: return ""
+    lines = []
+    name = addr_dict.get('name') or addr_dict.get('company')
+    if name: lines.append(str(name))
+
+    # 'street' / 'zip' are the campaign CSV keys (bulk_engine)
+    street = addr_dict.get('address_line1') or addr_dict.get('street')
+    if street: lines.append(str(street))
+    line2 = addr_dict.get('address_line2')
+    if line2: lines.append(str(line2))
+
+    # City/State/Zip Logic
+    city = str(addr_dict.get('city') or '').strip()
+    state = str(addr_dict.get('state') or '').strip()
+    zip_c = str(addr_dict.get('zip_code') or addr_dict.get('zip') or '').strip()
+
+    csz_line = ""
+    if city: csz_line += city
+    if state:
+        if csz_line: csz_line += f", {state}"
+        else: csz_line = state
+    if zip_c: csz_line += f" {zip_c}"
+
+    # 🔴 FIX: Don't print empty lines or dangling commas
+    clean_csz = csz_line.strip().strip(",").strip()
+    if clean_csz: lines.append(clean_csz)
+
+    return "\n".join(lines)
+
+def _output(pdf):
+    raw_output = pdf.output()
+    if isinstance(raw_output, str): return raw_output.encode('latin-1')
+    return bytes(raw_output)
+
+def _new_envelope_pdf():
+    pdf = FPDF(orientation='L', unit='mm', format=(ENV_H_MM, ENV_W_MM))
+    # --- FONT LOADING (cached, see font_cache) ---
+    font_family = 'TypeRight' if font_cache.register_font(pdf, 'TypeRight') else 'Courier'
+    return pdf, font_family
+
+def _draw_envelope(pdf, font_family, to_addr, from_addr):
+    pdf.add_page()
+    pdf.set_font(font_family, '', 11)
+
+    # --- RETURN ADDRESS (Top Left) ---
+    pdf.set_xy(15, 15)
+    pdf.multi_cell(80, 5, build_block(from_addr))
+
+    # --- DESTINATION ADDRESS (Center Right) ---
+    pdf.set_xy(110, 50)
+    pdf.multi_cell(100, 6, build_block(to_addr))
+
 def create_envelope(to_addr, from_addr):
     """
     Generates a #10 Envelope PDF using TypeRight font.
     """
+    cache_key = None
+    if render_cache:
+        cache_key = render_cache.make_key("envelope", TEMPLATE_VERSION, to_addr=to_addr, from_addr=from_addr, font=font_cache.resolve_font_path('TypeRight'))
+        cached = render_cache.get(cache_key)
+        if cached: return cached
+
     try:
-        pdf = FPDF(orientation='L', unit='mm', format=(ENV_H_MM, ENV_W_MM))
-        
-        # --- FONT LOADING (FIXED PATH) ---
-        font_family = 'Courier' # Safe fallback
-        font_path = os.path.join("assets", "fonts", "type_right.ttf")
-        
-        if os.path.exists(font_path):
-            try:
-                pdf.add_font('TypeRight', '', font_path, uni=True)
-                font_family = 'TypeRight'
-            except: pass
-        elif os.path.exists("type_right.ttf"): # Root fallback
-             try:
-                pdf.add_font('TypeRight', '', 'type_right.ttf', uni=True)
-                font_family = 'TypeRight'
-             except: pass
-            
-        pdf.add_page()
-        pdf.set_font(font_family, '', 11)
-        
-        # --- HELPER: BUILD ADDRESS BLOCK ---
-        def build_block(addr_dict):
-            lines = []
-            name = addr_dict.get('name') or addr_dict.get('company')
-            if name: lines.append(str(name))
-            
-            street = addr_dict.get('address_line1')
-            if street: lines.append(str(street))
-            
-            # City/State/Zip Logic
-            city = addr_dict.get('city', '').strip()
-            state = addr_dict.get('state', '').strip()
-            zip_c = addr_dict.get('zip_code', '').strip()
-            
-            csz_line = ""
-            if city: csz_line += city
-            if state: 
-                if csz_line: csz_line += f", {state}"
-                else: csz_line = state
-            if zip_c: csz_line += f" {zip_c}"
-            
-            # 🔴 FIX: Don't print empty lines or dangling commas
-            clean_csz = csz_line.strip().strip(",").strip()
-            if clean_csz: lines.append(clean_csz)
-            
-            return "\n".join(lines)
-        
-        # --- RETURN ADDRESS (Top Left) ---
-        pdf.set_xy(15, 15)
-        return_block = build_block(from_addr)
-        pdf.multi_cell(80, 5, return_block)
-        
-        # --- DESTINATION ADDRESS (Center Right) ---
-        pdf.set_xy(110, 50)
-        dest_block = build_block(to_addr)
-        pdf.multi_cell(100, 6, dest_block)
-        
-        # Output
-        raw_output = pdf.output(dest='S')
-        if isinstance(raw_output, str): return raw_output.encode('latin-1')
-        elif isinstance(raw_output, bytearray): return bytes(raw_output)
-        return raw_output
+        pdf, font_family = _new_envelope_pdf()
+        _draw_envelope(pdf, font_family, to_addr, from_addr)
+        pdf_bytes = _output(pdf)
+
+        if render_cache: render_cache.put(cache_key, pdf_bytes)
+        return pdf_bytes
 
     except Exception as e:
         logger.error(f"Envelope Gen Error: {e}")
-        return None
\ No newline at end of file
+        return None
+
+# ==========================================
+# 📦 BATCH OUTPUT
+# ==========================================
+
+def create_envelopes(recipients, from_addr=None):
+    """
+    Many #10 envelopes in one PDF, one page each (one font load, one output).
+    recipients: [to_addr] with a shared from_addr, or [(to_addr, from_addr)].
+    Returns PDF bytes, or None if nothing could be rendered.
+    """
+    try:
+        pdf, font_family = _new_envelope_pdf()
+        for entry in recipients:
+            to_addr, sender = entry if isinstance(entry, tuple) else (entry, from_addr)
+            _draw_envelope(pdf, font_family, to_addr, sender or {})
+        if not pdf.page: return None
+        return _output(pdf)
+    except Exception as e:
+        logger.error(f"Envelope Batch Error: {e}")
+        return None
+
+def _fit_font_size(pdf, font_family, lines, width, size):
+    # Shrink long lines to the label width instead of letting them run into the next label
+    while size > MIN_LABEL_FONT_SIZE:
+        pdf.set_font(font_family, '', size)
+        if max(pdf.get_string_width(line) for line in lines) <= width: break
+        size -= 0.5
+    pdf.set_font(font_family, '', size)
+    return size
+
+def create_label_sheet(addresses, layout="5160"):
+    """
+    Address labels on Avery-style sheets (see LABEL_LAYOUTS), filled row by row.
+    Recipients without any address text are skipped.
+    Returns PDF bytes, or None if nothing could be rendered.
+    """
+    spec = LABEL_LAYOUTS[layout]
+    per_sheet = spec["cols"] * spec["rows"]
+    try:
+        pdf = FPDF(orientation='P', unit='mm', format='Letter')
+        pdf.set_auto_page_break(False)
+        pdf.set_margins(0, 0, 0)
+        font_family = 'TypeRight' if font_cache.register_font(pdf, 'TypeRight') else 'Courier'
+        inner_w = spec["w"] - 2 * LABEL_PADDING_MM
+
+        slot = 0
+        for addr in addresses:
+            lines = build_block(addr).split("\n")
+            if not lines[0]: continue
+            if slot % per_sheet == 0: pdf.add_page()
+            row, col = divmod(slot % per_sheet, spec["cols"])
+            x = spec["left"] + col * spec["pitch_x"]
+            y = spec["top"] + row * spec["pitch_y"]
+
+            size = _fit_font_size(pdf, font_family, lines, inner_w, spec["font_size"])
+            line_h = size * 0.3528 * 1.2  # pt -> mm, plus leading
+            y_text = y + max(LABEL_PADDING_MM / 2, (spec["h"] - line_h * len(lines)) / 2)
+            for i, line in enumerate(lines):
+                pdf.set_xy(x + LABEL_PADDING_MM, y_text + i * line_h)
+                pdf.cell(inner_w, line_h, line)
+            slot += 1
+
+        if not slot: return None
+        return _output(pdf)
+    except Exception as e:
+        logger.error(f"Label Sheet Error: {e}")
+        return None
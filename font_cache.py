@@ -0,0 +1,178 @@
+"""
+Process-wide TTF cache for letter_format / envelope_format.
+
+pdf.add_font() re-reads the file, rebuilds the width table for every
+codepoint and, at output time, fontTools recompiles every embedded glyph
+(recalcBBoxes). For a print batch that dominated render time. Here each
+font is parsed once per process; every document gets a cheap copy that
+shares the read-only metrics (cw, cmap, glyph_ids, descriptor) and a fresh
+fontTools handle over the cached bytes, so per-document subsetting state
+never leaks between PDFs.
+"""
+import copy
+import io
+import logging
+import os
+import threading
+import time
+
+from fpdf import FPDF
+from fpdf.fonts import TTFFont
+from fontTools import ttLib
+# Private fpdf2 internals (tested on 2.8.x, pinned in requirements.txt). If a
+# release moves them, fonts load through the plain add_font() path instead.
+try: from fpdf.fonts import SubsetMap
+except ImportError: SubsetMap = None
+
+logger = logging.getLogger(__name__)
+
+# fontTools logs every subset step at INFO; letter_format configures the root
+# logger at INFO, which turned each PDF into ~60 log lines.
+logging.getLogger("fontTools").setLevel(logging.WARNING)
+
+# --- CONFIGURATION ---
+# Same probe order the renderers used: assets/fonts first, repo root fallback
+FONT_CANDIDATES = {
+    "TypeRight": [os.path.join("assets", "fonts", "type_right.ttf"), "type_right.ttf"],
+}
+
+CACHE_ENABLED = True  # benchmarks flip this to measure the uncached path
+
+_templates = {}  # family -> (CachedTTFFont template, font bytes) or None if unavailable
+_lock = threading.Lock()
+_stats = {"parses": 0, "hits": 0, "fallbacks": 0, "parse_seconds": 0.0}
+
+# TTFFont attributes the cache copies or resets per document
+_FONT_ATTRS = ("cw", "ttfont", "subset", "missing_glyphs", "biggest_size_pt", "i", "_hbfont")
+
+class CachedTTFFont(TTFFont):
+    """
+    TTFFont whose width lookup is incremental: fpdf's line breaker asks for
+    the width of each growing prefix of a line, which is quadratic with a
+    plain sum. Widths are integer font units, so the running total is exact.
+    """
+    __slots__ = ("_last_text", "_last_units")
+
+    def get_text_width(self, text, font_size_pt, text_shaping_params):
+        if text_shaping_params:
+            return super().get_text_width(text, font_size_pt, text_shaping_params)
+        try:
+            return self._incremental_width(text, font_size_pt)
+        except (AttributeError, TypeError, LookupError):
+            # fpdf internals not shaped as expected: plain (uncached) width
+            self._last_text, self._last_units = None, 0
+            return super().get_text_width(text, font_size_pt, text_shaping_params)
+
+    def _incremental_width(self, text, font_size_pt):
+        if font_size_pt > self.biggest_size_pt:
+            self.biggest_size_pt = font_size_pt
+        mapped = self._map_symbol_text(text)
+        cw = self.cw
+        if len(mapped) <= 1:
+            # Per-character probes are interleaved with the prefix calls; keep them off the memo
+            return len(mapped), (cw[ord(mapped)] if mapped else 0) * font_size_pt * 0.001
+        last = getattr(self, "_last_text", None)
+        if last and mapped.startswith(last):
+            units = self._last_units + sum(cw[ord(c)] for c in mapped[len(last):])
+        else:
+            units = sum(cw[ord(c)] for c in mapped)
+        self._last_text, self._last_units = mapped, units
+        return len(mapped), units * font_size_pt * 0.001
+
+def resolve_font_path(family):
+    for path in FONT_CANDIDATES.get(family, []):
+        if os.path.exists(path): return path
+    return None
+
+def internals_supported(font=None):
+    """True if this fpdf2 has the private pieces the cache relies on."""
+    if SubsetMap is None or not hasattr(TTFFont, "_map_symbol_text"): return False
+    return font is None or all(hasattr(font, attr) for attr in _FONT_ATTRS)
+
+def _load(family):
+    """Parses the TTF once. Returns (template, bytes) or None."""
+    path = resolve_font_path(family)
+    if not path or not internals_supported(): return None
+    started = time.perf_counter()
+    with open(path, "rb") as f: data = f.read()
+    # A missing .notdef is patched into the parsed glyf table by fpdf; that
+    # fix can't be replayed onto a fresh handle, so such fonts stay uncached.
+    probe = ttLib.TTFont(io.BytesIO(data), lazy=True)
+    if "glyf" in probe and ".notdef" not in probe["glyf"]: return None
+    template = CachedTTFFont(FPDF(), path, family.lower(), "")
+    if not internals_supported(template):
+        logger.warning(f"Font cache disabled for {family}: unsupported fpdf2 version")
+        return None
+    _stats["parses"] += 1
+    _stats["parse_seconds"] += time.perf_counter() - started
+    return template, data
+
+def _get_template(family):
+    with _lock:
+        if family not in _templates:
+            try:
+                _templates[family] = _load(family)
+            except Exception as e:
+                logger.error(f"Font Cache Load Error ({family}): {e}")
+                _templates[family] = None
+        return _templates[family]
+
+def _attach(pdf, family, template, data):
+    font = copy.copy(template)
+    font.i = len(pdf.fonts) + 1
+    # Fresh handle: output() subsets it in place. recalcBBoxes=False lets
+    # fontTools copy untouched glyph bytes instead of recompiling outlines.
+    font.ttfont = ttLib.TTFont(io.BytesIO(data), recalcTimestamp=False, recalcBBoxes=False, lazy=True)
+    font.subset = SubsetMap(font)
+    font.missing_glyphs = []
+    font.biggest_size_pt = 0
+    font._hbfont = None
+    font._last_text, font._last_units = None, 0
+    pdf.fonts[family.lower()] = font
+
+def register_font(pdf, family):
+    """
+    Makes `family` available on this FPDF instance.
+    Returns True if the font was added, False if the caller should fall back
+    to a core font (file missing or unreadable).
+    """
+    if family.lower() in pdf.fonts: return True
+
+    entry = _get_template(family) if CACHE_ENABLED else None
+    if entry:
+        try:
+            _attach(pdf, family, *entry)
+            with _lock: _stats["hits"] += 1
+            return True
+        except Exception as e:
+            logger.error(f"Font Cache Attach Error ({family}): {e}")
+
+    # Uncached path (original behaviour)
+    path = resolve_font_path(family)
+    if not path: return False
+    try:
+        pdf.add_font(family, '', path)
+        with _lock: _stats["fallbacks"] += 1
+        return True
+    except Exception as e:
+        logger.error(f"Font Load Error: {e}")
+        return False
+
+def warm(families=None):
+    """Parses fonts up front (app start, print workers) so the first letter doesn't pay for it."""
+    families = list(families or FONT_CANDIDATES)
+    fresh = any(f not in _templates for f in families)
+    loaded = [f for f in families if _get_template(f)]
+    if fresh: logger.info(f"Font cache warmed: {', '.join(loaded) or 'none'}")
+    return loaded
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["cached"] = sorted(k for k, v in _templates.items() if v)
+    return stats
+
+def reset():
+    with _lock:
+        _templates.clear()
+        for k in _stats: _stats[k] = 0.0 if k == "parse_seconds" else 0
@@ -3,21 +3,48 @@ import requests
 import io
 import streamlit as st
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from twilio.rest import Client
 
 # --- ROBUST SECRETS IMPORT ---
 try: import secrets_manager
 except ImportError: secrets_manager = None
+try: import client_registry
+except ImportError: client_registry = None
 
 # --- IMPORTS ---
 try: import ai_engine
 except ImportError: ai_engine = None
 try: import storage_engine
 except ImportError: storage_engine = None
+try: import rendition_engine
+except ImportError: rendition_engine = None
+try: import database
+except ImportError: database = None
+try: import recording_sync
+except ImportError: recording_sync = None
 
 logger = logging.getLogger(__name__)
 
+# Upload + transcription run side by side per story; a few stories may overlap
+PIPELINE_WORKERS = 4
+# A phone-index hit is trusted without asking Twilio when the mirror synced this recently
+FRESH_SYNC_SECONDS = 60
+# Newest account calls checked for a newer call on the number (more = not sure, rescan)
+FRESHNESS_CALLS = 50
+_pipeline_pool = None
+_pipeline_lock = threading.Lock()
+
 def _get_twilio_client():
+    """
+    Returns the shared Twilio client (built once per process).
+    """
+    if client_registry:
+        return client_registry.get_client("twilio", _build_twilio_client)
+    return _build_twilio_client()
+
+def _build_twilio_client():
     """
     Robust Client Loader.
     Checks Secrets Manager first (Prod/GCP), then st.secrets (Local/QA).
@@ -51,6 +78,71 @@ def _get_twilio_client():
             
     return None
 
+def _normalize_phone(parent_phone):
+    if ai_engine and hasattr(ai_engine, "_normalize_phone"):
+        return ai_engine._normalize_phone(parent_phone)
+    # Simple normalization
+    clean_phone = "".join(filter(str.isdigit, str(parent_phone)))
+    if len(clean_phone) == 10: return f"+1{clean_phone}"
+    return f"+{clean_phone}"
+
+def _scan_twilio_for_latest_recording(client, clean_phone):
+    """
+    Legacy lookup: two calls.list requests plus one recordings.list per call.
+    Only used when the phone index has nothing for this number; whatever it
+    finds is written back so the next lookup is a local query.
+    """
+    # Search Inbound & Outbound
+    calls_in = client.calls.list(from_=clean_phone, limit=5)
+    calls_out = client.calls.list(to=clean_phone, limit=5)
+    all_calls = sorted(calls_in + calls_out, key=lambda c: c.date_created, reverse=True)
+    
+    for call in all_calls:
+        if call.status == 'completed':
+            recs = call.recordings.list()
+            if recs:
+                uri = recs[0].uri.replace(".json", "")
+                # Construct valid MP3 URL
+                target_url = f"https://api.twilio.com{uri}.mp3"
+                if database:
+                    database.upsert_twilio_calls([{
+                        "call_sid": call.sid, "phone": clean_phone, "direction": call.direction,
+                        "status": call.status, "date_created": call.date_created.replace(tzinfo=None) if call.date_created else None
+                    }])
+                    database.upsert_twilio_recordings([{
+                        "recording_sid": recs[0].sid, "call_sid": call.sid,
+                        "date_created": recs[0].date_created.replace(tzinfo=None) if recs[0].date_created else None,
+                        "duration": int(recs[0].duration) if recs[0].duration else None,
+                        "uri": f"{uri}.mp3", "media_url": target_url
+                    }])
+                return target_url
+    return None
+
+def _mirror_is_current():
+    """Recording callbacks write to the mirror as calls end, or a sync just ran."""
+    if ai_engine and ai_engine.webhooks_enabled(): return True
+    return bool(recording_sync and recording_sync.synced_within(FRESH_SYNC_SECONDS))
+
+def _has_newer_call(client, clean_phone, hit):
+    """
+    Narrow freshness check for a phone-index hit: the mirror is only as new
+    as its last sync, so look for a completed call on this number since the
+    mirrored recording. Skipped when the mirror is current; otherwise one
+    calls.list request (the account's newest calls since that day).
+    """
+    since = hit.get("date_created")
+    if not since: return True
+    if _mirror_is_current(): return False
+    calls = client.calls.list(start_time_after=since, limit=FRESHNESS_CALLS)
+    # Twilio filters StartTime by day, so compare exact times here
+    newer = any(
+        c.sid != hit["call_sid"] and clean_phone in (c.from_, c.to) and c.status == 'completed'
+        and c.date_created and c.date_created.replace(tzinfo=None) > since
+        for c in calls
+    )
+    # A full page may not reach back far enough to rule a newer call out
+    return newer or len(calls) >= FRESHNESS_CALLS
+
 def process_latest_call(parent_phone, user_email):
     """
     1. Finds latest call from parent_phone
@@ -64,26 +156,15 @@ def process_latest_call(parent_phone, user_email):
     
     # 1. FIND CALL
     try:
-        # Simple normalization
-        clean_phone = "".join(filter(str.isdigit, str(parent_phone)))
-        if not clean_phone.startswith("+"): 
-            if len(clean_phone) == 10: clean_phone = f"+1{clean_phone}"
-            else: clean_phone = f"+{clean_phone}"
-
-        # Search Inbound & Outbound
-        calls_in = client.calls.list(from_=clean_phone, limit=5)
-        calls_out = client.calls.list(to=clean_phone, limit=5)
-        all_calls = sorted(calls_in + calls_out, key=lambda c: c.date_created, reverse=True)
-        
+        clean_phone = _normalize_phone(parent_phone)
+
+        # Phone index: one indexed query against the local recordings mirror
         target_url = None
-        for call in all_calls:
-            if call.status == 'completed':
-                recs = call.recordings.list()
-                if recs:
-                    uri = recs[0].uri.replace(".json", "")
-                    # Construct valid MP3 URL
-                    target_url = f"https://api.twilio.com{uri}.mp3"
-                    break
+        hit = database.get_latest_recording_for_phone(clean_phone) if database else None
+        if hit and not _has_newer_call(client, clean_phone, hit): target_url = hit["media_url"]
+
+        # Cold or stale index (call newer than the last sync): fall back to scanning Twilio
+        if not target_url: target_url = _scan_twilio_for_latest_recording(client, clean_phone)
         
         if not target_url: return None, None, "No recordings found."
 
@@ -91,23 +172,60 @@ def process_latest_call(parent_phone, user_email):
 
     # 2. DOWNLOAD AUDIO
     try:
-        resp = requests.get(target_url, auth=(client.username, client.password))
+        http = client_registry.get_http_session() if client_registry else None
+        resp = (http or requests).get(target_url, auth=(client.username, client.password))
         if resp.status_code != 200: return None, None, "Download Failed"
         
         audio_bytes = resp.content
     except Exception as e: return None, None, f"Download Error: {e}"
 
-    # 3. UPLOAD TO VAULT
-    storage_path = None
-    if storage_engine:
-        storage_path = storage_engine.upload_audio(user_email, audio_bytes)
-
-    # 4. TRANSCRIBE
-    transcript = ""
-    if ai_engine:
-        # Create a file-like object for Whisper
-        with io.BytesIO(audio_bytes) as f:
-            f.name = "story.mp3" # Whisper needs a filename hint
-            transcript = ai_engine.transcribe_audio(f)
+    # 3 + 4. UPLOAD TO VAULT || TRANSCRIBE (one download feeds both)
+    transcript, storage_path = store_and_transcribe(audio_bytes, user_email)
     
-    return transcript, storage_path, None
\ No newline at end of file
+    return transcript, storage_path, None
+
+# ==========================================
+# 🔀 TEE PIPELINE
+# ==========================================
+
+def _get_pipeline_pool():
+    global _pipeline_pool
+    with _pipeline_lock:
+        if _pipeline_pool is None:
+            _pipeline_pool = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="audio-tee")
+        return _pipeline_pool
+
+def _upload_stage(user_email, audio_bytes):
+    if not storage_engine: return None
+    return storage_engine.upload_audio(user_email, audio_bytes)
+
+def _transcribe_stage(audio_bytes):
+    if not ai_engine: return ""
+    # Create a file-like object for Whisper
+    with io.BytesIO(audio_bytes) as f:
+        f.name = "story.mp3" # Whisper needs a filename hint
+        return ai_engine.transcribe_audio(f)
+
+def _join(future, stage):
+    try:
+        return future.result()
+    except Exception as e:
+        logger.error(f"{stage} Stage Failed: {e}")
+        return None
+
+def store_and_transcribe(audio_bytes, user_email):
+    """
+    Tee stage: the already-downloaded bytes feed the vault upload and Whisper
+    concurrently (neither depends on the other), so wall time is roughly
+    max(upload, transcribe) instead of their sum.
+    Returns: (transcript_text, storage_path)
+    """
+    pool = _get_pipeline_pool()
+    upload_future = pool.submit(_upload_stage, user_email, audio_bytes)
+    transcribe_future = pool.submit(_transcribe_stage, audio_bytes)
+
+    storage_path = _join(upload_future, "Upload")
+    # Playback renditions are built in the background from the same bytes
+    if storage_path and rendition_engine: rendition_engine.submit(storage_path, audio_bytes)
+    transcript = _join(transcribe_future, "Transcription") or ""
+    return transcript, storage_path
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# --- IMPORTS ---
+try: import secrets_manager
+except ImportError: secrets_manager = None
+try: import database
+except ImportError: database = None
+try: import ai_engine
+except ImportError: ai_engine = None
+try: import audit_engine
+except ImportError: audit_engine = None
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Twilio's default outbound limit is 1 call per second per account; raise
+# twilio.cps once the account has a higher CPS allocation.
+DEFAULT_CPS = 1
+BATCH_SIZE = 50
+POLL_INTERVAL_SECONDS = 30
+# A 'Dialing' lease older than this is from a scheduler that died mid-batch
+# (a full batch takes BATCH_SIZE / cps seconds), so its rows are re-leased.
+LEASE_TIMEOUT_SECONDS = 600
+# A placed call whose SID couldn't be saved is never re-dialed: the save is
+# retried (now, then every tick) until it lands.
+SAVE_ATTEMPTS = 3
+SAVE_RETRY_SECONDS = 1.0
+
+_unsaved = {}  # project_id -> call_sid, dialed but not yet written
+_unsaved_lock = threading.Lock()
+
+_thread = None
+_thread_lock = threading.Lock()
+_limiter = None
+
+def _get_secret(key):
+    if secrets_manager: return secrets_manager.get_secret(key)
+    return None
+
+def get_limiter():
+    """Process-wide bucket so every dispatch path shares one CPS budget."""
+    global _limiter
+    if _limiter is None:
+        try: cps = float(_get_secret("twilio.cps") or DEFAULT_CPS)
+        except ValueError: cps = DEFAULT_CPS
+        _limiter = TokenBucket(rate=cps, capacity=max(1, int(cps)))
+    return _limiter
+
+def _dial(job, limiter):
+    limiter.acquire()
+    sid, err = ai_engine.trigger_outbound_call(
+        to_phone=job["phone"],
+        advisor_name=job["firm_name"],
+        firm_name=job["firm_name"],
+        project_id=job["id"],
+        question_text=job["prompt"]
+    )
+    # Saved right away: Twilio's status / recording callbacks look the call up by SID
+    if sid: _save_sid(job["id"], sid)
+    elif not database.record_call_sids([], [job["id"]]):
+        logger.error(f"Project {job['id']}: could not mark the failed call")
+    return job, sid, err
+
+def _save_sid(project_id, sid):
+    for attempt in range(SAVE_ATTEMPTS):
+        if database.record_call_sids([{"id": project_id, "call_sid": sid}]): return True
+        time.sleep(SAVE_RETRY_SECONDS * (attempt + 1))
+    logger.error(f"Project {project_id}: call {sid} placed but not saved; retrying the save each tick")
+    with _unsaved_lock: _unsaved[project_id] = sid
+    return False
+
+def _flush_unsaved():
+    with _unsaved_lock: pending = dict(_unsaved)
+    if pending and database.record_call_sids([{"id": pid, "call_sid": sid} for pid, sid in pending.items()]):
+        with _unsaved_lock:
+            for pid in pending: _unsaved.pop(pid, None)
+    with _unsaved_lock: return list(_unsaved)
+
+def dispatch_due_interviews(batch_size=BATCH_SIZE, limiter=None):
+    """
+    One scheduler tick: lease due projects (plus stale leases) and dial them
+    under the rate limit, saving each call SID as soon as it is known.
+    Returns: (dispatched_count, failed_count)
+    """
+    if not database or not ai_engine: return 0, 0
+    limiter = limiter or get_limiter()
+
+    still_unsaved = _flush_unsaved()
+    stale_before = datetime.utcnow() - timedelta(seconds=LEASE_TIMEOUT_SECONDS)
+    reclaimed = database.reclaim_stale_leases(stale_before, exclude_ids=still_unsaved)
+    if reclaimed: logger.warning(f"Scheduler: re-queued {reclaimed} interviews from a stale lease")
+    jobs = database.lease_due_interviews(limit=batch_size)
+    if not jobs: return 0, 0
+
+    dispatched, failed = [], []
+    no_phone = [j for j in jobs if not j.get("phone")]
+    dialable = [j for j in jobs if j.get("phone")]
+    failed.extend(j["id"] for j in no_phone)
+    if no_phone: database.record_call_sids([], failed)
+
+    # A few workers hide Twilio API latency; the bucket still caps calls/sec
+    workers = max(1, min(len(dialable), int(limiter.rate * 2) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for job, sid, err in pool.map(lambda j: _dial(j, limiter), dialable):
+            if sid:
+                dispatched.append(sid)
+                if audit_engine:
+                    audit_engine.log_event(job["client_email"], "Interview Started", metadata={"sid": sid, "project_id": job["id"], "scheduled": True})
+            else:
+                logger.error(f"Scheduled call for project {job['id']} failed: {err}")
+                failed.append(job["id"])
+
+    logger.info(f"Scheduler: dispatched {len(dispatched)}, failed {len(failed)}")
+    return len(dispatched), len(failed)
+
+def run_forever(poll_interval=POLL_INTERVAL_SECONDS, stop_event=None):
+    while not (stop_event and stop_event.is_set()):
+        try:
+            dispatched, _ = dispatch_due_interviews()
+        except Exception as e:
+            logger.error(f"Scheduler Tick Error: {e}")
+            dispatched = 0
+        # Drain a backlog back-to-back; otherwise sleep until the next scan
+        if dispatched: continue
+        if stop_event: stop_event.wait(poll_interval)
+        else: time.sleep(poll_interval)
+
+def ensure_running():
+    """Starts the scheduler thread once per process when scheduler.enabled is set."""
+    global _thread
+    if str(_get_secret("scheduler.enabled") or "").lower() not in ("1", "true", "yes"): return None
+    with _thread_lock:
+        if _thread and _thread.is_alive(): return _thread
+        _thread = threading.Thread(target=run_forever, name="interview-scheduler", daemon=True)
+        _thread.start()
+        return _thread
+
+if __name__ == "__main__":
+    run_forever()
@@ -6,6 +6,10 @@ import logging
 import tempfile
 import qrcode
 from datetime import datetime
+from functools import lru_cache
+import font_cache
+try: import render_cache
+except ImportError: render_cache = None
 
 # --- LOGGING SETUP ---
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +21,16 @@ MARGIN_MM = 38.1  # 1.5 inch Side Margins
 PAGE_WIDTH_MM = 215.9 
 PAGE_HEIGHT_MM = 279.4
 
+# Bump when the layout changes so cached renders (render_cache) are not reused
+TEMPLATE_VERSION = "1"
+
+# QR PNGs are memoized per player link (admin re-downloads, print batches)
+QR_CACHE_SIZE = 512
+
+# Letter body text; campaign_template stamps the salutation line with the same values
+BODY_FONT_SIZE = 11
+BODY_LINE_MM = 6
+
 class LetterPDF(FPDF):
     """
     Custom PDF class for the Family Legacy Archive.
@@ -68,46 +82,32 @@ def create_pdf(body_text, to_addr, from_addr, advisor_firm="VerbaPost Archives",
     """
     Generates the Single Standard 'Manuscript' PDF.
     Now supports 'question_text' to appear in the dedication block.
+    Repeat renders of the same letter on the same day come from render_cache.
     """
+    rec_date = datetime.now().strftime("%B %d, %Y")
+    cache_key = None
+    if render_cache:
+        cache_key = render_cache.make_key(
+            "letter", TEMPLATE_VERSION, body_text=body_text, to_addr=to_addr, from_addr=from_addr,
+            advisor_firm=advisor_firm, audio_url=audio_url, is_marketing=is_marketing, question_text=question_text,
+            rec_date=rec_date, font=font_cache.resolve_font_path('TypeRight')
+        )
+        cached = render_cache.get(cache_key)
+        if cached: return cached
+
     try:
         # Disable footer for Marketing
         footer_txt = f"Preserved by {advisor_firm}" if not is_marketing else ""
         pdf = LetterPDF(footer_text=footer_txt)
         
-        # 2. Load Vintage Font
-        font_family = 'Courier' 
-        font_path = os.path.join("assets", "fonts", "type_right.ttf")
-        
-        if os.path.exists(font_path):
-            try:
-                pdf.add_font('TypeRight', '', font_path, uni=True)
-                font_family = 'TypeRight'
-            except Exception as e:
-                logger.error(f"Font Load Error: {e}")
-        elif os.path.exists("type_right.ttf"):
-            try:
-                pdf.add_font('TypeRight', '', 'type_right.ttf', uni=True)
-                font_family = 'TypeRight'
-            except: pass
+        # 2. Load Vintage Font (parsed once per process, see font_cache)
+        font_family = 'TypeRight' if font_cache.register_font(pdf, 'TypeRight') else 'Courier'
         
         pdf.add_page()
         pdf.set_text_color(0, 0, 0)
         
         if is_marketing:
-            # --- MARKETING HEADER (Unbranded) ---
-            pdf.set_font(font_family, '', 12)
-            
-            sender_name = _safe_get(from_addr, 'name')
-            sender_addr = _safe_get(from_addr, 'address_line1')
-            sender_city = _safe_get(from_addr, 'city') 
-            
-            if sender_name: pdf.cell(0, 5, sender_name, ln=1, align='L')
-            if sender_addr: pdf.cell(0, 5, sender_addr, ln=1, align='L')
-            
-            # If city/state was parsed into 'city' field
-            if sender_city and sender_city != sender_addr: 
-                 pdf.cell(0, 5, sender_city, ln=1, align='L')
-
+            _marketing_header(pdf, font_family, from_addr)
             pdf.ln(10) 
             
         else:
@@ -125,7 +125,6 @@ def create_pdf(body_text, to_addr, from_addr, advisor_firm="VerbaPost Archives",
             pdf.ln(6)
             
             storyteller = _safe_get(from_addr, 'name') or "The Family"
-            rec_date = datetime.now().strftime("%B %d, %Y")
             
             # --- INFO BLOCK (CENTERED & STACKED) ---
             pdf.set_font(font_family, '', 10)
@@ -151,23 +150,73 @@ def create_pdf(body_text, to_addr, from_addr, advisor_firm="VerbaPost Archives",
             pdf.ln(15) 
 
         # --- THE BODY ---
-        pdf.set_font(font_family, '', 11)
+        pdf.set_font(font_family, '', BODY_FONT_SIZE)
         safe_body = _sanitize_text(body_text)
-        pdf.multi_cell(0, 6, safe_body)
+        pdf.multi_cell(0, BODY_LINE_MM, safe_body)
         
         # --- AUDIO QR CODE ---
         if audio_url and not is_marketing:
             _add_audio_qr(pdf, audio_url, PAGE_WIDTH_MM, PAGE_HEIGHT_MM, MARGIN_MM)
 
         raw_output = pdf.output(dest='S')
-        if isinstance(raw_output, str): return raw_output.encode('latin-1')
-        elif isinstance(raw_output, bytearray): return bytes(raw_output)
-        return raw_output
+        if isinstance(raw_output, str): pdf_bytes = raw_output.encode('latin-1')
+        elif isinstance(raw_output, bytearray): pdf_bytes = bytes(raw_output)
+        else: pdf_bytes = raw_output
+
+        if render_cache: render_cache.put(cache_key, pdf_bytes)
+        return pdf_bytes
         
     except Exception as e:
         logger.error(f"PDF Generation Failed: {e}")
         return _create_error_pdf(str(e))
 
+def _marketing_header(pdf, font_family, from_addr):
+    # --- MARKETING HEADER (Unbranded) ---
+    pdf.set_font(font_family, '', 12)
+    
+    sender_name = _safe_get(from_addr, 'name')
+    sender_addr = _safe_get(from_addr, 'address_line1')
+    sender_city = _safe_get(from_addr, 'city') 
+    
+    if sender_name: pdf.cell(0, 5, sender_name, ln=1, align='L')
+    if sender_addr: pdf.cell(0, 5, sender_addr, ln=1, align='L')
+    
+    # If city/state was parsed into 'city' field
+    if sender_city and sender_city != sender_addr: 
+         pdf.cell(0, 5, sender_city, ln=1, align='L')
+
+def create_campaign_template(body_text, from_addr, salutation=False):
+    """
+    Marketing letter for a bulk campaign, laid out like create_pdf(...,
+    is_marketing=True) but with the salutation line left blank, so the shared
+    body is typeset once per campaign instead of once per recipient (see
+    campaign_template).
+    Returns: (pdf_bytes, layout) - layout = {"font", "salutation_y"}, mm on page 1
+    """
+    pdf = LetterPDF(footer_text="")
+    font_family = 'TypeRight' if font_cache.register_font(pdf, 'TypeRight') else 'Courier'
+    pdf.add_page()
+    pdf.set_text_color(0, 0, 0)
+
+    _marketing_header(pdf, font_family, from_addr)
+    pdf.ln(10)
+    layout = {"font": font_family, "salutation_y": None}
+    if salutation:
+        layout["salutation_y"] = pdf.get_y()
+        pdf.ln(BODY_LINE_MM)
+
+    # --- THE BODY ---
+    pdf.set_font(font_family, '', BODY_FONT_SIZE)
+    pdf.multi_cell(0, BODY_LINE_MM, _sanitize_text(body_text))
+    return bytes(pdf.output()), layout
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def _qr_png(player_link):
+    """PNG bytes for a player link. Bytes, not a buffer, so cached entries can't be consumed."""
+    buf = io.BytesIO()
+    qrcode.make(player_link).save(buf, format="PNG")
+    return buf.getvalue()
+
 def _add_audio_qr(pdf, audio_url, w, h, margin, recipient_id=None):
     """
     Generates a QR code with UTM tracking tags.
@@ -185,27 +234,21 @@ def _add_audio_qr(pdf, audio_url, w, h, margin, recipient_id=None):
         # Ideally: https://app.verbapost.com/?play=123&utm_source=physical_mail...
         player_link = f"https://app.verbapost.com/{tracker}&play={safe_id}"
         
-        # --- QR GENERATION ---
-        qr_img = qrcode.make(player_link)
+        # --- QR GENERATION (in memory, cached per link) ---
+        y_pos = pdf.get_y() + 15
         
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_qr:
-            qr_img.save(tmp_qr.name)
-            y_pos = pdf.get_y() + 15
-            
-            # Page Break Logic
-            if y_pos > (h - margin - 40): 
-                pdf.add_page()
-                y_pos = margin + 10
-            
-            x_center = (w - 30) / 2
-            pdf.image(tmp_qr.name, x=x_center, y=y_pos, w=30)
-            
-            # Caption
-            pdf.set_y(y_pos + 32)
-            pdf.set_font("Helvetica", size=8) 
-            pdf.cell(0, 5, "Scan to listen to the original recording", align='C', ln=1)
-            
-        os.unlink(tmp_qr.name)
+        # Page Break Logic
+        if y_pos > (h - margin - 40): 
+            pdf.add_page()
+            y_pos = margin + 10
+        
+        x_center = (w - 30) / 2
+        pdf.image(io.BytesIO(_qr_png(player_link)), x=x_center, y=y_pos, w=30)
+        
+        # Caption
+        pdf.set_y(y_pos + 32)
+        pdf.set_font("Helvetica", size=8) 
+        pdf.cell(0, 5, "Scan to listen to the original recording", align='C', ln=1)
     except Exception as e:
         logger.error(f"QR Error: {e}")
 
@@ -213,5 +256,5 @@ def _create_error_pdf(msg):
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Courier", size=12)
-    pdf.cell(0, 10, f"Error: {msg}", ln=1)
-    return pdf.output(dest='S').encode('latin-1')
\ No newline at end of file
+    pdf.cell(0, 10, f"Error: {_sanitize_text(msg)}", ln=1)
+    return bytes(pdf.output())
\ No newline at end of file
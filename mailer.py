@@ -1,8 +1,19 @@
 import requests
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
 import streamlit as st
 import logging
+from address_standard import StandardAddress, check_address, normalize_text
+
+# --- IMPORTS ---
+try: import database
+except ImportError: database = None
+try: import client_registry
+except ImportError: client_registry = None
 
 # --- LOGGING SETUP ---
 logging.basicConfig(level=logging.INFO)
@@ -11,6 +22,18 @@ logger = logging.getLogger(__name__)
 # --- CONFIGURATION ---
 # We use the Print & Mail API for everything since that is likely the key you have.
 POSTGRID_BASE_URL = "https://api.postgrid.com/print-mail/v1"
+REQUEST_TIMEOUT = 30
+# Throttles and PostGrid-side hiccups are retried (with the same Idempotency-Key
+# for letters, so a retry can never mail twice); 4xx rejections are not.
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+RETRY_BACKOFF_SECONDS = 1.0
+
+# Address verdicts are cached by fingerprint (memory, then the
+# address_validations table). Rejections expire sooner so a fixed typo in
+# PostGrid's data or ours gets a fresh look. Soft passes are never cached.
+VALID_TTL = timedelta(days=30)
+INVALID_TTL = timedelta(days=1)
+MEMORY_CACHE_SIZE = 5000
 
 def get_api_key():
     """Retrieves PostGrid API Key from secrets."""
@@ -18,42 +41,128 @@ def get_api_key():
         return st.secrets["postgrid"].get("api_key")
     return os.environ.get("POSTGRID_API_KEY")
 
-def validate_address(address_dict):
+def _http():
+    if client_registry: return client_registry.get_http_session()
+    return requests
+
+# ==========================================
+# 🔑 ADDRESS FINGERPRINT CACHE
+# ==========================================
+
+_cache_lock = threading.Lock()
+_memory_cache = OrderedDict() # address_fp -> {"valid", "message", "checked_at", "contacts": {name_key: id}}
+_cache_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "api_calls": 0}
+
+def address_fingerprint(address_dict):
     """
-    Validates address by attempting to create a Contact in PostGrid.
-    This works with the Print & Mail API key.
+    Stable hash of the mailing part of an address (no name), using the
+    StandardAddress USPS rules: "12 Elm Street" / "12  elm st." / ZIP
+    78701-1234 all share one fingerprint.
     """
-    api_key = get_api_key()
-    if not api_key: 
-        logger.warning("PostGrid Key missing. Skipping validation (Soft Pass).")
-        return True, "Dev Mode: Validation Skipped"
+    return StandardAddress.from_dict(address_dict).fingerprint()
+
+def _name_key(address_dict):
+    return normalize_text((address_dict or {}).get('name'))
+
+def _fresh(valid, checked_at):
+    if not checked_at: return False
+    if isinstance(checked_at, str):
+        try: checked_at = datetime.fromisoformat(checked_at)
+        except ValueError: return False
+    return datetime.utcnow() - checked_at < (VALID_TTL if valid else INVALID_TTL)
 
-    # Use the Contacts endpoint. If the address is invalid, PostGrid returns a 400.
-    url = f"{POSTGRID_BASE_URL}/contacts"
+def _remember(address_fp, entry):
+    # Caller holds _cache_lock
+    _memory_cache[address_fp] = entry
+    _memory_cache.move_to_end(address_fp)
+    while len(_memory_cache) > MEMORY_CACHE_SIZE: _memory_cache.popitem(last=False)
 
+def _cached(address_fp):
+    """Fresh cache entry for a fingerprint, or None. Memory first, then the DB."""
+    with _cache_lock:
+        entry = _memory_cache.get(address_fp)
+        if entry and _fresh(entry["valid"], entry["checked_at"]):
+            _memory_cache.move_to_end(address_fp)
+            _cache_stats["memory_hits"] += 1
+            return entry
+
+    rows = database.get_address_validations(address_fp) if database else []
+    # The latest verdict wins; contacts are only reusable while the address is valid
+    rows = [r for r in rows if _fresh(r["valid"], r["checked_at"])]
+    with _cache_lock:
+        if not rows:
+            _cache_stats["misses"] += 1
+            return None
+        latest = max(rows, key=lambda r: str(r["checked_at"]))
+        entry = {
+            "valid": latest["valid"], "message": latest["message"], "checked_at": latest["checked_at"],
+            "contacts": {r["name_key"]: r["contact_id"] for r in rows if r["valid"] and r["contact_id"]} if latest["valid"] else {}
+        }
+        _remember(address_fp, entry)
+        _cache_stats["db_hits"] += 1
+        return entry
+
+def _store(address_fp, valid, message=None, name_key="", contact_id=None):
+    now = datetime.utcnow()
+    with _cache_lock:
+        entry = _memory_cache.get(address_fp)
+        if not entry or entry["valid"] != valid:
+            entry = {"valid": valid, "message": message, "contacts": {}}
+        entry["message"], entry["checked_at"] = message, now
+        if contact_id: entry["contacts"][name_key] = contact_id
+        _remember(address_fp, entry)
+    if database: database.save_address_validation(address_fp, name_key, valid, message, contact_id)
+
+def get_address_cache_stats():
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["memory_entries"] = len(_memory_cache)
+    lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+    stats["hit_rate"] = round((stats["memory_hits"] + stats["db_hits"]) / lookups, 3) if lookups else 0.0
+    return stats
+
+def clear_address_cache():
+    """Drops the in-memory layer (the DB rows expire on their own)."""
+    with _cache_lock:
+        _memory_cache.clear()
+        for k in _cache_stats: _cache_stats[k] = 0
+
+# ==========================================
+# 📮 POSTGRID CONTACTS
+# ==========================================
+
+def _create_contact(address_dict, api_key, limiter=None):
+    """
+    Creates a PostGrid contact, which is also how PostGrid validates an address.
+    Returns: (status, result) - ("ok", contact), ("rejected", message) or ("error", message)
+    """
+    addr = StandardAddress.from_dict(address_dict)
     payload = {
-        "firstName": "Verification Check",
-        "addressLine1": address_dict.get('street') or address_dict.get('address_line1'),
-        "city": address_dict.get('city'),
-        "provinceOrState": address_dict.get('state'),
-        "postalOrZip": address_dict.get('zip_code') or address_dict.get('zip'),
-        "countryCode": address_dict.get('country', "US")
+        # Unnamed checks (signup form) still need a name on the contact
+        "firstName": addr.name or "Verification Check",
+        "addressLine1": addr.street,
+        "addressLine2": addr.address_line2 or None,
+        "city": addr.city,
+        "provinceOrState": addr.state,
+        "postalOrZip": addr.zip_code,
+        "countryCode": addr.country or "US"
     }
+    payload = {k: v for k, v in payload.items() if v is not None}
 
     headers = {
         "x-api-key": api_key,
         "Content-Type": "application/json"
     }
 
+    if limiter: limiter.acquire()
+    with _cache_lock: _cache_stats["api_calls"] += 1
     try:
-        # We try to create the contact. 
-        response = requests.post(url, json=payload, headers=headers)
-        
+        response = _http().post(f"{POSTGRID_BASE_URL}/contacts", json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
+
         if response.status_code in [200, 201]:
             # Success! The address is valid and mailable.
-            data = response.json()
-            return True, data
-            
+            return "ok", response.json()
+
         elif response.status_code == 400:
             # Address rejected
             error_msg = "Invalid Address"
@@ -64,23 +173,112 @@ def validate_address(address_dict):
                     error_msg = err_data['error'].get('message', str(err_data['error']))
             except:
                 pass
-            return False, f"PostGrid Rejected: {error_msg}"
-            
+            return "rejected", f"PostGrid Rejected: {error_msg}"
+
         else:
             logger.error(f"PostGrid Error {response.status_code}: {response.text}")
-            # If the API is down, we Soft Pass so we don't block signups
-            return True, f"Service Warning ({response.status_code})"
+            return "error", f"Service Warning ({response.status_code})"
 
     except Exception as e:
         logger.error(f"Validation Exception: {e}")
-        return True, "Validation Offline (Soft Pass)"
+        return "error", "Validation Offline (Soft Pass)"
 
-def send_letter(pdf_bytes, to_addr, from_addr, description="VerbaPost Letter"):
+def validate_address(address_dict):
+    """
+    Validates address by attempting to create a Contact in PostGrid.
+    This works with the Print & Mail API key.
+    Verdicts are cached by address fingerprint, so re-checking the same
+    address (any spelling variant) skips the network, and addresses that fail
+    the offline check (address_standard.check_address) never reach it.
+    Returns: (is_valid, contact_dict_or_message)
+      contact dict always has "id" and "cached": a fresh check returns the
+      PostGrid contact plus "cached": False; a cached verdict returns only
+      {"id", "cached": True}, with "id" None if this recipient has no
+      contact at the address yet (another name validated it).
+      Soft passes (no key, PostGrid down) return a message string.
+    """
+    _, address_error = check_address(address_dict)
+    if address_error: return False, address_error
+    api_key = get_api_key()
+    if not api_key: 
+        logger.warning("PostGrid Key missing. Skipping validation (Soft Pass).")
+        return True, "Dev Mode: Validation Skipped"
+
+    address_fp = address_fingerprint(address_dict)
+    entry = _cached(address_fp)
+    if entry:
+        if not entry["valid"]: return False, entry["message"]
+        # Only this recipient's contact: another name's contact at the same address isn't theirs
+        return True, {"id": entry["contacts"].get(_name_key(address_dict)), "cached": True}
+
+    status, result = _create_contact(address_dict, api_key)
+    if status == "ok":
+        _store(address_fp, True, name_key=_name_key(address_dict), contact_id=result.get('id'))
+        return True, {**result, "cached": False}
+    if status == "rejected":
+        _store(address_fp, False, message=result)
+        return False, result
+    # If the API is down, we Soft Pass so we don't block signups (and don't cache it)
+    return True, result
+
+def get_contact_id(address_dict, api_key=None, limiter=None):
+    """
+    PostGrid contact id for this recipient + address: cached, or created once
+    and cached. None if the address is rejected or PostGrid is unreachable.
+    """
+    api_key = api_key or get_api_key()
+    if not api_key or not address_dict: return None
+    address_fp = address_fingerprint(address_dict)
+    name_key = _name_key(address_dict)
+
+    entry = _cached(address_fp)
+    if entry:
+        if not entry["valid"]: return None
+        if name_key in entry["contacts"]: return entry["contacts"][name_key]
+
+    status, result = _create_contact(address_dict, api_key, limiter)
+    if status == "ok":
+        _store(address_fp, True, name_key=name_key, contact_id=result.get('id'))
+        return result.get('id')
+    if status == "rejected": _store(address_fp, False, message=result)
+    return None
+
+def _inline_fields(prefix, address_dict):
+    addr = StandardAddress.from_dict(address_dict)
+    fields = {
+        f"{prefix}[firstName]": addr.name,
+        f"{prefix}[addressLine1]": addr.street,
+        f"{prefix}[city]": addr.city,
+        f"{prefix}[provinceOrState]": addr.state,
+        f"{prefix}[postalOrZip]": addr.zip_code,
+        f"{prefix}[countryCode]": addr.country or "US",
+    }
+    if addr.address_line2: fields[f"{prefix}[addressLine2]"] = addr.address_line2
+    return fields
+
+def _retry_delay(response, attempt):
+    # Honour PostGrid's Retry-After on 429s, otherwise back off exponentially
+    try: return max(0.0, float(response.headers.get("Retry-After")))
+    except (AttributeError, TypeError, ValueError): return RETRY_BACKOFF_SECONDS * (2 ** attempt)
+
+def submit_letter(pdf_bytes, to_addr, from_addr, description="VerbaPost Letter", idempotency_key=None,
+                  limiter=None, max_attempts=1, use_contacts=True):
     """
     Sends PDF via PostGrid Print & Mail API.
+    With use_contacts, recipients are sent as cached PostGrid contact ids
+    (created on first use) instead of inline address fields, so repeat
+    sends to the same address don't create a new contact each time.
+    idempotency_key: sent as Idempotency-Key; PostGrid answers a repeat with
+    the original letter instead of mailing again. Required for max_attempts > 1.
+    limiter: optional rate_limiter.TokenBucket, one token per PostGrid request.
+    Returns: (letter_id, error_message)
     """
+    # Obviously bad recipients fail here, before any request (or retry) is made
+    _, address_error = check_address(to_addr)
+    if address_error: return None, f"Invalid Address: {address_error}"
     api_key = get_api_key()
-    if not api_key: return None
+    if not api_key: return None, "PostGrid Key Missing"
+    if max_attempts > 1 and not idempotency_key: raise ValueError("retries need an idempotency_key")
 
     url = f"{POSTGRID_BASE_URL}/letters"
 
@@ -88,40 +286,49 @@ def send_letter(pdf_bytes, to_addr, from_addr, description="VerbaPost Letter"):
         'pdf': ('letter.pdf', pdf_bytes, 'application/pdf')
     }
 
-    # Helper to clean dictionary keys for PostGrid form-data
     form_data = {
-        "to[firstName]": to_addr.get('name'),
-        "to[addressLine1]": to_addr.get('street'),
-        "to[city]": to_addr.get('city'),
-        "to[provinceOrState]": to_addr.get('state'),
-        "to[postalOrZip]": to_addr.get('zip'),
-        "to[countryCode]": "US",
-        
-        "from[firstName]": from_addr.get('name'),
-        "from[addressLine1]": from_addr.get('street'),
-        "from[city]": from_addr.get('city'),
-        "from[provinceOrState]": from_addr.get('state'),
-        "from[postalOrZip]": from_addr.get('zip'),
-        "from[countryCode]": "US",
-        
         "description": description,
         "color": "true",
         "express": "false"
     }
+    for prefix, addr in (("to", to_addr), ("from", from_addr)):
+        contact_id = get_contact_id(addr, api_key, limiter) if use_contacts else None
+        # Fall back to inline fields; PostGrid then reports any address problem on the letter itself
+        if contact_id: form_data[prefix] = contact_id
+        else: form_data.update(_inline_fields(prefix, addr))
 
-    try:
-        response = requests.post(
-            url,
-            headers={"x-api-key": api_key},
-            files=files,
-            data=form_data
-        )
+    headers = {"x-api-key": api_key}
+    if idempotency_key: headers["Idempotency-Key"] = idempotency_key
 
-        if response.status_code in [200, 201]:
-            return response.json().get('id')
-        else:
-            logger.error(f"PostGrid Send Failed: {response.text}")
-            return None
-    except Exception as e:
-        logger.error(f"PostGrid Exception: {e}")
-        return None
\ No newline at end of file
+    error = None
+    for attempt in range(max_attempts):
+        if limiter: limiter.acquire()
+        response = None
+        try:
+            response = _http().post(
+                url,
+                headers=headers,
+                files=files,
+                data=form_data,
+                timeout=REQUEST_TIMEOUT
+            )
+
+            if response.status_code in [200, 201]:
+                return response.json().get('id'), None
+            logger.error(f"PostGrid Send Failed ({response.status_code}): {response.text}")
+            error = f"PostGrid Error {response.status_code}"
+            if response.status_code not in RETRYABLE_STATUS: return None, error
+        except Exception as e:
+            # Timeouts land here too: the letter may have been created, which is what the key is for
+            logger.error(f"PostGrid Exception: {e}")
+            error = f"PostGrid Exception: {e}"
+        if attempt + 1 < max_attempts: time.sleep(_retry_delay(response, attempt))
+    return None, error
+
+def send_letter(pdf_bytes, to_addr, from_addr, description="VerbaPost Letter", use_contacts=True, idempotency_key=None):
+    """
+    Sends PDF via PostGrid Print & Mail API (see submit_letter).
+    Returns the PostGrid letter id, or None.
+    """
+    letter_id, _ = submit_letter(pdf_bytes, to_addr, from_addr, description, idempotency_key=idempotency_key, use_contacts=use_contacts)
+    return letter_id
@@ -14,6 +14,16 @@ try: import database
 except ImportError: database = None
 try: import payment_engine # <--- Added Import
 except ImportError: payment_engine = None
+try: import webhook_server
+except ImportError: webhook_server = None
+try: import interview_scheduler
+except ImportError: interview_scheduler = None
+try: import font_cache
+except ImportError: font_cache = None
+try: import campaign_worker
+except ImportError: campaign_worker = None
+try: import recording_sync
+except ImportError: recording_sync = None
 
 # --- PAGE CONFIG ---
 st.set_page_config(
@@ -31,6 +41,22 @@ def handle_logout():
     st.rerun()
 
 def main():
+    # 0. TWILIO CALLBACK RECEIVER (no-op unless webhook.port is configured)
+    if webhook_server:
+        webhook_server.ensure_running()
+    # Scheduled interview dialer (no-op unless scheduler.enabled is set)
+    if interview_scheduler:
+        interview_scheduler.ensure_running()
+    # Bulk campaign sender; picks up campaigns interrupted by a restart
+    if campaign_worker:
+        campaign_worker.ensure_running()
+    # Twilio recordings mirror behind the admin Ghost Calls scan
+    if recording_sync:
+        recording_sync.start_background_sync()
+    # Letter/envelope fonts are parsed once per process, not on the first print
+    if font_cache:
+        font_cache.warm()
+
     # 1. INITIALIZE STATE
     if "authenticated" not in st.session_state:
         st.session_state.authenticated = False
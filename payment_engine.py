@@ -9,6 +9,8 @@ logger = logging.getLogger(__name__)
 # --- AUDIT IMPORT ---
 try: import audit_engine
 except ImportError: audit_engine = None
+try: import client_registry
+except ImportError: client_registry = None
 
 # Try to import stripe safely
 try:
@@ -50,6 +52,16 @@ def get_api_key():
 
     return None
 
+def _configure_stripe(api_key):
+    """
+    Points the stripe module at our key once per process (via the client registry)
+    instead of re-assigning it on every call.
+    """
+    if client_registry:
+        client_registry.get_stripe(api_key)
+    elif stripe.api_key != api_key:
+        stripe.api_key = api_key
+
 def get_base_url():
     """
     Returns the application base URL.
@@ -85,7 +97,7 @@ def create_checkout_session(line_items, user_email, draft_id="Unknown", mode="pa
         st.error("⚠️ Payment Error: Stripe API Key not found. Please check secrets.toml")
         return None
 
-    stripe.api_key = api_key
+    _configure_stripe(api_key)
     base_url = get_base_url()
     
     success_url = f"{base_url}?session_id={{CHECKOUT_SESSION_ID}}"
@@ -171,7 +183,7 @@ def verify_session(session_id):
     api_key = get_api_key()
     if not api_key: return None
 
-    stripe.api_key = api_key
+    _configure_stripe(api_key)
 
     try:
         session = stripe.checkout.Session.retrieve(session_id)
@@ -251,7 +263,7 @@ def check_subscription_status(user_email):
     api_key = get_api_key()
     if not api_key: return False
     
-    stripe.api_key = api_key
+    _configure_stripe(api_key)
     
     # --- LAZY IMPORT TO FIX CIRCULAR DEPENDENCY ---
     try: import database
@@ -330,7 +342,7 @@ def cancel_subscription(user_email):
     api_key = get_api_key()
     if not api_key: return False, "API Key Missing."
     
-    stripe.api_key = api_key
+    _configure_stripe(api_key)
     
     try:
         # 1. Find Customer
@@ -0,0 +1,266 @@
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# --- IMPORTS ---
+try: import letter_format
+except ImportError: letter_format = None
+try: import envelope_format
+except ImportError: envelope_format = None
+try: import font_cache
+except ImportError: font_cache = None
+try: import secrets_manager
+except ImportError: secrets_manager = None
+try: from pypdf import PdfReader, PdfWriter
+except ImportError: PdfReader = PdfWriter = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Rendering is CPU-bound (layout + font subsetting), so workers are processes.
+# Leave one core for the Streamlit server; override with print.workers.
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Below this many items the pool start-up costs more than it saves
+MIN_POOL_ITEMS = 4
+
+# Merged print files are written here so the admin UI holds paths, not PDFs
+OUTPUT_DIR = os.path.join("data", "print_runs")
+KEEP_OUTPUT_FILES = 60
+
+FULFILLMENT_ADDRESS = {"name": "VerbaPost Fulfillment", "address_line1": "123 Legacy Lane", "city": "Nashville", "state": "TN", "zip_code": "37203"}
+
+def _get_secret(key):
+    if secrets_manager: return secrets_manager.get_secret(key)
+    return None
+
+def get_worker_count():
+    try: return max(1, int(_get_secret("print.workers") or DEFAULT_WORKERS))
+    except ValueError: return DEFAULT_WORKERS
+
+def map_profile_to_addr(profile, name_override=None):
+    """DB profile columns -> envelope address dict."""
+    if not profile: return {}
+    return {
+        "name": name_override or profile.get("full_name") or profile.get("firm_name") or profile.get("advisor_firm") or "Current Resident",
+        "address_line1": profile.get("address_line1") or "",
+        "city": profile.get("address_city") or "",
+        "state": profile.get("address_state") or "",
+        "zip_code": profile.get("address_zip") or ""
+    }
+
+# ==========================================
+# 📋 QUEUE ITEM -> RENDER JOB
+# ==========================================
+
+def letter_kwargs(item):
+    """create_pdf() arguments for a Master Queue item."""
+    meta = item.get('meta', {})
+    is_heirloom = item['type'] == "Heirloom"
+    return {
+        "body_text": item['content'],
+        "to_addr": {},
+        "from_addr": {'name': meta.get('storyteller', 'The Family')},
+        "advisor_firm": meta.get('firm_name', 'VerbaPost'),
+        "audio_url": str(item['id']) if is_heirloom else None,
+        "is_marketing": False,
+        "question_text": meta.get('prompt')
+    }
+
+def envelope_addresses(item, get_profile):
+    """(to_addr, from_addr) for a Master Queue item. get_profile(email) -> profile dict."""
+    meta = item.get('meta', {})
+    if item['type'] == "Heirloom":
+        # FROM: Advisor, TO: Heir (address fetched with the queue)
+        from_addr = map_profile_to_addr(get_profile(meta.get('advisor_email_raw')), name_override=meta.get('firm_name'))
+        addr = meta.get('heir_address', {})
+        to_addr = {
+            "name": meta.get('heir_name'),
+            "address_line1": addr.get('line1') or '',
+            "city": addr.get('city') or '',
+            "state": addr.get('state') or '',
+            "zip_code": addr.get('zip') or ''
+        }
+        return to_addr, from_addr
+    return map_profile_to_addr(get_profile(item['email'])), dict(FULFILLMENT_ADDRESS)
+
+def build_jobs(items, get_profile):
+    """
+    Plain-dict jobs for the workers (everything picklable, no DB access in
+    the pool). Profiles are looked up once per email.
+    """
+    profiles = {}
+    def cached_profile(email):
+        if not email: return None
+        if email not in profiles: profiles[email] = get_profile(email)
+        return profiles[email]
+
+    jobs = []
+    for position, item in enumerate(items):
+        to_addr, from_addr = envelope_addresses(item, cached_profile)
+        jobs.append({
+            "position": position,
+            "key": (item['type'], item['id']),
+            "letter": letter_kwargs(item),
+            "envelope": (to_addr, from_addr) if to_addr.get('address_line1') else None
+        })
+    return jobs
+
+# ==========================================
+# ⚙️ WORKERS
+# ==========================================
+
+def _init_worker():
+    # Each worker parses the fonts once, then reuses them for every job
+    if font_cache: font_cache.warm()
+
+def render_job(job):
+    """Renders one letter (+ envelope). Runs in a worker process."""
+    started = time.perf_counter()
+    result = {"position": job["position"], "key": job["key"], "letter": None, "envelope": None, "error": None}
+    try:
+        result["letter"] = letter_format.create_pdf(**job["letter"])
+        if not job["envelope"]:
+            result["error"] = "No Shipping Address"
+        elif job.get("render_envelope", True):
+            result["envelope"] = envelope_format.create_envelope(*job["envelope"])
+            if not result["envelope"]: result["error"] = "Envelope Render Failed"
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+def _render_all(jobs, workers):
+    """Yields results as they finish (inline for small batches)."""
+    if workers <= 1 or len(jobs) < MIN_POOL_ITEMS:
+        _init_worker()
+        for job in jobs: yield render_job(job)
+        return
+    # spawn, not fork: the app process runs scheduler/webhook threads, and a
+    # forked child can inherit a lock one of them was holding.
+    ctx = multiprocessing.get_context("spawn")
+    remaining = {job["position"]: job for job in jobs}
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=ctx, initializer=_init_worker) as pool:
+            futures = [pool.submit(render_job, job) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                remaining.pop(result["position"], None)
+                yield result
+    except BrokenProcessPool as e:
+        # A worker died (OOM, crash); finish what's left in this process
+        logger.error(f"Print Pool Broken, rendering {len(remaining)} items inline: {e}")
+        _init_worker()
+        for job in list(remaining.values()): yield render_job(job)
+
+# ==========================================
+# 📚 MERGE
+# ==========================================
+
+def merge_pdfs(blobs):
+    """Concatenates PDFs in order. Returns (pdf_bytes, page_count)."""
+    if PdfWriter is None: raise RuntimeError("pypdf Missing")
+    writer = PdfWriter()
+    for blob in blobs:
+        writer.append(PdfReader(io.BytesIO(blob)))
+    pages = len(writer.pages)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue(), pages
+
+def save_run_files(done_event, directory=None):
+    """
+    Writes a finished run's merged PDFs to disk and prunes the oldest files.
+    Returns {"letters" | "envelopes" | "combined": path}.
+    """
+    directory = directory or OUTPUT_DIR
+    os.makedirs(directory, exist_ok=True)
+    label = f"run_{done_event['run_id']}" if done_event.get("run_id") else time.strftime("run_%Y%m%d_%H%M%S")
+    paths = {}
+    for kind in ("letters", "envelopes", "combined"):
+        if not done_event.get(kind): continue
+        paths[kind] = os.path.join(directory, f"{label}_{kind}.pdf")
+        with open(paths[kind], "wb") as f: f.write(done_event[kind])
+
+    files = sorted((os.path.join(directory, n) for n in os.listdir(directory) if n.endswith(".pdf")), key=os.path.getmtime)
+    for old in files[:-KEEP_OUTPUT_FILES]:
+        if old not in paths.values():
+            try: os.remove(old)
+            except OSError: pass
+    return paths
+
+# ==========================================
+# 🖨️ PRINT RUN
+# ==========================================
+
+def run_print_job(items, get_profile=None, workers=None, created_by=None, interleave=False, record=True):
+    """
+    Renders queue items in a process pool and merges them into collated
+    print files (letters and envelopes in the same order).
+    Generator of progress events:
+      {"event": "progress", "done", "total", "key", "error"}
+      {"event": "done", "run_id", "letters", "envelopes", "combined", "letter_pages", "failed", "seconds"}
+    With interleave=True each letter is followed by its envelope in 'combined'.
+    """
+    if not letter_format or not envelope_format:
+        yield {"event": "error", "error": "Renderer Missing"}
+        return
+    if PdfWriter is None:
+        yield {"event": "error", "error": "pypdf Missing (pip install pypdf)"}
+        return
+    if not items:
+        yield {"event": "error", "error": "Nothing to Print"}
+        return
+
+    started = time.perf_counter()
+    database = None
+    if record or get_profile is None:
+        try: import database
+        except ImportError: database = None
+    get_profile = get_profile or (database.get_user_profile if database else (lambda email: None))
+
+    jobs = build_jobs(items, get_profile)
+    # Separate files: envelopes go into one multi-page PDF after the letters
+    # instead of one tiny PDF per item. Interleaving needs them per item.
+    for job in jobs: job["render_envelope"] = interleave
+    run_id = database.create_print_run([{"type": j["key"][0], "id": j["key"][1]} for j in jobs], created_by) if record and database else None
+
+    results = [None] * len(jobs)
+    failed = {}
+    for done, result in enumerate(_render_all(jobs, workers or get_worker_count()), start=1):
+        results[result["position"]] = result
+        if result["error"]: failed[result["key"]] = result["error"]
+        yield {"event": "progress", "done": done, "total": len(jobs), "key": result["key"], "error": result["error"]}
+
+    letters = [r["letter"] for r in results if r["letter"]]
+    try:
+        letter_pdf, letter_pages = merge_pdfs(letters) if letters else (None, 0)
+        if interleave:
+            envelopes = [r["envelope"] for r in results if r["envelope"]]
+            envelope_pdf, _ = merge_pdfs(envelopes) if envelopes else (None, 0)
+        else:
+            envelopes = [j["envelope"] for j in jobs if j["envelope"]]
+            envelope_pdf = envelope_format.create_envelopes(envelopes) if envelopes else None
+            if envelopes and not envelope_pdf: raise RuntimeError("Envelope Batch Failed")
+        combined = None
+        if interleave:
+            combined, _ = merge_pdfs([b for r in results for b in (r["letter"], r["envelope"]) if b])
+    except Exception as e:
+        logger.error(f"Print Merge Error: {e}")
+        if run_id: database.finish_print_run(run_id, failed={j["key"]: f"Merge Failed: {e}" for j in jobs})
+        yield {"event": "error", "error": f"Merge Failed: {e}", "run_id": run_id}
+        return
+
+    seconds = time.perf_counter() - started
+    # Missing envelopes still leave a printable letter; only letter failures fail the item
+    letter_failed = {r["key"]: r["error"] for r in results if not r["letter"]}
+    if run_id: database.finish_print_run(run_id, failed=letter_failed, letter_pages=letter_pages, envelope_count=len(envelopes), seconds=round(seconds, 2))
+    logger.info(f"Print run {run_id}: {len(letters)} letters ({letter_pages} pages), {len(envelopes)} envelopes in {seconds:.1f}s")
+    yield {
+        "event": "done", "run_id": run_id,
+        "letters": letter_pdf, "envelopes": envelope_pdf, "combined": combined,
+        "letter_pages": letter_pages, "failed": failed, "seconds": seconds
+    }
@@ -0,0 +1,51 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    rate = tokens added per second, capacity = max burst.
+    Used to keep outbound vendor traffic (Twilio CPS, PostGrid) under account limits.
+    """
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0: raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def try_acquire(self, tokens=1):
+        """Takes tokens if available right now. Returns True/False without blocking."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, timeout=None):
+        """Blocks until tokens are available. Returns False if timeout (seconds) expires first."""
+        if tokens > self.capacity: raise ValueError("requested more tokens than bucket capacity")
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0: return False
+                wait = min(wait, remaining)
+            self._sleep(wait)
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+# --- IMPORTS ---
+try: import database
+except ImportError: database = None
+try: import client_registry
+except ImportError: client_registry = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+HWM_KEY = "twilio_recordings.date_created"
+SYNCED_AT_KEY = "twilio_recordings.synced_at"
+PAGE_SIZE = 100
+SYNC_INTERVAL_SECONDS = 300
+
+# Twilio filters DateCreated> at day granularity, so we rewind a little and
+# let the upsert absorb the overlap rather than risk skipping recordings.
+HWM_OVERLAP = timedelta(days=1)
+
+_sync_thread = None
+_sync_lock = threading.Lock()
+
+def _to_row(rec):
+    uri = (rec.uri or "").replace(".json", "")
+    return {
+        "recording_sid": rec.sid,
+        "call_sid": rec.call_sid,
+        "date_created": rec.date_created.replace(tzinfo=None) if rec.date_created else None,
+        "duration": int(rec.duration) if rec.duration not in (None, "") else None,
+        "uri": f"{uri}.mp3",
+        "media_url": f"https://api.twilio.com{uri}.mp3",
+        "synced_at": datetime.utcnow()
+    }
+
+def _write(upsert, rows):
+    # A failed write must abort the run: the mark may only pass rows that are stored
+    written = upsert(rows)
+    if written is None: raise RuntimeError(f"{upsert.__name__} failed for {len(rows)} rows")
+    return written
+
+def _call_phone(call):
+    # Far end of the call: the caller for inbound legs, the callee for our outbound dials
+    return call.from_ if (call.direction or "").startswith("inbound") else call.to
+
+def _to_call_row(call):
+    return {
+        "call_sid": call.sid,
+        "phone": _call_phone(call),
+        "direction": call.direction,
+        "status": call.status,
+        "date_created": call.date_created.replace(tzinfo=None) if call.date_created else None,
+        "synced_at": datetime.utcnow()
+    }
+
+def _sync_calls(client, call_sids, since, page_size):
+    """
+    Feeds the phone index for the recordings just mirrored.
+    One paged calls listing for the window, then direct fetches only for the
+    few calls that started before it (e.g. a long call straddling the mark).
+    """
+    wanted = set(call_sids)
+    if not wanted: return 0
+    rows = []
+    kwargs = {"page_size": page_size}
+    if since: kwargs["start_time_after"] = since
+    for call in client.calls.stream(**kwargs):
+        if call.sid in wanted:
+            rows.append(_to_call_row(call))
+            wanted.discard(call.sid)
+        if not wanted: break
+    for sid in wanted:
+        try: rows.append(_to_call_row(client.calls(sid).fetch()))
+        except Exception as e: logger.warning(f"Call lookup failed for {sid}: {e}")
+    synced = 0
+    for i in range(0, len(rows), page_size):
+        synced += _write(database.upsert_twilio_calls, rows[i:i + page_size])
+    return synced
+
+def _load_hwm():
+    raw = database.get_sync_state(HWM_KEY) if database else None
+    if not raw: return None
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        logger.warning(f"Bad recordings high-water mark '{raw}', doing a full resync.")
+        return None
+
+def mirror_ready():
+    """True once a sync has completed; before that the mirror may be missing recordings."""
+    return _load_hwm() is not None
+
+def synced_within(seconds):
+    """True if a sync finished in the last `seconds` (UTC)."""
+    raw = database.get_sync_state(SYNCED_AT_KEY) if database else None
+    try:
+        return bool(raw) and datetime.utcnow() - datetime.fromisoformat(raw) <= timedelta(seconds=seconds)
+    except ValueError:
+        return False
+
+def sync_twilio_recordings(page_size=PAGE_SIZE):
+    """
+    Pages through Twilio recordings created since the persisted high-water mark
+    and upserts them into the local twilio_recordings table.
+    The mark only advances after the whole window has been written (Twilio
+    returns newest-first, so a crash or failed write mid-run must replay the
+    window).
+    Returns: (synced_count, error_message)
+    """
+    if not database: return 0, "Database Missing"
+    client = client_registry.get_twilio_client() if client_registry else None
+    if not client: return 0, "Twilio Config Missing"
+
+    hwm = _load_hwm()
+    kwargs = {"page_size": page_size}
+    if hwm: kwargs["date_created_after"] = hwm - HWM_OVERLAP
+
+    synced = 0
+    newest = hwm
+    batch = []
+    call_sids = []
+    try:
+        for rec in client.recordings.stream(**kwargs):
+            row = _to_row(rec)
+            batch.append(row)
+            if row["call_sid"]: call_sids.append(row["call_sid"])
+            if row["date_created"] and (newest is None or row["date_created"] > newest):
+                newest = row["date_created"]
+            if len(batch) >= page_size:
+                synced += _write(database.upsert_twilio_recordings, batch)
+                batch = []
+        if batch:
+            synced += _write(database.upsert_twilio_recordings, batch)
+        _sync_calls(client, call_sids, kwargs.get("date_created_after"), page_size)
+    except Exception as e:
+        logger.error(f"Recording Sync Error: {e}")
+        return synced, str(e)
+
+    if newest and newest != hwm:
+        database.set_sync_state(HWM_KEY, newest.isoformat())
+    database.set_sync_state(SYNCED_AT_KEY, datetime.utcnow().isoformat())
+    logger.info(f"Recording Sync: {synced} rows upserted (hwm={newest})")
+    return synced, None
+
+def run_sync_loop(interval=SYNC_INTERVAL_SECONDS, stop_event=None):
+    """Blocking loop for a worker container / cron-less deployments."""
+    while not (stop_event and stop_event.is_set()):
+        sync_twilio_recordings()
+        if stop_event:
+            stop_event.wait(interval)
+        else:
+            time.sleep(interval)
+
+def start_background_sync(interval=SYNC_INTERVAL_SECONDS):
+    """Starts the sync loop in a daemon thread once per process. Safe to call on every rerun."""
+    global _sync_thread
+    with _sync_lock:
+        if _sync_thread and _sync_thread.is_alive(): return _sync_thread
+        _sync_thread = threading.Thread(target=run_sync_loop, args=(interval,), name="twilio-recording-sync", daemon=True)
+        _sync_thread.start()
+        return _sync_thread
+
+if __name__ == "__main__":
+    import sys
+    if "--once" in sys.argv:
+        count, err = sync_twilio_recordings()
+        print(f"Synced {count} recordings" + (f" (error: {err})" if err else ""))
+    else:
+        run_sync_loop()
@@ -0,0 +1,145 @@
+"""
+On-disk cache of rendered letter / envelope PDFs.
+
+Keys are a hash of everything that reaches the page (text, addresses, firm,
+question, audio id, the date printed in the header, the font in use) plus
+the renderer's TEMPLATE_VERSION, so a layout change is a version bump rather
+than a cache purge. Files are written atomically, so the app and the print
+workers can share one directory; the oldest entries are evicted once the
+directory grows past render_cache.max_mb.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+# --- IMPORTS ---
+try: import secrets_manager
+except ImportError: secrets_manager = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+DEFAULT_DIR = os.path.join("data", "render_cache")
+DEFAULT_MAX_MB = 256
+# Evict down to this fraction of the limit so a full cache doesn't scan on every write
+LOW_WATER = 0.8
+
+ENABLED = True
+
+_lock = threading.Lock()
+_state = {"dir": None, "max_bytes": None, "size": None}
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+def _get_secret(key):
+    if secrets_manager: return secrets_manager.get_secret(key)
+    return None
+
+def _config():
+    if _state["dir"] is None:
+        _state["dir"] = _get_secret("render_cache.dir") or DEFAULT_DIR
+        try: max_mb = float(_get_secret("render_cache.max_mb") or DEFAULT_MAX_MB)
+        except ValueError: max_mb = DEFAULT_MAX_MB
+        _state["max_bytes"] = int(max_mb * 1024 * 1024)
+    return _state["dir"], _state["max_bytes"]
+
+def configure(directory=None, max_mb=None):
+    """Overrides the secrets-based settings (tests, benchmarks). No directory = back to settings."""
+    with _lock:
+        _state["dir"] = directory
+        _state["max_bytes"] = int((max_mb if max_mb is not None else DEFAULT_MAX_MB) * 1024 * 1024) if directory else None
+        _state["size"] = None
+        for k in _stats: _stats[k] = 0
+
+def make_key(kind, template_version, **fields):
+    payload = json.dumps({"kind": kind, "v": template_version, "fields": fields}, sort_keys=True, default=str)
+    return f"{kind}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+def _path(key):
+    directory, _ = _config()
+    return os.path.join(directory, key[-2:], f"{key}.pdf")
+
+def get(key):
+    """Cached PDF bytes or None."""
+    if not ENABLED or not key: return None
+    path = _path(key)
+    try:
+        with open(path, "rb") as f: data = f.read()
+        os.utime(path)  # mtime doubles as last-used for eviction
+        with _lock: _stats["hits"] += 1
+        return data
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Render Cache Read Error: {e}")
+    with _lock: _stats["misses"] += 1
+    return None
+
+def put(key, data):
+    if not ENABLED or not key or not data: return False
+    path = _path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f: f.write(data)
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.error(f"Render Cache Write Error: {e}")
+        return False
+
+    with _lock:
+        _stats["stores"] += 1
+        if _state["size"] is not None: _state["size"] += len(data)
+    _maybe_evict()
+    return True
+
+def _entries(directory):
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(".pdf"): continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+                yield st.st_mtime, st.st_size, path
+            except FileNotFoundError:
+                continue  # evicted by another process
+
+def _maybe_evict():
+    directory, max_bytes = _config()
+    with _lock:
+        if _state["size"] is None:
+            _state["size"] = sum(size for _, size, _ in _entries(directory))
+        if _state["size"] <= max_bytes: return
+        # Other processes write here too; rescan for the real total before evicting
+        entries = sorted(_entries(directory))
+        total = sum(size for _, size, _ in entries)
+        target = int(max_bytes * LOW_WATER)
+        for _, size, path in entries:
+            if total <= target: break
+            try:
+                os.remove(path)
+                total -= size
+                _stats["evictions"] += 1
+            except FileNotFoundError:
+                total -= size
+        _state["size"] = total
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["size_bytes"] = _state["size"]
+    stats["dir"], stats["max_bytes"] = _config()
+    return stats
+
+def clear():
+    directory, _ = _config()
+    with _lock:
+        for _, _, path in list(_entries(directory)):
+            try: os.remove(path)
+            except FileNotFoundError: pass
+        _state["size"] = 0
+        for k in _stats: _stats[k] = 0
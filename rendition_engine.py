@@ -0,0 +1,157 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- IMPORTS ---
+try: import storage_engine
+except ImportError: storage_engine = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Voice-only content: mono AAC at 48 kbps is transparent for speech and ~1/3
+# the size of Twilio's MP3. AAC/M4A (not Opus) because iOS Safari plays it
+# natively, and faststart puts the index up front so playback starts on the
+# first few KB.
+PLAYBACK_BITRATE = "48k"
+PREVIEW_BITRATE = "32k"
+PREVIEW_SECONDS = 30
+SAMPLE_RATE = "24000"
+CONTENT_TYPE = "audio/mp4"
+TRANSCODE_TIMEOUT_SECONDS = 600
+TRANSCODE_WORKERS = 1  # ffmpeg is CPU-bound; keep it off the request threads
+
+# Renditions that don't exist yet are re-checked after this long
+MISSING_TTL_SECONDS = 300
+
+_pool = None
+_pool_lock = threading.Lock()
+_missing = {}  # rendition path -> time it was found missing
+_missing_lock = threading.Lock()
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+def rendition_paths(storage_path):
+    """Renditions live next to the original: {owner}/{sha}.playback.m4a / .preview.m4a"""
+    base = storage_path.rsplit(".", 1)[0] if "." in storage_path.rsplit("/", 1)[-1] else storage_path
+    return {"playback": f"{base}.playback.m4a", "preview": f"{base}.preview.m4a"}
+
+def _run_ffmpeg(args, timeout=TRANSCODE_TIMEOUT_SECONDS):
+    subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *args], check=True, timeout=timeout, capture_output=True)
+
+def transcode(audio_bytes, bitrate=PLAYBACK_BITRATE, max_seconds=None):
+    """
+    Original audio -> mono AAC (.m4a, faststart).
+    Temp files rather than pipes: the MP4 muxer needs a seekable output to
+    move the index to the front.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "in")
+        dst = os.path.join(tmp, "out.m4a")
+        with open(src, "wb") as f: f.write(audio_bytes)
+        args = ["-i", src, "-vn", "-ac", "1", "-ar", SAMPLE_RATE, "-c:a", "aac", "-b:a", bitrate, "-movflags", "+faststart"]
+        if max_seconds: args[2:2] = ["-t", str(max_seconds)]
+        _run_ffmpeg(args + [dst])
+        with open(dst, "rb") as f: return f.read()
+
+def build_renditions(storage_path, audio_bytes=None):
+    """
+    Creates the playback and preview renditions for one vault object.
+    Returns: (paths_dict, error_message)
+    """
+    if not storage_engine: return None, "Storage Missing"
+    if not ffmpeg_available(): return None, "ffmpeg Missing"
+    paths = rendition_paths(storage_path)
+    if audio_bytes is None:
+        # Backfill: skip the download and transcode if both already exist
+        if all(storage_engine.object_exists(p) for p in paths.values()): return paths, None
+        audio_bytes = storage_engine.download_object(storage_path)
+        if not audio_bytes: return None, "Original Not Found"
+
+    try:
+        started = time.perf_counter()
+        playback = transcode(audio_bytes, PLAYBACK_BITRATE)
+        preview = transcode(audio_bytes, PREVIEW_BITRATE, max_seconds=PREVIEW_SECONDS)
+        for kind, data in (("playback", playback), ("preview", preview)):
+            if not storage_engine.upload_object(paths[kind], data, CONTENT_TYPE):
+                return None, f"{kind.title()} Upload Failed"
+        with _missing_lock:
+            for p in paths.values(): _missing.pop(p, None)
+        logger.info(f"Renditions for {storage_path}: {len(audio_bytes)} -> {len(playback)} bytes ({len(preview)} preview) in {time.perf_counter() - started:.1f}s")
+        return paths, None
+    except subprocess.CalledProcessError as e:
+        err = (e.stderr or b"").decode(errors="ignore").strip()[:200]
+        logger.error(f"Transcode Failed for {storage_path}: {err}")
+        return None, f"Transcode Failed: {err}"
+    except Exception as e:
+        logger.error(f"Rendition Error for {storage_path}: {e}")
+        return None, str(e)
+
+# ==========================================
+# 🧵 BACKGROUND STAGE
+# ==========================================
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TRANSCODE_WORKERS, thread_name_prefix="audio-rendition")
+        return _pool
+
+def submit(storage_path, audio_bytes=None):
+    """Queues rendition work after ingest; never blocks or fails the caller."""
+    if not storage_path or not ffmpeg_available(): return None
+    return _get_pool().submit(build_renditions, storage_path, audio_bytes)
+
+def backfill(storage_paths):
+    """Queues renditions for older vault objects. Returns the number queued."""
+    queued = 0
+    for path in storage_paths:
+        if submit(path): queued += 1
+    return queued
+
+# ==========================================
+# ▶️ PLAYBACK
+# ==========================================
+
+def _known_missing(path, now):
+    with _missing_lock:
+        seen = _missing.get(path)
+        return seen is not None and now - seen < MISSING_TTL_SECONDS
+
+def _mark_missing(paths, now):
+    with _missing_lock:
+        for p in paths: _missing[p] = now
+
+def get_playback_urls(storage_paths, kind="playback", expiry=3600):
+    """
+    Signed URLs for many vault objects, preferring the given rendition
+    ("playback" or "preview") and falling back to the original.
+    Renditions and originals are signed together in one batch call.
+    Returns: {storage_path: (url, content_type)}
+    """
+    if not storage_engine: return {}
+    now = time.time()
+    paths = [p for p in dict.fromkeys(storage_paths or []) if p]
+    wanted = {p: rendition_paths(p)[kind] for p in paths}
+    to_sign = [r for r in wanted.values() if not _known_missing(r, now)] + paths
+    signed = storage_engine.get_signed_urls(to_sign, expiry)
+
+    _mark_missing([r for r in wanted.values() if r in signed and not signed[r]], now)
+    results = {}
+    for path in paths:
+        if signed.get(wanted[path]):
+            results[path] = (signed[wanted[path]], CONTENT_TYPE)
+        elif signed.get(path):
+            results[path] = (signed[path], "audio/mpeg")
+    return results
+
+def get_playback_url(storage_path, kind="playback", expiry=3600):
+    """Single-object version of get_playback_urls. Returns (url, content_type) or (None, None)."""
+    return get_playback_urls([storage_path], kind, expiry).get(storage_path, (None, None))
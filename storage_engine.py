@@ -1,24 +1,95 @@
 import streamlit as st
 from supabase import create_client
 import logging
+import base64
+import hashlib
+import hmac
+import json
+import math
+import secrets
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime
+from urllib.parse import quote
 import os
 
 # --- IMPORT SECRETS MANAGER ---
 try: import secrets_manager
 except ImportError: secrets_manager = None
 
+try: import client_registry
+except ImportError: client_registry = None
+
 logger = logging.getLogger(__name__)
 
+# --- CONFIGURATION ---
+BUCKET = "heirloom-audio"
+
+# Backend: "supabase" (default) or "local" (storage.backend). The local
+# backend keeps blobs under storage.local_root and signs URLs served by
+# webhook_server at /storage/<path>.
+DEFAULT_LOCAL_ROOT = os.path.join("data", "storage")
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Signed URL cache: requested expiries are rounded up to a bucket so callers
+# asking for 3600s and 3500s share entries; an entry is served until less than
+# REFRESH_FRACTION of its lifetime remains, so a returned link is always good
+# for a while (e.g. >= 30 min for the default hour).
+EXPIRY_BUCKET_SECONDS = 900
+REFRESH_FRACTION = 0.5
+MIN_REMAINING_SECONDS = 300
+SIGNED_URL_CACHE_SIZE = 5000
+
 # Lazy Loader for Client
 _supabase_storage_client = None
+_local_backend = None
+_backend_override = None
+_backend_lock = threading.Lock()
+
+# Uploads: objects are named by the SHA-256 of their bytes, so re-syncing the
+# same recording is a no-op. Payloads above RESUMABLE_THRESHOLD go through the
+# TUS endpoint in fixed 6MB parts (the size Supabase requires), each retried
+# on its own after re-reading the server offset.
+RESUMABLE_THRESHOLD = 6 * 1024 * 1024
+CHUNK_SIZE = 6 * 1024 * 1024
+CHUNK_RETRIES = 4
+RETRY_BACKOFF_SECONDS = 0.5
+CONTENT_EXTENSIONS = {"audio/mpeg": "mp3", "audio/mp3": "mp3", "audio/wav": "wav", "audio/x-wav": "wav", "audio/mp4": "m4a", "audio/aac": "aac", "audio/ogg": "ogg", "audio/webm": "webm"}
+
+_upload_stats = {"uploads": 0, "resumable_uploads": 0, "duplicates_skipped": 0, "bytes_uploaded": 0, "bytes_reclaimed": 0, "chunk_retries": 0}
+_upload_stats_lock = threading.Lock()
+
+_url_cache = OrderedDict()  # (storage_path, expiry_bucket) -> (url, expires_at)
+_url_cache_lock = threading.Lock()
+_url_stats = {"hits": 0, "misses": 0, "refreshes": 0, "sign_calls": 0, "batch_calls": 0, "errors": 0}
 
 def get_storage_client():
     global _supabase_storage_client
     if _supabase_storage_client:
         return _supabase_storage_client
-    
+
+    # Shared process-wide client (same instance database.py uses)
+    if client_registry:
+        _supabase_storage_client = client_registry.get_client("supabase", _build_storage_client)
+        return _supabase_storage_client
+    _supabase_storage_client = _build_storage_client()
+    return _supabase_storage_client
+
+def _build_storage_client():
+    url, key = _get_credentials()
+    if not url or not key:
+        logger.error("Storage Error: Missing SUPABASE_URL or SUPABASE_KEY")
+        return None
+
+    try:
+        return create_client(url, key)
+    except Exception as e:
+        logger.error(f"Storage Init Error: {e}")
+        return None
+
+def _get_credentials():
     url = None
     key = None
 
@@ -39,56 +110,513 @@ def get_storage_client():
         url = os.environ.get("SUPABASE_URL")
         key = os.environ.get("SUPABASE_KEY")
 
-    if not url or not key:
-        logger.error("Storage Error: Missing SUPABASE_URL or SUPABASE_KEY")
-        return None
+    return url, key
+
+# ==========================================
+# 🗄️ STORAGE BACKENDS
+# ==========================================
+
+def _get_secret(key):
+    if secrets_manager: return secrets_manager.get_secret(key)
+    return os.environ.get(key.upper().replace(".", "_"))
+
+class SupabaseBackend:
+    """The 'heirloom-audio' bucket. Large payloads go through TUS (see _resumable_upload)."""
+    name = "supabase"
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def exists(self, storage_path):
+        return self.bucket.exists(storage_path)
+
+    def put(self, storage_path, file_bytes, content_type):
+        """Returns True if stored, False if the object already existed."""
+        if len(file_bytes) > RESUMABLE_THRESHOLD:
+            created = _resumable_upload(storage_path, file_bytes, content_type)
+            if created: _bump(resumable_uploads=1)
+            return created
+        try:
+            self.bucket.upload(
+                path=storage_path,
+                file=file_bytes,
+                file_options={"content-type": content_type}
+            )
+            return True
+        except Exception as e:
+            # Lost a race with a concurrent upload of the same audio
+            if not _is_duplicate_error(e): raise
+            return False
+
+    def get(self, storage_path):
+        return self.bucket.download(storage_path)
+
+    def open_stream(self, storage_path, chunk_size=STREAM_CHUNK_SIZE):
+        url = self.sign(storage_path, 300)
+        if not url: raise FileNotFoundError(storage_path)
+        resp = _get_http().get(url, stream=True, timeout=60)
+        resp.raise_for_status()
+        return resp.iter_content(chunk_size)
+
+    def sign(self, storage_path, expiry):
+        return _extract_url(self.bucket.create_signed_url(storage_path, expiry))
+
+    def sign_many(self, storage_paths, expiry):
+        results = {}
+        for item in self.bucket.create_signed_urls(storage_paths, expiry) or []:
+            results[item.get("path")] = None if item.get("error") else _extract_url(item)
+        return results
+
+    def iter_objects(self, prefixes=None):
+        """Yields (path, fingerprint, size); fingerprint is the eTag."""
+        if prefixes is None:
+            # Top level holds one folder per owner (folders have no id)
+            prefixes = [i["name"] for i in _list_all(self.bucket, "") if not i.get("id")]
+        for prefix in prefixes:
+            for item in _list_all(self.bucket, prefix):
+                meta = item.get("metadata") or {}
+                if not item.get("id") or not meta.get("eTag"): continue
+                yield f"{prefix}/{item['name']}", meta["eTag"], meta.get("size", 0)
+
+class LocalBackend:
+    """
+    Filesystem backend with the same surface as the bucket, for running and
+    benchmarking the audio pipeline without network access.
+
+        root/blobs/ab/abcd...   content, named by SHA-256 (stored once)
+        root/refs/<path>.json   {"sha256", "size", "content_type"}
+
+    Signed URLs are HMAC-SHA256 over "path:expires" and are checked by
+    verify() before webhook_server streams the blob.
+    """
+    name = "local"
+
+    def __init__(self, root, signing_key, base_url=None):
+        self.root = os.path.abspath(root)
+        self.signing_key = signing_key.encode() if isinstance(signing_key, str) else signing_key
+        self.base_url = (base_url or "").rstrip("/")
+        os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "refs"), exist_ok=True)
+
+    def _ref_file(self, storage_path):
+        parts = [p for p in storage_path.split("/") if p]
+        if not parts or any(p in (".", "..") for p in parts) or "\\" in storage_path:
+            raise ValueError(f"Invalid storage path: {storage_path}")
+        return os.path.join(self.root, "refs", *parts) + ".json"
+
+    def _blob_file(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    @staticmethod
+    def _atomic_write(target, data):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{secrets.token_hex(4)}.tmp"
+        with open(tmp, "wb") as f: f.write(data)
+        os.replace(tmp, target)
+
+    def stat(self, storage_path):
+        try:
+            with open(self._ref_file(storage_path)) as f: return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def exists(self, storage_path):
+        return self.stat(storage_path) is not None
+
+    def put(self, storage_path, file_bytes, content_type):
+        ref_file = self._ref_file(storage_path)
+        if os.path.exists(ref_file): return False
+        digest = hashlib.sha256(file_bytes).hexdigest()
+        blob = self._blob_file(digest)
+        if not os.path.exists(blob): self._atomic_write(blob, file_bytes)
+        meta = {"sha256": digest, "size": len(file_bytes), "content_type": content_type}
+        self._atomic_write(ref_file, json.dumps(meta).encode())
+        return True
+
+    def get(self, storage_path):
+        meta = self.stat(storage_path)
+        if not meta: raise FileNotFoundError(storage_path)
+        with open(self._blob_file(meta["sha256"]), "rb") as f: return f.read()
+
+    def open_stream(self, storage_path, chunk_size=STREAM_CHUNK_SIZE, start=0, end=None):
+        """Yields the object (or the inclusive byte range start..end) in chunks."""
+        meta = self.stat(storage_path)
+        if not meta: raise FileNotFoundError(storage_path)
+        end = meta["size"] - 1 if end is None else min(end, meta["size"] - 1)
+
+        def _chunks():
+            with open(self._blob_file(meta["sha256"]), "rb") as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    data = f.read(min(chunk_size, remaining))
+                    if not data: return
+                    remaining -= len(data)
+                    yield data
+        return _chunks()
+
+    def _signature(self, storage_path, expires):
+        return hmac.new(self.signing_key, f"{storage_path}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+    def sign(self, storage_path, expiry):
+        if not self.exists(storage_path): return None
+        expires = int(time.time()) + int(expiry)
+        return f"{self.base_url}/storage/{quote(storage_path)}?expires={expires}&sig={self._signature(storage_path, expires)}"
+
+    def sign_many(self, storage_paths, expiry):
+        return {p: self.sign(p, expiry) for p in storage_paths}
+
+    def verify(self, storage_path, expires, signature, now=None):
+        try: expires = int(expires)
+        except (TypeError, ValueError): return False
+        if expires < (now if now is not None else time.time()): return False
+        return hmac.compare_digest(self._signature(storage_path, expires), signature or "")
+
+    def iter_objects(self, prefixes=None):
+        """Yields (path, fingerprint, size); fingerprint is the SHA-256."""
+        refs = os.path.join(self.root, "refs")
+        tops = [os.path.join(refs, p) for p in prefixes] if prefixes is not None else [refs]
+        for top in tops:
+            for dirpath, _, files in os.walk(top):
+                for name in files:
+                    if not name.endswith(".json"): continue
+                    full = os.path.join(dirpath, name)
+                    path = os.path.relpath(full, refs)[:-len(".json")].replace(os.sep, "/")
+                    meta = self.stat(path)
+                    if meta: yield path, meta["sha256"], meta["size"]
+
+def _get_local_backend():
+    global _local_backend
+    with _backend_lock:
+        if _local_backend is None:
+            key = _get_secret("storage.signing_key")
+            if not key:
+                # Links stop verifying after a restart; fine for dev and benchmarks only
+                logger.warning("storage.signing_key not set; using a per-process key for local signed URLs")
+                key = secrets.token_hex(32)
+            port = _get_secret("webhook.port") or "8081"
+            base_url = _get_secret("storage.public_url") or _get_secret("webhook.base_url") or f"http://localhost:{port}"
+            _local_backend = LocalBackend(_get_secret("storage.local_root") or DEFAULT_LOCAL_ROOT, key, base_url)
+        return _local_backend
+
+def get_backend():
+    """The configured storage backend, or None if it can't be reached."""
+    if _backend_override is not None: return _backend_override
+    if (_get_secret("storage.backend") or "supabase").lower() == "local":
+        return _get_local_backend()
+    client = get_storage_client()
+    return SupabaseBackend(client.storage.from_(BUCKET)) if client else None
+
+def set_backend(backend):
+    """Pins a backend instance for this process (tests, benchmarks). None restores config."""
+    global _backend_override
+    _backend_override = backend
+    clear_signed_url_cache()
+
+# ==========================================
+# ⬆️ UPLOADS (CONTENT-ADDRESSED)
+# ==========================================
+
+def _bump(**counts):
+    with _upload_stats_lock:
+        for k, v in counts.items(): _upload_stats[k] += v
+
+def content_path(user_email, file_bytes, content_type="audio/mpeg"):
+    """Deterministic storage path: {owner}/{sha256}.{ext}"""
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    ext = CONTENT_EXTENSIONS.get((content_type or "").split(";")[0].strip().lower(), "mp3")
+    return f"{user_email}/{digest}.{ext}"
 
+def _object_exists(backend, storage_path):
     try:
-        _supabase_storage_client = create_client(url, key)
-        return _supabase_storage_client
+        return backend.exists(storage_path)
     except Exception as e:
-        logger.error(f"Storage Init Error: {e}")
+        # Unknown is treated as missing; the upload itself rejects duplicates
+        logger.warning(f"Exists Check Failed for {storage_path}: {e}")
+        return False
+
+def _is_duplicate_error(e):
+    msg = str(e).lower()
+    return "409" in msg or "duplicate" in msg or "already exists" in msg
+
+def _get_http():
+    if client_registry: return client_registry.get_http_session()
+    import requests
+    return requests.Session()
+
+def _tus_metadata(fields):
+    return ",".join(f"{k} {base64.b64encode(str(v).encode()).decode()}" for k, v in fields.items())
+
+def _tus_offset(http, location, headers):
+    r = http.head(location, headers=headers, timeout=30)
+    r.raise_for_status()
+    return int(r.headers.get("Upload-Offset", 0))
+
+def _resumable_upload(storage_path, file_bytes, content_type):
+    """
+    TUS upload against Supabase's /storage/v1/upload/resumable endpoint.
+    A failed part is retried from the offset the server reports, so a blip
+    costs one part, not the whole file.
+    Returns: True if uploaded, False if the object already existed.
+    """
+    url, key = _get_credentials()
+    if not url or not key: raise RuntimeError("Missing SUPABASE_URL or SUPABASE_KEY")
+    import requests
+    http = _get_http()
+    endpoint = f"{url.rstrip('/')}/storage/v1/upload/resumable"
+    headers = {"Authorization": f"Bearer {key}", "apikey": key, "Tus-Resumable": "1.0.0"}
+
+    total = len(file_bytes)
+    r = http.post(endpoint, headers={
+        **headers,
+        "Upload-Length": str(total),
+        "Upload-Metadata": _tus_metadata({"bucketName": BUCKET, "objectName": storage_path, "contentType": content_type, "cacheControl": "3600"}),
+        "x-upsert": "false"
+    }, timeout=30)
+    if r.status_code == 409: return False
+    r.raise_for_status()
+    location = requests.compat.urljoin(endpoint, r.headers["Location"])
+
+    offset, failures = 0, 0
+    while offset < total:
+        chunk = file_bytes[offset:offset + CHUNK_SIZE]
+        try:
+            r = http.patch(location, data=chunk, headers={
+                **headers,
+                "Upload-Offset": str(offset),
+                "Content-Type": "application/offset+octet-stream"
+            }, timeout=120)
+            if r.status_code == 409:
+                # Our offset is stale (an earlier attempt landed); ask the server
+                offset = _tus_offset(http, location, headers)
+                continue
+            r.raise_for_status()
+            offset = int(r.headers.get("Upload-Offset", offset + len(chunk)))
+            failures = 0
+        except requests.RequestException as e:
+            failures += 1
+            _bump(chunk_retries=1)
+            if failures > CHUNK_RETRIES: raise
+            logger.warning(f"Upload part at {offset} failed ({e}), retry {failures}/{CHUNK_RETRIES}")
+            time.sleep(RETRY_BACKOFF_SECONDS * (2 ** (failures - 1)))
+            try: offset = _tus_offset(http, location, headers)
+            except requests.RequestException: pass
+    return True
+
+def upload_object(storage_path, file_bytes, content_type="application/octet-stream"):
+    """
+    Stores bytes at an explicit path (derived objects such as playback
+    renditions). Existing objects are left alone.
+    Returns: storage_path, or None on failure.
+    """
+    backend = get_backend()
+    if not backend: return None
+
+    try:
+        size = len(file_bytes)
+        if _object_exists(backend, storage_path) or not backend.put(storage_path, file_bytes, content_type):
+            _bump(duplicates_skipped=1, bytes_reclaimed=size)
+        else:
+            _bump(uploads=1, bytes_uploaded=size)
+        return storage_path
+    except Exception as e:
+        logger.error(f"Upload Failed: {e}")
         return None
 
 def upload_audio(user_email, file_bytes, content_type="audio/mpeg"):
     """
     Uploads audio bytes to 'heirloom-audio' bucket.
+    Path is derived from the content hash, so uploading the same audio twice
+    returns the existing object instead of storing a copy.
     """
-    client = get_storage_client()
-    if not client: return None
+    return upload_object(content_path(user_email, file_bytes, content_type), file_bytes, content_type)
+
+def object_exists(storage_path):
+    backend = get_backend()
+    if not backend or not storage_path: return False
+    return _object_exists(backend, storage_path)
 
+def download_object(storage_path):
+    """Returns the stored bytes, or None."""
+    backend = get_backend()
+    if not backend or not storage_path: return None
     try:
-        # Create secure, unique path
-        filename = f"{datetime.now().strftime('%Y%m%d')}_{str(uuid.uuid4())[:8]}.mp3"
-        storage_path = f"{user_email}/{filename}"
-        
-        # Upload
-        client.storage.from_("heirloom-audio").upload(
-            path=storage_path,
-            file=file_bytes,
-            file_options={"content-type": content_type}
-        )
-        return storage_path
+        return backend.get(storage_path)
     except Exception as e:
-        logger.error(f"Upload Failed: {e}")
+        logger.error(f"Download Failed for {storage_path}: {e}")
         return None
 
+def stream_object(storage_path, chunk_size=STREAM_CHUNK_SIZE):
+    """Iterates the object in chunks without holding it in memory. None if unavailable."""
+    backend = get_backend()
+    if not backend or not storage_path: return None
+    try:
+        return backend.open_stream(storage_path, chunk_size)
+    except Exception as e:
+        logger.error(f"Stream Failed for {storage_path}: {e}")
+        return None
+
+def get_upload_stats():
+    with _upload_stats_lock: return dict(_upload_stats)
+
+def _list_all(bucket, prefix, page=1000):
+    offset = 0
+    while True:
+        items = bucket.list(prefix, {"limit": page, "offset": offset}) or []
+        yield from items
+        if len(items) < page: return
+        offset += page
+
+def duplicate_report(prefixes=None):
+    """
+    Scans the vault for copies stored before uploads were content-addressed.
+    Objects with the same fingerprint (eTag / SHA-256) and size are treated as one recording.
+    Returns: {"objects", "duplicate_groups", "duplicate_objects", "reclaimable_bytes", "groups"}
+    """
+    backend = get_backend()
+    if not backend: return None
+    groups = {}
+    total = 0
+    try:
+        for path, fingerprint, size in backend.iter_objects(prefixes):
+            total += 1
+            groups.setdefault((fingerprint, size), []).append(path)
+    except Exception as e:
+        logger.error(f"Duplicate Scan Error: {e}")
+        return None
+
+    dupes = [{"etag": k[0], "size": k[1], "paths": v} for k, v in groups.items() if len(v) > 1]
+    return {
+        "objects": total,
+        "duplicate_groups": len(dupes),
+        "duplicate_objects": sum(len(d["paths"]) - 1 for d in dupes),
+        "reclaimable_bytes": sum(d["size"] * (len(d["paths"]) - 1) for d in dupes),
+        "groups": dupes
+    }
+
+# ==========================================
+# 🔗 SIGNED URLS (CACHED)
+# ==========================================
+
+def _expiry_bucket(expiry):
+    """
+    Signed lifetime for a requested expiry: rounded down to the bucket so
+    nearby expiries share cache entries, but never longer than asked (short
+    expiries are signed as-is).
+    """
+    expiry = max(1, int(expiry))
+    if expiry < EXPIRY_BUCKET_SECONDS: return expiry
+    return int(math.floor(expiry / EXPIRY_BUCKET_SECONDS) * EXPIRY_BUCKET_SECONDS)
+
+def _min_remaining(bucket):
+    return max(MIN_REMAINING_SECONDS, bucket * REFRESH_FRACTION)
+
+def _cache_get(key, now):
+    """Returns a cached URL with comfortable validity left, else None."""
+    with _url_cache_lock:
+        entry = _url_cache.get(key)
+        if entry and entry[1] - now >= _min_remaining(key[1]):
+            _url_cache.move_to_end(key)
+            _url_stats["hits"] += 1
+            return entry[0]
+        _url_stats["misses"] += 1
+        if entry: _url_stats["refreshes"] += 1
+        return None
+
+def _cache_put(key, url, signed_at):
+    with _url_cache_lock:
+        _url_cache[key] = (url, signed_at + key[1])
+        _url_cache.move_to_end(key)
+        while len(_url_cache) > SIGNED_URL_CACHE_SIZE:
+            _url_cache.popitem(last=False)
+
+def _extract_url(response):
+    if isinstance(response, dict):
+        return response.get('signedURL') or response.get('signedUrl')
+    if isinstance(response, str):
+        return response
+    return None
+
 def get_signed_url(storage_path, expiry=3600):
     """
     Generates a secure, temporary link for playback.
+    Served from a process-wide cache while the link still has comfortable
+    validity left; the link is signed for the expiry rounded down to its
+    bucket, so it never outlives what was asked.
     """
     if not storage_path: return None
-    client = get_storage_client()
-    if not client: return None
-    
+    bucket = _expiry_bucket(expiry)
+    key = (storage_path, bucket)
+    signed_at = time.time()
+    url = _cache_get(key, signed_at)
+    if url: return url
+
+    backend = get_backend()
+    if not backend: return None
+    return _sign_one(backend, storage_path, bucket, signed_at)
+
+def _sign_one(backend, storage_path, bucket, signed_at):
     try:
-        response = client.storage.from_("heirloom-audio").create_signed_url(storage_path, expiry)
-        
-        if isinstance(response, dict) and 'signedURL' in response:
-            return response['signedURL']
-        elif isinstance(response, str):
-            return response
-        return response 
+        url = backend.sign(storage_path, bucket)
+        with _url_cache_lock: _url_stats["sign_calls"] += 1
+        if url: _cache_put((storage_path, bucket), url, signed_at)
+        return url
     except Exception as e:
+        with _url_cache_lock: _url_stats["errors"] += 1
         logger.error(f"Signed URL Error: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def get_signed_urls(storage_paths, expiry=3600):
+    """
+    Batch version for pages that list many recordings.
+    Cache hits are served locally; the remaining paths are signed in a single
+    create_signed_urls round trip (falls back to per-path signing if the batch
+    call fails).
+    Returns: {storage_path: url or None}
+    """
+    paths = list(dict.fromkeys(p for p in (storage_paths or []) if p))
+    if not paths: return {}
+    bucket = _expiry_bucket(expiry)
+    signed_at = time.time()
+
+    results, missing = {}, []
+    for path in paths:
+        url = _cache_get((path, bucket), signed_at)
+        if url: results[path] = url
+        else: missing.append(path)
+    if not missing: return results
+
+    backend = get_backend()
+    if not backend:
+        results.update({p: None for p in missing})
+        return results
+
+    try:
+        signed = backend.sign_many(missing, bucket)
+        with _url_cache_lock: _url_stats["batch_calls"] += 1
+        for path in missing:
+            url = signed.get(path)
+            results[path] = url
+            if url: _cache_put((path, bucket), url, signed_at)
+    except Exception as e:
+        with _url_cache_lock: _url_stats["errors"] += 1
+        logger.error(f"Batch Signed URL Error: {e}")
+        for path in missing:
+            results[path] = _sign_one(backend, path, bucket, signed_at)
+
+    for path in missing: results.setdefault(path, None)
+    return results
+
+def get_signed_url_stats():
+    """Hit/miss counters for the admin health tab."""
+    with _url_cache_lock:
+        stats = dict(_url_stats)
+        stats["cached"] = len(_url_cache)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
+
+def clear_signed_url_cache():
+    with _url_cache_lock:
+        _url_cache.clear()
+        for k in _url_stats: _url_stats[k] = 0
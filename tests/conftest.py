@@ -0,0 +1,27 @@
+import pytest
+
+try: import render_cache
+except ImportError: render_cache = None
+try: import database
+except ImportError: database = None
+
+
+@pytest.fixture(autouse=True)
+def isolated_render_cache(tmp_path):
+    # Keep rendered PDFs out of the working tree and out of other tests
+    if render_cache: render_cache.configure(str(tmp_path / "render_cache"))
+    yield
+    if render_cache: render_cache.configure(None)
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    # Fresh SQLite database per test; seed rows in a same-named fixture in the test module
+    if not database: pytest.skip("database module unavailable")
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(database, "_engine", None)
+    monkeypatch.setattr(database, "_SessionLocal", None)
+    engine, _ = database.init_db()
+    assert engine is not None
+    yield engine
+    engine.dispose()
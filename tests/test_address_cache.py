@@ -0,0 +1,94 @@
+import pytest
+
+import database
+import mailer
+
+ADDR = {"name": "Jane Heir", "street": "12 Elm St.", "city": "Austin", "state": "TX", "zip": "78701-1234"}
+SENDER = {"name": "Walter Smith", "address_line1": "9 Oak Ave", "city": "Dallas", "state": "TX", "zip_code": "75201"}
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+
+class FakePostGrid:
+    """Records POSTs; /contacts rejects any street containing 'Nowhere'."""
+    def __init__(self):
+        self.calls = []
+
+    def post(self, url, json=None, data=None, **kwargs):
+        self.calls.append((url, json, data))
+        if url.endswith("/contacts"):
+            if "Nowhere" in json["addressLine1"]:
+                return FakeResponse(400, {"error": {"message": "Address not found"}})
+            return FakeResponse(201, {"id": f"contact_{len(self.calls)}"})
+        return FakeResponse(200, {"id": "letter_1"})
+
+    def count(self, endpoint):
+        return sum(1 for url, _, _ in self.calls if url.endswith(endpoint))
+
+
+@pytest.fixture
+def postgrid(sqlite_db, monkeypatch):
+    fake = FakePostGrid()
+    monkeypatch.setattr(mailer, "get_api_key", lambda: "test_key")
+    monkeypatch.setattr(mailer, "_http", lambda: fake)
+    mailer.clear_address_cache()
+    yield fake
+    mailer.clear_address_cache()
+
+
+def test_fingerprint_ignores_case_punctuation_and_zip4():
+    variant = {"name": "Someone Else", "address_line1": "12  ELM ST", "city": "austin", "state": "tx", "zip_code": "78701"}
+    assert mailer.address_fingerprint(ADDR) == mailer.address_fingerprint(variant)
+    assert mailer.address_fingerprint(ADDR) != mailer.address_fingerprint({**ADDR, "street": "14 Elm St"})
+
+
+def test_repeat_validation_and_send_reuse_the_cached_contact(postgrid):
+    ok, contact = mailer.validate_address(ADDR)
+    assert ok and contact["id"] and contact["cached"] is False
+    assert mailer.validate_address({**ADDR, "street": "12 elm st"}) == (True, {"id": contact["id"], "cached": True})
+    # Same address, different person: the verdict is reused, the contact is not
+    assert mailer.validate_address({**ADDR, "name": "Bob Heir"}) == (True, {"id": None, "cached": True})
+    assert postgrid.count("/contacts") == 1
+
+    assert mailer.send_letter(b"%PDF", ADDR, SENDER) == "letter_1"
+    _, _, form = postgrid.calls[-1]
+    assert form["to"] == contact["id"]
+    assert form["from"].startswith("contact_") and "to[addressLine1]" not in form
+    # Only the sender was new
+    assert postgrid.count("/contacts") == 2
+
+    # A fresh process (empty memory) still finds the verdict in the DB
+    mailer.clear_address_cache()
+    mailer.send_letter(b"%PDF", ADDR, SENDER)
+    assert postgrid.count("/contacts") == 2
+    assert mailer.get_address_cache_stats()["db_hits"] == 2
+
+
+def test_rejections_are_cached_and_expire_sooner(postgrid, monkeypatch):
+    bad = {"name": "Nobody", "street": "1 Nowhere Rd", "city": "Austin", "state": "TX", "zip": "78701"}
+    assert mailer.validate_address(bad) == (False, "PostGrid Rejected: Address not found")
+    assert mailer.validate_address(bad) == (False, "PostGrid Rejected: Address not found")
+    assert postgrid.count("/contacts") == 1
+
+    # Sending to a rejected address falls back to inline fields without another contact call
+    mailer.send_letter(b"%PDF", bad, SENDER)
+    _, _, form = postgrid.calls[-1]
+    assert form["to[addressLine1]"] == "1 Nowhere Rd" and "to" not in form
+
+    monkeypatch.setattr(mailer, "INVALID_TTL", mailer.INVALID_TTL * 0)
+    mailer.validate_address(bad)
+    assert postgrid.count("/contacts") == 3
+
+
+def test_service_errors_soft_pass_without_caching(postgrid, monkeypatch):
+    monkeypatch.setattr(postgrid, "post", lambda url, **kw: FakeResponse(503, {}))
+    assert mailer.validate_address(ADDR) == (True, "Service Warning (503)")
+    assert database.get_address_validations(mailer.address_fingerprint(ADDR)) == []
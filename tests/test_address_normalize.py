@@ -0,0 +1,28 @@
+import pandas as pd
+
+import address_standard
+from address_standard import StandardAddress
+
+
+def test_usps_spellings_share_a_fingerprint():
+    a = StandardAddress.from_dict({"street": "12 North Elm Street, Apartment 4", "city": "Boston", "state": "ma", "zip": "02101-1234"})
+    b = StandardAddress.from_dict({"street": "12 N. ELM ST APT 4", "city": "BOSTON", "state": "MA", "zip": "02101"})
+    c = StandardAddress.from_dict({"street": "12 N Elm St Apt 5", "city": "Boston", "state": "MA", "zip": "02101"})
+    assert a.fingerprint() == b.fingerprint() != c.fingerprint()
+    assert address_standard.recipient_key("Jane  Heir", a.fingerprint()) == address_standard.recipient_key("JANE HEIR.", b.fingerprint())
+
+
+def test_vectorized_keys_match_the_scalar_rules():
+    df = pd.DataFrame({
+        "name": ["Jane Heir", "bob  smith", "Al"],
+        "street": ["12 North Elm Street", "9 West Oak Avenue Suite 200", "1 Main Rd."],
+        "city": ["Boston", "austin", "Dallas"],
+        "state": ["MA", "tx", "TX"],
+        "zip": ["02101-1234", "78701", "752011234"],
+    })
+    fingerprints = address_standard.fingerprint_columns(df)
+    keys = address_standard.recipient_keys(df, fingerprints)
+    for i, row in df.iterrows():
+        fp = StandardAddress.from_dict(row.to_dict()).fingerprint()
+        assert fingerprints[i] == fp
+        assert keys[i] == address_standard.recipient_key(row["name"], fp)
@@ -0,0 +1,60 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from pypdf import PdfReader
+
+import book_engine
+import database
+
+
+@pytest.fixture
+def sqlite_db(sqlite_db):
+    start = datetime(2025, 3, 1)
+    with database.get_db_session() as session:
+        session.add(database.Advisor(email="adv@firm.com", firm_name="Smith Wealth"))
+        session.add(database.Client(id=1, advisor_email="adv@firm.com", name="Grandma Rose", heir_name="Sarah"))
+        for i, (prompt, status) in enumerate([("Your first job?", "Approved"), ("The farm in winter", "Sent"), ("Unfinished", "Draft"), (None, "Approved")]):
+            session.add(database.Project(advisor_email="adv@firm.com", client_id=1, status=status, strategic_prompt=prompt,
+                                         content=f"Transcript {i}. " * 200, created_at=start + timedelta(days=i)))
+    yield sqlite_db
+
+
+def test_book_has_toc_and_one_chapter_per_approved_story(sqlite_db, monkeypatch):
+    batches = []
+    real_fetch = database.get_story_contents
+    monkeypatch.setattr(database, "get_story_contents", lambda ids: batches.append(list(ids)) or real_fetch(ids))
+    monkeypatch.setattr(book_engine, "STORY_BATCH_SIZE", 2)
+
+    pdf, err = book_engine.compile_book(1)
+    assert err is None
+    reader = PdfReader(io.BytesIO(pdf))
+    assert [o.title for o in reader.outline] == ["Your first job?", "The farm in winter", "Story #4"]
+    toc = reader.pages[1].extract_text()
+    assert "CONTENTS" in toc and "The farm in winter" in toc
+    assert "Transcript 2." not in "".join(p.extract_text() for p in reader.pages)  # Draft left out
+    assert batches == [[1, 2], [4]]  # transcripts fetched a batch at a time
+    assert sum(1 for p in reader.pages if "/XObject" in p["/Resources"]) == 3  # one QR per story
+
+
+def test_failed_transcript_lookup_fails_the_book(sqlite_db, monkeypatch):
+    real_fetch = database.get_story_contents
+    monkeypatch.setattr(database, "get_story_contents", lambda ids: None if 4 in ids else real_fetch(ids))
+    monkeypatch.setattr(book_engine, "STORY_BATCH_SIZE", 2)
+    assert book_engine.compile_book(1) == (None, "Could not load stories 3-3")
+
+
+def test_clients_without_stories_are_reported(sqlite_db):
+    assert database.get_book_clients()[0]["stories"] == 3
+    assert book_engine.compile_book(99) == (None, "Client Not Found")
+
+
+@pytest.mark.parametrize("count", [25, 60, 100])
+def test_toc_pages_match_the_story_count(count):
+    stories = [{"id": i, "prompt": f"Chapter {i}", "created_at": datetime(2025, 3, 1)} for i in range(1, count + 1)]
+    pdf = book_engine.render_book({"name": "Grandma Rose"}, stories, lambda ids: {i: f"Transcript {i}." for i in ids}, include_qr=False)
+    reader = PdfReader(io.BytesIO(pdf))
+    assert len(reader.outline) == count
+    toc_pages = 1 + next(i for i, p in enumerate(reader.pages[1:]) if "Transcript 1." in p.extract_text())
+    toc = "".join(p.extract_text() for p in reader.pages[1:toc_pages])
+    assert f"Chapter {count}" in toc and "Transcript" not in toc
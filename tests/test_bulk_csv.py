@@ -0,0 +1,93 @@
+import io
+
+import bulk_engine
+import database
+from tests.test_bulk_engine import SENDER
+from tests.test_campaign_worker import campaign_db  # noqa: F401 (fixture)
+from tests.test_zip_index import full_index  # noqa: F401 (fixture)
+
+CSV = (
+    "Full Name, Address_Line1 ,City,State,Zip Code,Notes\n"
+    "  Jane   Heir ,12 Elm St,Boston,ma,2101,vip\n"
+    "Bob,,Austin,TX,78701,\n"
+    "Al,1 A St,Austin,Texas,78701,\n"
+    "Cy,2 B St,Austin,tx,787011234,\n"
+    "Dee,3 C St,Austin,TX,abc,\n"
+    "Jane Heir,12 ELM ST.,boston,MA,02101,\n"
+)
+
+
+def _upload(text):
+    return io.BytesIO(text.encode("utf-8"))
+
+
+def test_stream_cleans_checks_and_bounds_chunks():
+    batches, err = bulk_engine.stream_csv(_upload(CSV), chunk_size=2)
+    assert err is None
+    batches = list(batches)
+    assert len(batches) == 3
+
+    contacts = [c for b in batches for c in b["contacts"]]
+    dedupe_key = contacts[0].pop("dedupe_key")
+    assert contacts[0] == {"row": 0, "name": "Jane Heir", "street": "12 Elm St", "city": "Boston", "state": "MA", "zip": "02101", "zip_warning": ""}
+    assert dedupe_key == contacts[-1]["dedupe_key"]
+    assert contacts[1]["zip"] == "78701-1234"
+    rejected = {r["row"]: r["reason"] for b in batches for r in b["rejected"]}
+    assert rejected == {1: "Missing street", 2: "Invalid State", 4: "Invalid ZIP"}
+    # Every value stays text: no float ZIPs, no NaN
+    assert all(isinstance(v, str) for c in contacts for k, v in c.items() if k != "row")
+
+
+def test_missing_columns_are_reported_before_reading_rows():
+    batches, err = bulk_engine.stream_csv(_upload("name,street,city\nA,1 B St,Austin\n"))
+    assert batches is None and err == "CSV Missing columns: state, zip"
+    assert bulk_engine.parse_csv(_upload("name,street,city\nA,1 B St,Austin\n")) is None
+
+
+def test_csv_streams_into_a_campaign_job(campaign_db):
+    job_id, summary, err = bulk_engine.queue_campaign_csv(_upload(CSV), "Hello", SENDER, "adv@firm.com", chunk_size=2)
+    assert err is None
+    assert (summary["accepted"], summary["rejected"], summary["duplicates"]) == (3, 3, 1)
+    job = database.get_campaign_job(job_id)
+    # The last row repeats the first across chunk boundaries
+    assert (job["status"], job["total"], job["duplicates"]) == ("Queued", 3, 1)
+    assert [r["status"] for r in database.get_campaign_recipients(job_id)] == ["Pending", "Pending", "Duplicate"]
+
+
+def test_queued_rows_keep_their_csv_row_numbers(campaign_db):
+    preview, _ = bulk_engine.preview_csv(_upload(CSV))
+    job_id, summary, err = bulk_engine.queue_campaign_csv(_upload(CSV), "Hello", SENDER, "adv@firm.com", chunk_size=2)
+    rows = database.get_campaign_recipients(job_id)
+    assert [r["row"] for r in rows] == [0, 3, 5]
+    assert [r["row"] for r in summary["rejected_rows"]] == [r["row"] for r in preview["rejected_rows"]] == [1, 2, 4]
+    dup = next(r for r in rows if r["status"] == "Duplicate")
+    assert [(d["row"], d["duplicate_of_row"]) for d in preview["duplicate_rows"]] == [(dup["row"], 0)]
+    assert dup["error"] == "Same recipient as row 0"
+
+
+def test_job_that_cannot_be_opened_is_cancelled_not_left_loading(campaign_db, monkeypatch):
+    monkeypatch.setattr(database, "open_campaign_job", lambda job_id: False)
+    job_id, summary, err = bulk_engine.queue_campaign_csv(_upload(CSV), "Hello", SENDER, "adv@firm.com")
+    assert (job_id, err) == (None, "Could Not Save Campaign")
+    with database.get_db_session() as session:
+        assert [j.status for j in session.query(database.CampaignJob).all()] == ["Cancelled"]
+
+
+def test_preview_reports_suppressed_duplicates_before_pricing():
+    text = CSV + "jane heir,12 Elm Street,Boston,MA,02101-4455,\nJane Heir,12 Elm St Apt 2,Boston,MA,02101,\n"
+    summary, err = bulk_engine.preview_csv(_upload(text), chunk_size=3)
+    assert err is None
+    assert (summary["rows"], summary["valid"], summary["rejected"], summary["duplicates"], summary["mail_pieces"]) == (8, 5, 3, 2, 3)
+    # "St" vs "Street", case and ZIP+4 collapse; a different unit does not
+    assert [(d["row"], d["duplicate_of_row"]) for d in summary["duplicate_rows"]] == [(5, 0), (6, 0)]
+
+
+def test_zip3_verdicts_are_flagged_not_rejected():
+    summary, err = bulk_engine.preview_csv(_upload("name,street,city,state,zip\nA,1 B St,Austin,MA,78701\nB,2 C St,Nowhere,TX,00012\n"))
+    assert err is None and (summary["valid"], summary["rejected"], summary["warnings"]) == (2, 0, 2)
+    assert [r["warning"] for r in summary["warning_rows"]] == ["ZIP/State mismatch", "Unknown ZIP"]
+
+
+def test_zip_from_another_state_is_rejected_with_the_full_index(full_index):
+    batches, _ = bulk_engine.stream_csv(_upload("name,street,city,state,zip\nA,1 B St,Austin,MA,78701\nB,2 C St,Nowhere,TX,00012\n"))
+    assert [r["reason"] for b in batches for r in b["rejected"]] == ["ZIP/State mismatch", "Unknown ZIP"]
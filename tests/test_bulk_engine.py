@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+import bulk_engine
+import letter_format
+import mailer
+from rate_limiter import TokenBucket
+
+SENDER = {"name": "Smith Wealth", "address_line1": "9 Oak Ave", "city": "Dallas", "state": "TX", "zip": "75201"}
+
+
+def _contacts(n):
+    return [{"name": f"Client {i}", "street": f"{i} Elm St", "city": "Austin", "state": "TX", "zip": "78701"} for i in range(n)]
+
+
+class FakeLetters:
+    """submit_letter stand-in that remembers idempotency keys like PostGrid does."""
+    def __init__(self, fail_names=()):
+        self.by_key = {}
+        self.calls = 0
+        self.fail_names = set(fail_names)
+        self.lock = threading.Lock()
+
+    def submit_letter(self, pdf_bytes, to_addr, from_addr, description=None, idempotency_key=None, limiter=None, max_attempts=1, **kw):
+        if limiter: limiter.acquire()
+        with self.lock:
+            self.calls += 1
+            if to_addr["name"] in self.fail_names: return None, "PostGrid Error 422"
+            if idempotency_key not in self.by_key: self.by_key[idempotency_key] = f"letter_{len(self.by_key)}"
+            return self.by_key[idempotency_key], None
+
+
+@pytest.fixture
+def fake_postgrid(monkeypatch):
+    fake = FakeLetters(fail_names={"Client 3"})
+    monkeypatch.setattr(mailer, "submit_letter", fake.submit_letter)
+    monkeypatch.setattr(letter_format, "create_pdf", lambda *a, **kw: b"%PDF-1.4")
+    monkeypatch.setattr(bulk_engine, "audit_engine", None)
+    return fake
+
+
+def test_campaign_report_covers_every_row_in_order(fake_postgrid):
+    contacts = _contacts(10) + [{"name": "Client 1", "street": "1 ELM ST.", "city": "austin", "state": "tx", "zip": "78701"},
+                                {"name": "No Address", "street": "", "city": "", "state": "", "zip": ""}]
+    progress = []
+    report = bulk_engine.send_campaign(contacts, "Hello", SENDER, "adv@firm.com", workers=4,
+                                       limiter=TokenBucket(rate=1000, capacity=1000), on_progress=lambda d, t, r: progress.append(d))
+
+    assert (report["total"], report["sent"], report["failed"], report["duplicates"]) == (12, 9, 2, 1)
+    assert [r["row"] for r in report["rows"]] == list(range(12))
+    assert report["rows"][3]["error"] == "PostGrid Error 422"
+    assert report["rows"][10]["status"] == "Duplicate" and report["rows"][10]["letter_id"] == report["rows"][1]["letter_id"]
+    assert report["rows"][11]["error"] == "Missing Address"
+    assert progress[-1] == 12 and fake_postgrid.calls == 10
+    assert bulk_engine.report_csv(report["rows"]).decode().splitlines()[0] == "row,name,zip,status,letter_id,error,idempotency_key"
+
+
+def test_rerunning_a_campaign_reuses_idempotency_keys(fake_postgrid):
+    limiter = TokenBucket(rate=1000, capacity=1000)
+    first = bulk_engine.send_campaign(_contacts(6), "Hello", SENDER, "adv@firm.com", limiter=limiter)
+    again = bulk_engine.send_campaign(_contacts(6), "Hello", SENDER, "adv@firm.com", campaign_id=first["campaign_id"], limiter=limiter)
+    assert [r["letter_id"] for r in first["rows"]] == [r["letter_id"] for r in again["rows"]]
+    # PostGrid saw the same keys twice and created each letter once
+    assert len(fake_postgrid.by_key) == 5
+
+    # Same sender and letter, sent again on purpose: a new campaign, new letters
+    second = bulk_engine.send_campaign(_contacts(6), "Hello", SENDER, "adv@firm.com", limiter=limiter)
+    assert second["campaign_id"] != first["campaign_id"]
+    assert len(fake_postgrid.by_key) == 10
+
+
+class FlakyHttp:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.headers = []
+
+    def post(self, url, headers=None, **kw):
+        self.headers.append(headers)
+        status = self.statuses.pop(0)
+        return type("R", (), {"status_code": status, "text": "", "headers": {}, "json": lambda self: {"id": "letter_9"}})()
+
+
+def test_submit_letter_retries_transient_errors_with_the_same_key(monkeypatch):
+    http = FlakyHttp([503, 429, 201])
+    monkeypatch.setattr(mailer, "get_api_key", lambda: "test_key")
+    monkeypatch.setattr(mailer, "_http", lambda: http)
+    monkeypatch.setattr(mailer.time, "sleep", lambda s: None)
+    to_addr = {"name": "Jane", "street": "12 Elm St", "city": "Austin", "state": "TX", "zip": "78701"}
+
+    assert mailer.submit_letter(b"%PDF", to_addr, SENDER, idempotency_key="vp-abc", max_attempts=3, use_contacts=False) == ("letter_9", None)
+    assert [h["Idempotency-Key"] for h in http.headers] == ["vp-abc"] * 3
+
+    http = FlakyHttp([422, 201])
+    monkeypatch.setattr(mailer, "_http", lambda: http)
+    assert mailer.submit_letter(b"%PDF", to_addr, SENDER, idempotency_key="vp-abc", max_attempts=3, use_contacts=False) == (None, "PostGrid Error 422")
+    assert len(http.headers) == 1
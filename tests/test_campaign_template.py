@@ -0,0 +1,64 @@
+import io
+
+from pypdf import PdfReader
+
+import bulk_engine
+import campaign_template
+
+SENDER = {"name": "Smith Wealth", "address_line1": "9 Oak Ave", "city": "Dallas, TX 75201"}
+TO_ADDR = {"name": "Jane Heir", "street": "12 Elm St", "city": "Austin", "state": "TX", "zip": "78701"}
+BODY = "Dear {name},\n\nWe would love to help your family keep its stories. " + "More about the archive. " * 400
+
+
+def test_salutation_line_is_split_from_the_shared_body():
+    assert campaign_template.split_salutation("Dear {name},\n\nHello") == ("Dear {name},", "\nHello")
+    assert campaign_template.split_salutation("Hello there\nDear {name}") == (None, "Hello there\nDear {name}")
+
+
+def _text_runs(pdf_bytes):
+    runs = []
+    for n, page in enumerate(PdfReader(io.BytesIO(pdf_bytes)).pages):
+        page.extract_text(visitor_text=lambda text, cm, tm, font, size: text.strip() and runs.append(
+            (n, round(tm[4], 1), round(tm[5], 1), text.strip(), font.get("/BaseFont", "")[7:] if font else None)))
+    return sorted(runs)
+
+
+def test_stamp_adds_only_the_salutation_to_the_template():
+    template = campaign_template.CampaignTemplate(BODY, SENDER)
+    assert template.page_count > 1
+    assert "{name}" not in "".join(p.extract_text() for p in PdfReader(io.BytesIO(template.pdf_bytes)).pages)
+
+    overlay_text = PdfReader(io.BytesIO(template.overlay(TO_ADDR))).pages[0].extract_text()
+    assert overlay_text.splitlines() == ["Dear Jane Heir,"]
+
+    stamped = template.stamp(TO_ADDR)
+    reader = PdfReader(io.BytesIO(stamped))
+    assert len(reader.pages) == template.page_count
+    # Template font plus the overlay's subset of it on page 1; later pages untouched
+    assert len(reader.pages[0]["/Resources"]["/Font"]) == 2
+    assert len(reader.pages[1]["/Resources"]["/Font"]) == 1
+    # The shared body isn't re-typeset: a stamp is the template plus a small overlay
+    assert len(stamped) < len(template.pdf_bytes) + 16384
+
+
+def test_stamped_letters_match_the_full_render(monkeypatch):
+    monkeypatch.setattr(bulk_engine.letter_format, "render_cache", None)
+    template = bulk_engine.build_template(BODY, SENDER)
+    assert _text_runs(bulk_engine.render_row(TO_ADDR, BODY, SENDER, template)) == _text_runs(bulk_engine.render_row(TO_ADDR, BODY, SENDER))
+    # No salutation: nothing to stamp, every letter is the template itself
+    body = BODY.partition("\n")[2]
+    template = bulk_engine.build_template(body, SENDER)
+    assert bulk_engine.render_row(TO_ADDR, body, SENDER, template) is template.pdf_bytes
+    assert _text_runs(template.pdf_bytes) == _text_runs(bulk_engine.render_row(TO_ADDR, body, SENDER))
+
+
+def test_name_mid_body_prints_the_same_on_both_paths():
+    body = "Hello,\n\nThank you {name}, for your trust."
+    assert not campaign_template.supports(body) and campaign_template.supports(BODY)
+    template = bulk_engine.build_template(body, SENDER)
+    assert template is None
+
+    texts = ["".join(p.extract_text() for p in PdfReader(io.BytesIO(bulk_engine.render_row(TO_ADDR, body, SENDER, t))).pages)
+             for t in (template, None)]
+    assert texts[0] == texts[1]
+    assert "Thank you Jane Heir," in " ".join(texts[0].split())
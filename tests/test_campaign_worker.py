@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+import bulk_engine
+import campaign_worker
+import database
+import letter_format
+import mailer
+from rate_limiter import TokenBucket
+from tests.test_bulk_engine import SENDER, FakeLetters, _contacts
+
+
+@pytest.fixture
+def campaign_db(sqlite_db, monkeypatch):
+    # Tests drive the worker by hand instead of the background thread
+    monkeypatch.setenv("CAMPAIGNS_WORKER_ENABLED", "false")
+    fake = FakeLetters(fail_names={"Client 2"})
+    monkeypatch.setattr(mailer, "submit_letter", fake.submit_letter)
+    monkeypatch.setattr(letter_format, "create_pdf", lambda *a, **kw: b"%PDF-1.4")
+    monkeypatch.setattr(bulk_engine, "audit_engine", None)
+    monkeypatch.setattr(campaign_worker, "audit_engine", None)
+    yield fake
+
+
+def _tick():
+    return campaign_worker.process_next_job(limiter=TokenBucket(rate=1000, capacity=1000), workers=2)
+
+
+def test_queued_campaign_is_sent_and_checkpointed(campaign_db):
+    job_id, err = bulk_engine.queue_campaign(_contacts(7) + _contacts(1), "Hello", SENDER, "adv@firm.com")
+    assert err is None
+    assert database.get_campaign_job(job_id)["status"] == "Queued"
+
+    assert _tick() == job_id
+    job = database.get_campaign_job(job_id)
+    assert (job["status"], job["total"], job["sent"], job["failed"], job["duplicates"]) == ("Done", 8, 6, 1, 1)
+    rows = database.get_campaign_recipients(job_id)
+    assert [r["status"] for r in rows] == ["Sent", "Sent", "Failed", "Sent", "Sent", "Sent", "Sent", "Duplicate"]
+    assert rows[0]["letter_id"] and rows[2]["error"] == "PostGrid Error 422"
+    assert _tick() is None
+
+
+def test_crashed_job_resumes_without_double_mailing(campaign_db, monkeypatch):
+    monkeypatch.setattr(campaign_worker, "CHECKPOINT_ROWS", 3)
+    job_id, _ = bulk_engine.queue_campaign(_contacts(8), "Hello", SENDER, "adv@firm.com")
+
+    # First worker sends a batch, checkpoints, then dies mid-way through the next one
+    job = database.claim_campaign_job("worker-a", datetime.utcnow())
+    first = database.lease_campaign_recipients(job_id, limit=3)
+    database.record_campaign_results(job_id, [{**bulk_engine.send_row(r, "Hello", SENDER, "adv@firm.com", None), "id": r["id"]} for r in first])
+    in_flight = database.lease_campaign_recipients(job_id, limit=3)
+    for r in in_flight: bulk_engine.send_row(r, "Hello", SENDER, "adv@firm.com", None)
+    assert campaign_db.calls == 6
+
+    # Not stale yet: nobody else may take it
+    assert _tick() is None
+    with database.get_db_session() as session:
+        session.execute(text("UPDATE campaign_jobs SET heartbeat_at = :t"), {"t": datetime.utcnow() - timedelta(hours=1)})
+
+    assert _tick() == job_id
+    job = database.get_campaign_job(job_id)
+    assert (job["status"], job["sent"], job["failed"]) == ("Done", 7, 1)
+    # The in-flight rows were re-sent under their original keys: 7 letters created, not 10
+    assert len(campaign_db.by_key) == 7
+    assert {r["attempts"] for r in database.get_campaign_recipients(job_id) if r["row"] in (3, 4, 5)} == {2}
+
+
+def test_a_second_identical_campaign_gets_its_own_keys(campaign_db):
+    first, _ = bulk_engine.queue_campaign(_contacts(3), "Hello", SENDER, "adv@firm.com")
+    second, _ = bulk_engine.queue_campaign(_contacts(3), "Hello", SENDER, "adv@firm.com")
+    keys = [{r["idempotency_key"] for r in database.get_campaign_recipients(job_id)} for job_id in (first, second)]
+    assert keys[0].isdisjoint(keys[1])
+
+
+def test_cancel_stops_at_the_next_checkpoint(campaign_db):
+    job_id, _ = bulk_engine.queue_campaign(_contacts(5), "Hello", SENDER, "adv@firm.com")
+    assert database.cancel_campaign_job(job_id)
+    assert _tick() is None
+    job = database.get_campaign_job(job_id)
+    assert (job["status"], job["sent"]) == ("Cancelled", 0)
+    assert {r["status"] for r in database.get_campaign_recipients(job_id)} == {"Cancelled"}
+    assert campaign_db.calls == 0
@@ -0,0 +1,38 @@
+import threading
+import time
+
+import client_registry
+
+
+def test_factory_runs_once_under_contention():
+    client_registry.reset("test_vendor")
+    calls = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)  # widen the race window
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client_registry.get_client("test_vendor", factory))) for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    assert len(calls) == 1
+    assert len({id(r) for r in results}) == 1
+    stats = client_registry.get_stats()["test_vendor"]
+    assert stats["builds"] == 1
+    assert stats["hits"] + stats["misses"] == 8
+
+
+def test_missing_credentials_are_not_cached():
+    client_registry.reset("test_flaky")
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        return None if len(attempts) == 1 else "client"
+
+    assert client_registry.get_client("test_flaky", factory) is None
+    assert client_registry.get_client("test_flaky", factory) == "client"
+    assert client_registry.get_stats()["test_flaky"]["failures"] == 1
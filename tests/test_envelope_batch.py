@@ -0,0 +1,33 @@
+import io
+
+from pypdf import PdfReader
+
+import envelope_format
+
+FROM_ADDR = {"name": "Walter Smith", "address_line1": "9 Oak Ave", "city": "Dallas", "state": "TX", "zip_code": "75201"}
+
+
+def _addr(i):
+    return {"name": f"Person {i}", "address_line1": f"{i} Elm St", "city": "Austin", "state": "TX", "zip_code": "78701"}
+
+
+def test_build_block_handles_campaign_keys_and_nulls():
+    assert envelope_format.build_block({"name": "Ann", "street": "1 Main", "city": "Austin", "state": "TX", "zip": "78701"}) == "Ann\n1 Main\nAustin, TX 78701"
+    assert envelope_format.build_block({"name": "Ann", "address_line1": "1 Main", "city": None, "state": "TX", "zip_code": None}) == "Ann\n1 Main\nTX"
+    assert envelope_format.build_block(None) == ""
+
+
+def test_many_envelopes_render_into_one_document():
+    pdf = envelope_format.create_envelopes([_addr(i) for i in range(25)], FROM_ADDR)
+    pages = PdfReader(io.BytesIO(pdf)).pages
+    assert len(pages) == 25
+    assert "Person 24" in pages[24].extract_text() and "Walter Smith" in pages[24].extract_text()
+    assert envelope_format.create_envelopes([]) is None
+
+
+def test_label_sheet_fills_30_per_page_and_skips_blank_addresses():
+    addresses = [_addr(i) for i in range(31)] + [{}]
+    pages = PdfReader(io.BytesIO(envelope_format.create_label_sheet(addresses))).pages
+    assert len(pages) == 2
+    assert "Person 29" in pages[0].extract_text() and "Person 30" in pages[1].extract_text()
+    assert len(PdfReader(io.BytesIO(envelope_format.create_label_sheet(addresses, layout="5163"))).pages) == 4
@@ -0,0 +1,95 @@
+import re
+
+import pytest
+from fpdf import FPDF
+
+import font_cache
+import letter_format
+
+TO_ADDR = {"name": "Jane Heir", "address_line1": "12 Elm St", "city": "Austin", "state": "TX", "zip_code": "78701"}
+FROM_ADDR = {"name": "Walter Smith", "address_line1": "9 Oak Ave", "city": "Dallas", "state": "TX", "zip_code": "75201"}
+BODY = "We kept the farm ledger in a tin box by the stove. " * 60
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    font_cache.reset()
+    font_cache.CACHE_ENABLED = True
+    yield
+    font_cache.CACHE_ENABLED = True
+    font_cache.reset()
+
+
+def _text_ops(pdf_bytes):
+    # Font subsets are tagged per document; the text operators carry the layout
+    return re.findall(rb"BT .*? ET", pdf_bytes, re.S)
+
+
+def _render(enabled):
+    font_cache.CACHE_ENABLED = enabled
+    pdf = letter_format.create_pdf(BODY, TO_ADDR, FROM_ADDR, "Heritage Wealth")
+    return bytes(pdf)
+
+
+@pytest.mark.skipif(not font_cache.resolve_font_path("TypeRight"), reason="TypeRight font not bundled")
+def test_font_is_parsed_once_across_documents():
+    for _ in range(3):
+        pdf = FPDF()
+        assert font_cache.register_font(pdf, "TypeRight")
+    stats = font_cache.get_stats()
+    assert stats["parses"] == 1
+    assert stats["hits"] == 3
+    assert stats["cached"] == ["TypeRight"]
+
+
+@pytest.mark.skipif(not font_cache.resolve_font_path("TypeRight"), reason="TypeRight font not bundled")
+def test_cached_widths_match_fpdf():
+    cached, plain = FPDF(), FPDF()
+    font_cache.register_font(cached, "TypeRight")
+    plain.add_font("TypeRight", "", font_cache.resolve_font_path("TypeRight"))
+    for pdf in (cached, plain): pdf.set_font("TypeRight", size=11)
+
+    line = ""
+    for ch in "Heirloom letters, word by word.":
+        line += ch
+        assert cached.get_string_width(line) == pytest.approx(plain.get_string_width(line))
+        assert cached.get_string_width(ch) == pytest.approx(plain.get_string_width(ch))
+
+
+@pytest.mark.skipif(not font_cache.resolve_font_path("TypeRight"), reason="TypeRight font not bundled")
+def test_cached_letter_lays_out_like_uncached(monkeypatch):
+    class Uncompressed(letter_format.LetterPDF):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.set_compression(False)
+
+    monkeypatch.setattr(letter_format, "LetterPDF", Uncompressed)
+    monkeypatch.setattr(letter_format.render_cache, "ENABLED", False)
+    cached = _text_ops(_render(True))
+    assert cached and cached == _text_ops(_render(False))
+
+
+def test_missing_font_falls_back(monkeypatch):
+    monkeypatch.setitem(font_cache.FONT_CANDIDATES, "Nope", ["does/not/exist.ttf"])
+    assert font_cache.register_font(FPDF(), "Nope") is False
+    assert font_cache.warm(["Nope"]) == []
+
+
+@pytest.mark.skipif(not font_cache.resolve_font_path("TypeRight"), reason="TypeRight font not bundled")
+def test_missing_fpdf_internals_fall_back_to_plain_fonts(monkeypatch):
+    monkeypatch.setattr(font_cache, "SubsetMap", None)
+    pdf = FPDF()
+    assert font_cache.register_font(pdf, "TypeRight")
+    assert (font_cache.get_stats()["hits"], font_cache.get_stats()["fallbacks"]) == (0, 1)
+    monkeypatch.undo()
+
+    # Width override falls back to fpdf's own computation
+    font_cache.reset()
+    cached, plain = FPDF(), FPDF()
+    font_cache.register_font(cached, "TypeRight")
+    plain.add_font("TypeRight", "", font_cache.resolve_font_path("TypeRight"))
+    for pdf in (cached, plain): pdf.set_font("TypeRight", size=11)
+
+    def broken(self, text, size): raise AttributeError("_map_symbol_text")
+    monkeypatch.setattr(font_cache.CachedTTFFont, "_incremental_width", broken)
+    assert cached.get_string_width("Heirloom letters") == pytest.approx(plain.get_string_width("Heirloom letters"))
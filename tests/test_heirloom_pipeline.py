@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import heirloom_engine
+
+
+def test_upload_and_transcription_overlap(monkeypatch):
+    seen = {}
+
+    def fake_upload(user_email, audio_bytes):
+        time.sleep(0.3)
+        seen["upload"] = audio_bytes
+        return f"{user_email}/story.mp3"
+
+    def fake_transcribe(f):
+        time.sleep(0.3)
+        seen["transcribe"] = f.read()
+        return "Once upon a time"
+
+    monkeypatch.setattr(heirloom_engine.storage_engine, "upload_audio", fake_upload)
+    monkeypatch.setattr(heirloom_engine.ai_engine, "transcribe_audio", fake_transcribe)
+
+    start = time.perf_counter()
+    transcript, path = heirloom_engine.store_and_transcribe(b"ID3fake-mp3", "heir@x.com")
+    elapsed = time.perf_counter() - start
+
+    assert (transcript, path) == ("Once upon a time", "heir@x.com/story.mp3")
+    assert seen == {"upload": b"ID3fake-mp3", "transcribe": b"ID3fake-mp3"}
+    assert elapsed < 0.5  # max(upload, transcribe), not the sum
+
+
+def test_failed_stage_does_not_sink_the_other(monkeypatch):
+    def broken_upload(user_email, audio_bytes):
+        raise RuntimeError("bucket offline")
+
+    monkeypatch.setattr(heirloom_engine.storage_engine, "upload_audio", broken_upload)
+    monkeypatch.setattr(heirloom_engine.ai_engine, "transcribe_audio", lambda f: "still transcribed")
+
+    assert heirloom_engine.store_and_transcribe(b"x", "heir@x.com") == ("still transcribed", None)
+
+
+def _call(sid, day):
+    rec = SimpleNamespace(sid=f"RE{sid}", uri=f"/Recordings/RE{sid}.json", date_created=datetime(2025, 3, day, tzinfo=timezone.utc), duration="60")
+    return SimpleNamespace(sid=sid, status="completed", direction="inbound", date_created=datetime(2025, 3, day, tzinfo=timezone.utc),
+                           from_="+16155551212", to="+16155550000", recordings=SimpleNamespace(list=lambda: [rec]))
+
+
+def test_stale_phone_index_hit_does_not_hide_a_newer_call(monkeypatch):
+    calls = [_call("CA2", 5), _call("CA1", 1)]
+    requests_made = []
+
+    def list_calls(from_=None, to=None, start_time_after=None, limit=None):
+        requests_made.append({"from_": from_, "to": to, "start_time_after": start_time_after})
+        return [c for c in calls if (from_ or start_time_after) and (start_time_after is None or c.date_created.replace(tzinfo=None) >= start_time_after)]
+
+    client = SimpleNamespace(username="AC", password="tok", calls=SimpleNamespace(list=list_calls))
+    hit = {"call_sid": "CA1", "recording_sid": "RECA1", "date_created": datetime(2025, 3, 1), "media_url": "https://api.twilio.com/Recordings/RECA1.mp3"}
+    fetched = []
+    monkeypatch.setattr(heirloom_engine.ai_engine, "webhooks_enabled", lambda: False)
+    monkeypatch.setattr(heirloom_engine.recording_sync, "synced_within", lambda seconds: False)
+    monkeypatch.setattr(heirloom_engine, "_get_twilio_client", lambda: client)
+    monkeypatch.setattr(heirloom_engine.database, "get_latest_recording_for_phone", lambda phone: hit)
+    monkeypatch.setattr(heirloom_engine.database, "upsert_twilio_calls", lambda rows: len(rows))
+    monkeypatch.setattr(heirloom_engine.database, "upsert_twilio_recordings", lambda rows: len(rows))
+    monkeypatch.setattr(heirloom_engine.client_registry, "get_http_session",
+                        lambda: SimpleNamespace(get=lambda url, auth=None: fetched.append(url) or SimpleNamespace(status_code=200, content=b"mp3")))
+    monkeypatch.setattr(heirloom_engine, "store_and_transcribe", lambda audio, email: ("story", "path"))
+
+    assert heirloom_engine.process_latest_call("6155551212", "heir@x.com") == ("story", "path", None)
+    assert fetched == ["https://api.twilio.com/Recordings/RECA2.mp3"]
+
+    # Mirror already has the newest call: used as-is after one calls.list request
+    calls.pop(0)
+    requests_made.clear()
+    heirloom_engine.process_latest_call("6155551212", "heir@x.com")
+    assert fetched[-1] == hit["media_url"]
+    assert requests_made == [{"from_": None, "to": None, "start_time_after": hit["date_created"]}]
+
+    # Callbacks keep the mirror current: no Twilio request at all
+    monkeypatch.setattr(heirloom_engine.ai_engine, "webhooks_enabled", lambda: True)
+    calls.insert(0, _call("CA2", 5))
+    requests_made.clear()
+    heirloom_engine.process_latest_call("6155551212", "heir@x.com")
+    assert fetched[-1] == hit["media_url"] and requests_made == []
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+import interview_scheduler
+from rate_limiter import TokenBucket
+
+
+@pytest.fixture
+def sqlite_db(sqlite_db):
+    with database.get_db_session() as session:
+        session.add(database.Advisor(email="adv@firm.com", firm_name="Smith Wealth"))
+        session.add(database.Client(advisor_email="adv@firm.com", name="Grandma", email="heir@x.com", heir_name="Sarah"))
+    yield sqlite_db
+
+
+def test_due_interviews_are_leased_dialed_and_recorded(sqlite_db, monkeypatch):
+    now = datetime.utcnow()
+    due = database.schedule_interview("heir@x.com", "+16155551212", "Tell me about your first job.", now - timedelta(minutes=1))
+    later = database.schedule_interview("heir@x.com", "+16155551212", "Later question", now + timedelta(days=1))
+    no_phone = database.schedule_interview("heir@x.com", "", "No phone", now - timedelta(minutes=2))
+
+    calls = []
+    monkeypatch.setattr(interview_scheduler.ai_engine, "trigger_outbound_call",
+                        lambda **kw: (calls.append(kw) or f"CA{kw['project_id']}", None))
+
+    dispatched, failed = interview_scheduler.dispatch_due_interviews(limiter=TokenBucket(rate=100, capacity=100))
+    assert (dispatched, failed) == (1, 1)
+    assert calls[0]["question_text"] == "Tell me about your first job."
+    assert calls[0]["advisor_name"] == "Smith Wealth"
+
+    with database.get_db_session() as session:
+        status = {p.id: (p.status, p.call_sid) for p in session.query(database.Project).all()}
+    assert status[due] == ("Pending", f"CA{due}")
+    assert status[later] == ("Scheduled", None)
+    assert status[no_phone][0] == "Call Failed"
+
+    # Already-leased rows are never dialed twice
+    assert interview_scheduler.dispatch_due_interviews(limiter=TokenBucket(rate=100, capacity=100)) == (0, 0)
+
+
+def test_each_sid_is_saved_before_the_next_call(sqlite_db, monkeypatch):
+    now = datetime.utcnow()
+    first = database.schedule_interview("heir@x.com", "+16155551212", "First", now - timedelta(minutes=2))
+    database.schedule_interview("heir@x.com", "+16155551212", "Second", now - timedelta(minutes=1))
+    seen_at_second_call = []
+
+    def dial(**kw):
+        if kw["project_id"] != first:
+            with database.get_db_session() as session:
+                seen_at_second_call.append(session.get(database.Project, first).call_sid)
+        return f"CA{kw['project_id']}", None
+
+    monkeypatch.setattr(interview_scheduler.ai_engine, "trigger_outbound_call", dial)
+    # rate 0.5 -> one dial worker, calls in order
+    assert interview_scheduler.dispatch_due_interviews(limiter=TokenBucket(rate=0.5, capacity=10)) == (2, 0)
+    assert seen_at_second_call == [f"CA{first}"]
+
+
+def test_stale_dialing_leases_are_reclaimed(sqlite_db, monkeypatch):
+    now = datetime.utcnow()
+    stranded = database.schedule_interview("heir@x.com", "+16155551212", "Stranded", now - timedelta(hours=2))
+    busy = database.schedule_interview("heir@x.com", "+16155551212", "In flight", now - timedelta(hours=1))
+    with database.get_db_session() as session:
+        session.get(database.Project, stranded).status = "Dialing"
+        session.get(database.Project, stranded).leased_at = now - timedelta(hours=1)
+        session.get(database.Project, busy).status = "Dialing"
+        session.get(database.Project, busy).leased_at = now - timedelta(seconds=30)
+
+    monkeypatch.setattr(interview_scheduler.ai_engine, "trigger_outbound_call", lambda **kw: (f"CA{kw['project_id']}", None))
+    assert interview_scheduler.dispatch_due_interviews(limiter=TokenBucket(rate=100, capacity=100)) == (1, 0)
+    with database.get_db_session() as session:
+        assert session.get(database.Project, stranded).call_sid == f"CA{stranded}"
+        assert session.get(database.Project, busy).status == "Dialing"
+
+
+def test_placed_call_is_never_redialed_when_its_sid_save_fails(sqlite_db, monkeypatch):
+    pid = database.schedule_interview("heir@x.com", "+16155551212", "Q", datetime.utcnow() - timedelta(minutes=1))
+    dialed = []
+    monkeypatch.setattr(interview_scheduler.ai_engine, "trigger_outbound_call", lambda **kw: (dialed.append(kw) or "CA9", None))
+    monkeypatch.setattr(interview_scheduler, "SAVE_RETRY_SECONDS", 0)
+    monkeypatch.setattr(interview_scheduler, "LEASE_TIMEOUT_SECONDS", -60)  # every lease counts as stale
+    real_record = database.record_call_sids
+    monkeypatch.setattr(database, "record_call_sids", lambda dispatched, failed_ids=None: False)
+
+    assert interview_scheduler.dispatch_due_interviews(limiter=TokenBucket(rate=100, capacity=100)) == (1, 0)
+    assert interview_scheduler.dispatch_due_interviews(limiter=TokenBucket(rate=100, capacity=100)) == (0, 0)
+    assert len(dialed) == 1
+
+    # The DB is back: the next tick writes the held SID instead of dialing again
+    monkeypatch.setattr(database, "record_call_sids", real_record)
+    assert interview_scheduler.dispatch_due_interviews(limiter=TokenBucket(rate=100, capacity=100)) == (0, 0)
+    with database.get_db_session() as session:
+        assert (session.get(database.Project, pid).status, session.get(database.Project, pid).call_sid) == ("Pending", "CA9")
+    assert len(dialed) == 1 and interview_scheduler._unsaved == {}
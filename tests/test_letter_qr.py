@@ -0,0 +1,28 @@
+import tempfile
+
+import letter_format
+
+TO_ADDR = {"name": "Jane Heir", "address_line1": "12 Elm St", "city": "Austin", "state": "TX", "zip_code": "78701"}
+FROM_ADDR = {"name": "Walter Smith"}
+
+
+def test_qr_is_rendered_in_memory_and_cached(monkeypatch):
+    def no_disk(*args, **kwargs):
+        raise AssertionError("QR render touched the filesystem")
+    monkeypatch.setattr(tempfile, "NamedTemporaryFile", no_disk)
+    monkeypatch.setattr(letter_format.render_cache, "ENABLED", False)
+    letter_format._qr_png.cache_clear()
+
+    first = letter_format.create_pdf("A short story.", TO_ADDR, FROM_ADDR, audio_url="draft-42")
+    second = letter_format.create_pdf("A short story.", TO_ADDR, FROM_ADDR, audio_url="draft-42")
+
+    assert b"/Subtype /Image" in first and b"/Subtype /Image" in second
+    info = letter_format._qr_png.cache_info()
+    assert (info.misses, info.hits) == (1, 1)
+
+
+def test_each_draft_gets_its_own_code():
+    letter_format._qr_png.cache_clear()
+    a = letter_format._qr_png("https://app.verbapost.com/?play=1")
+    b = letter_format._qr_png("https://app.verbapost.com/?play=2")
+    assert a.startswith(b"\x89PNG") and a != b
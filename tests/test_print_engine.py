@@ -0,0 +1,55 @@
+import io
+
+import pytest
+from pypdf import PdfReader
+
+import database
+import print_engine
+
+ADVISOR = {"full_name": "Ann Advisor", "address_line1": "1 Main St", "address_city": "Dallas", "address_state": "TX", "address_zip": "75201"}
+
+
+def _item(i, line1="12 Elm St"):
+    return {
+        "type": "Heirloom", "id": i, "email": "Sarah (via adv@firm.com)", "content": f"Story number {i}. " * 40, "status": "Approved",
+        "meta": {"storyteller": "Grandma", "firm_name": "Smith Wealth", "heir_name": "Sarah", "advisor_email_raw": "adv@firm.com",
+                 "prompt": "Tell me about the farm.", "heir_address": {"line1": line1, "city": "Austin", "state": "TX", "zip": "78701"}},
+    }
+
+
+def test_pool_run_merges_in_queue_order_and_records_the_run(sqlite_db):
+    items = [_item(i) for i in range(1, 5)] + [_item(5, line1="")]
+    lookups = []
+    events = list(print_engine.run_print_job(items, get_profile=lambda e: lookups.append(e) or ADVISOR, workers=2, created_by="ops@x.com"))
+
+    progress = [e for e in events if e["event"] == "progress"]
+    done = events[-1]
+    assert [p["done"] for p in progress] == [1, 2, 3, 4, 5]
+    assert done["event"] == "done" and lookups == ["adv@firm.com"]
+
+    letters = PdfReader(io.BytesIO(done["letters"]))
+    assert "Story number 1." in letters.pages[0].extract_text()
+    assert "Story number 5." in letters.pages[-1].extract_text() or "Story number 5." in letters.pages[-2].extract_text()
+    assert len(PdfReader(io.BytesIO(done["envelopes"])).pages) == 4
+    assert done["failed"] == {("Heirloom", 5): "No Shipping Address"}
+
+    assert database.get_latest_print_runs([("Heirloom", i) for i in range(1, 6)]) == {("Heirloom", i): done["run_id"] for i in range(1, 6)}
+    with database.get_db_session() as session:
+        run = session.query(database.PrintRun).first()
+        assert (run.status, run.item_count, run.envelope_count, run.letter_pages) == ("Ready", 5, 4, done["letter_pages"])
+
+
+def test_interleaved_file_pairs_each_letter_with_its_envelope():
+    items = [_item(1), _item(2)]
+    done = list(print_engine.run_print_job(items, get_profile=lambda e: ADVISOR, workers=1, interleave=True, record=False))[-1]
+    pages = PdfReader(io.BytesIO(done["combined"])).pages
+    envelope_pages = [i for i, p in enumerate(pages) if p.mediabox.width > p.mediabox.height]
+    assert len(envelope_pages) == 2 and envelope_pages[-1] == len(pages) - 1
+    assert done["run_id"] is None
+
+
+def test_run_files_are_written_to_disk(tmp_path):
+    done = list(print_engine.run_print_job([_item(1)], get_profile=lambda e: ADVISOR, workers=1, record=False))[-1]
+    paths = print_engine.save_run_files(done, str(tmp_path))
+    assert set(paths) == {"letters", "envelopes"}
+    with open(paths["letters"], "rb") as f: assert f.read() == done["letters"]
@@ -0,0 +1,31 @@
+from rate_limiter import TokenBucket
+
+
+class FakeClock:
+    def __init__(self): self.now = 0.0
+    def __call__(self): return self.now
+    def sleep(self, seconds): self.now += seconds
+
+
+def test_burst_then_refill():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    clock.now += 0.5
+    assert bucket.try_acquire()
+
+
+def test_acquire_blocks_for_the_deficit():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock, sleep=clock.sleep)
+    for _ in range(5): bucket.acquire()
+    # First token was free (full bucket), the next four each wait one second
+    assert abs(clock.now - 4.0) < 1e-9
+
+
+def test_acquire_timeout():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    assert bucket.acquire(timeout=0.25) is False
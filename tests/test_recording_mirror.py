@@ -0,0 +1,92 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import client_registry
+import database
+import recording_sync
+
+
+def _rec(sid, call_sid, day):
+    return {
+        "recording_sid": sid, "call_sid": call_sid, "date_created": datetime(2025, 1, day),
+        "duration": 30, "uri": f"/Recordings/{sid}.mp3", "media_url": f"https://api.twilio.com/Recordings/{sid}.mp3",
+    }
+
+
+def test_upsert_is_idempotent_and_orphans_use_anti_join(sqlite_db):
+    assert database.upsert_twilio_recordings([_rec("RE1", "CA1", 1), _rec("RE2", "CA2", 2), _rec("RE3", "CA3", 3)]) == 3
+    assert database.upsert_twilio_recordings([_rec("RE1", "CA1", 1)]) == 1
+
+    with database.get_db_session() as session:
+        # Synced draft: call_sid already cleared, only the recording URL links it
+        session.add(database.LetterDraft(user_email="a@b.com", status="Draft", tracking_number="https://api.twilio.com/Recordings/RE1.mp3"))
+        # Pending draft still carrying its call_sid
+        session.add(database.LetterDraft(user_email="a@b.com", status="Pending", call_sid="CA3"))
+
+    orphans = database.get_orphaned_recordings()
+    assert [o["sid"] for o in orphans] == ["CA2"]
+
+
+def test_sync_state_round_trip(sqlite_db):
+    assert database.get_sync_state("twilio_recordings.date_created") is None
+    database.set_sync_state("twilio_recordings.date_created", "2025-01-03T00:00:00")
+    database.set_sync_state("twilio_recordings.date_created", "2025-01-04T00:00:00")
+    assert database.get_sync_state("twilio_recordings.date_created") == "2025-01-04T00:00:00"
+
+
+def test_phone_index_returns_newest_recording_for_number(sqlite_db):
+    database.upsert_twilio_recordings([_rec("RE1", "CA1", 1), _rec("RE2", "CA2", 5), _rec("RE3", "CA3", 9)])
+    database.upsert_twilio_calls([
+        {"call_sid": "CA1", "phone": "+16155551212", "direction": "outbound-api", "status": "completed", "date_created": datetime(2025, 1, 1)},
+        {"call_sid": "CA2", "phone": "+16155551212", "direction": "inbound", "status": "completed", "date_created": datetime(2025, 1, 5)},
+        {"call_sid": "CA3", "phone": "+14155550000", "direction": "outbound-api", "status": "completed", "date_created": datetime(2025, 1, 9)},
+    ])
+    # A later callback without a date must not wipe the synced one
+    database.upsert_twilio_calls([{"call_sid": "CA2", "phone": "+16155551212", "direction": "inbound", "status": "completed", "date_created": None}])
+
+    hit = database.get_latest_recording_for_phone("+16155551212")
+    assert (hit["call_sid"], hit["recording_sid"]) == ("CA2", "RE2")
+    assert database.get_latest_recording_for_phone("+19995550000") is None
+    with database.get_db_session() as session:
+        assert session.get(database.TwilioCall, "CA2").date_created == datetime(2025, 1, 5)
+
+
+class FakeTwilio:
+    def __init__(self, recordings):
+        self._recordings = recordings
+        self.recordings = SimpleNamespace(stream=lambda **kw: iter(self._recordings))
+        self.calls = SimpleNamespace(stream=lambda **kw: iter([SimpleNamespace(
+            sid=r.call_sid, from_="+16155551212", to="+14155550000", direction="inbound", status="completed",
+            date_created=r.date_created) for r in self._recordings]))
+
+
+def test_failed_write_keeps_the_high_water_mark(sqlite_db, monkeypatch):
+    database.set_sync_state(recording_sync.HWM_KEY, "2025-01-01T00:00:00")
+    recs = [SimpleNamespace(sid=f"RE{d}", call_sid=f"CA{d}", date_created=datetime(2025, 1, d), duration="30",
+                            uri=f"/Recordings/RE{d}.json") for d in (9, 8)]
+    monkeypatch.setattr(client_registry, "get_twilio_client", lambda: FakeTwilio(recs))
+
+    real_upsert = database.upsert_twilio_recordings
+    monkeypatch.setattr(database, "upsert_twilio_recordings", lambda rows: None)
+    synced, err = recording_sync.sync_twilio_recordings(page_size=1)
+    assert err and synced == 0
+    assert database.get_sync_state(recording_sync.HWM_KEY) == "2025-01-01T00:00:00"
+
+    monkeypatch.setattr(database, "upsert_twilio_recordings", real_upsert)
+    assert recording_sync.sync_twilio_recordings(page_size=1) == (2, None)
+    assert database.get_sync_state(recording_sync.HWM_KEY) == "2025-01-09T00:00:00"
+    assert database.get_latest_recording_for_phone("+16155551212")["recording_sid"] == "RE9"
+
+
+def test_ghost_scan_uses_twilio_until_the_mirror_has_synced(sqlite_db, monkeypatch):
+    import ui_admin
+    monkeypatch.setattr(ui_admin.ai_engine, "get_all_twilio_recordings", lambda limit=50: [{"sid": "CA7", "date_created": "x", "uri": "/c.json"}])
+    # Fresh deploy: empty mirror, no high-water mark yet
+    assert not recording_sync.mirror_ready()
+    assert [o["sid"] for o in ui_admin.get_orphaned_calls()] == ["CA7"]
+
+    database.set_sync_state(recording_sync.HWM_KEY, datetime(2025, 1, 1).isoformat())
+    assert recording_sync.mirror_ready()
+    assert ui_admin.get_orphaned_calls() == []
@@ -0,0 +1,52 @@
+import os
+
+import envelope_format
+import letter_format
+import render_cache
+
+TO_ADDR = {"name": "Jane Heir", "address_line1": "12 Elm St", "city": "Austin", "state": "TX", "zip_code": "78701"}
+FROM_ADDR = {"name": "Walter Smith", "address_line1": "9 Oak Ave", "city": "Dallas", "state": "TX", "zip_code": "75201"}
+
+
+def test_repeat_render_is_served_from_cache(monkeypatch):
+    first = letter_format.create_pdf("The farm ledger.", TO_ADDR, FROM_ADDR, "Smith Wealth", audio_url="42")
+
+    def no_render(*args, **kwargs):
+        raise AssertionError("re-rendered a cached letter")
+    monkeypatch.setattr(letter_format, "LetterPDF", no_render)
+    assert letter_format.create_pdf("The farm ledger.", TO_ADDR, FROM_ADDR, "Smith Wealth", audio_url="42") == first
+    assert render_cache.get_stats()["hits"] == 1
+
+
+def test_any_visible_change_misses(monkeypatch):
+    letter_format.create_pdf("The farm ledger.", TO_ADDR, FROM_ADDR, audio_url="42")
+    letter_format.create_pdf("The farm ledger.", TO_ADDR, FROM_ADDR, audio_url="43")
+    letter_format.create_pdf("The farm ledger!", TO_ADDR, FROM_ADDR, audio_url="42")
+    monkeypatch.setattr(letter_format, "TEMPLATE_VERSION", "test-bump")
+    letter_format.create_pdf("The farm ledger.", TO_ADDR, FROM_ADDR, audio_url="42")
+    envelope_format.create_envelope(TO_ADDR, FROM_ADDR)
+    envelope_format.create_envelope(TO_ADDR, FROM_ADDR)
+
+    stats = render_cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 5, 5)
+
+
+def test_failed_renders_are_not_cached(monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("layout exploded")
+    monkeypatch.setattr(letter_format, "LetterPDF", broken)
+    letter_format.create_pdf("Body", TO_ADDR, FROM_ADDR)
+    assert render_cache.get_stats()["stores"] == 0
+
+
+def test_oldest_entries_are_evicted_past_the_size_limit(tmp_path):
+    render_cache.configure(str(tmp_path / "small"), max_mb=0.01)  # ~10 KB
+    keys = [render_cache.make_key("letter", "1", n=i) for i in range(6)]
+    for i, key in enumerate(keys):
+        render_cache.put(key, b"%PDF" + bytes(3000))
+        os.utime(render_cache._path(key), (i, i))  # deterministic age order
+
+    assert render_cache.get(keys[0]) is None
+    assert render_cache.get(keys[-1]) is not None
+    stats = render_cache.get_stats()
+    assert stats["evictions"] >= 3 and stats["size_bytes"] <= 0.01 * 1024 * 1024
@@ -0,0 +1,59 @@
+import pytest
+
+import rendition_engine
+
+
+class FakeStorage:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.sign_batches = []
+
+    def upload_object(self, path, data, content_type):
+        self.objects[path] = data
+        return path
+
+    def object_exists(self, path):
+        return path in self.objects
+
+    def download_object(self, path):
+        return self.objects.get(path)
+
+    def get_signed_urls(self, paths, expiry=3600):
+        self.sign_batches.append(list(paths))
+        return {p: (f"https://cdn.test/{p}" if p in self.objects else None) for p in paths}
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    fake = FakeStorage({"a@x.com/abc.mp3": b"ID3original"})
+    monkeypatch.setattr(rendition_engine, "storage_engine", fake)
+    monkeypatch.setattr(rendition_engine, "ffmpeg_available", lambda: True)
+    monkeypatch.setattr(rendition_engine, "transcode", lambda data, bitrate, max_seconds=None: f"aac:{bitrate}:{max_seconds}".encode())
+    rendition_engine._missing.clear()
+    return fake
+
+
+def test_rendition_paths_sit_next_to_original():
+    assert rendition_engine.rendition_paths("a@x.com/abc.mp3") == {
+        "playback": "a@x.com/abc.playback.m4a",
+        "preview": "a@x.com/abc.preview.m4a",
+    }
+
+
+def test_build_renditions_uploads_playback_and_preview(storage):
+    paths, err = rendition_engine.build_renditions("a@x.com/abc.mp3")
+    assert err is None
+    assert storage.objects[paths["playback"]] == b"aac:48k:None"
+    assert storage.objects[paths["preview"]] == b"aac:32k:30"
+
+
+def test_player_prefers_rendition_and_falls_back_to_original(storage):
+    url, fmt = rendition_engine.get_playback_url("a@x.com/abc.mp3")
+    assert url.endswith("abc.mp3") and fmt == "audio/mpeg"
+    # Known-missing rendition is not re-signed on the next view
+    rendition_engine.get_playback_url("a@x.com/abc.mp3")
+    assert storage.sign_batches[-1] == ["a@x.com/abc.mp3"]
+
+    rendition_engine.build_renditions("a@x.com/abc.mp3", b"ID3original")
+    url, fmt = rendition_engine.get_playback_url("a@x.com/abc.mp3")
+    assert url.endswith("abc.playback.m4a") and fmt == "audio/mp4"
@@ -0,0 +1,77 @@
+import pytest
+
+import storage_engine
+
+
+class FakeBucket:
+    def __init__(self):
+        self.single = []
+        self.batches = []
+
+    def create_signed_url(self, path, expires_in):
+        self.single.append((path, expires_in))
+        return {"signedURL": f"https://cdn.test/{path}?exp={expires_in}&n={len(self.single)}"}
+
+    def create_signed_urls(self, paths, expires_in):
+        self.batches.append((list(paths), expires_in))
+        return [{"path": p, "signedURL": f"https://cdn.test/{p}?exp={expires_in}", "error": None} for p in paths]
+
+
+class FakeClient:
+    def __init__(self, bucket):
+        self.storage = self
+        self._bucket = bucket
+
+    def from_(self, name):
+        assert name == storage_engine.BUCKET
+        return self._bucket
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    fake = FakeBucket()
+    monkeypatch.setattr(storage_engine, "get_storage_client", lambda: FakeClient(fake))
+    storage_engine.clear_signed_url_cache()
+    yield fake
+    storage_engine.clear_signed_url_cache()
+
+
+def test_repeat_lookups_are_served_from_cache(bucket):
+    first = storage_engine.get_signed_url("a@x.com/1.mp3")
+    assert storage_engine.get_signed_url("a@x.com/1.mp3") == first
+    # 4000s rounds down to the same 3600s bucket
+    assert storage_engine.get_signed_url("a@x.com/1.mp3", expiry=4000) == first
+    assert len(bucket.single) == 1
+    stats = storage_engine.get_signed_url_stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_links_never_outlive_the_requested_expiry(bucket):
+    storage_engine.get_signed_url("a@x.com/1.mp3", expiry=60)
+    storage_engine.get_signed_url("a@x.com/1.mp3", expiry=3500)
+    assert [exp for _, exp in bucket.single] == [60, 2700]
+
+
+def test_refreshes_before_expiry(bucket, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(storage_engine.time, "time", lambda: now[0])
+    first = storage_engine.get_signed_url("a@x.com/1.mp3")
+
+    now[0] += 1700  # over half the hour left: still served
+    assert storage_engine.get_signed_url("a@x.com/1.mp3") == first
+
+    now[0] += 200   # under half left: re-signed ahead of expiry
+    second = storage_engine.get_signed_url("a@x.com/1.mp3")
+    assert second != first
+    assert storage_engine.get_signed_url_stats()["refreshes"] == 1
+
+
+def test_batch_signs_only_misses_in_one_call(bucket):
+    storage_engine.get_signed_url("a@x.com/1.mp3")
+    urls = storage_engine.get_signed_urls(["a@x.com/1.mp3", "a@x.com/2.mp3", "a@x.com/3.mp3", "a@x.com/2.mp3"])
+
+    assert set(urls) == {"a@x.com/1.mp3", "a@x.com/2.mp3", "a@x.com/3.mp3"}
+    assert bucket.batches == [(["a@x.com/2.mp3", "a@x.com/3.mp3"], 3600)]
+    # Batch results are cached for later single lookups
+    assert storage_engine.get_signed_url("a@x.com/3.mp3") == urls["a@x.com/3.mp3"]
+    assert len(bucket.single) == 1
@@ -0,0 +1,117 @@
+import hashlib
+
+import pytest
+import requests
+
+import storage_engine
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects = {}
+        self.uploads = 0
+
+    def exists(self, path):
+        return path in self.objects
+
+    def upload(self, path, file, file_options=None):
+        if path in self.objects: raise Exception("409 Duplicate: The resource already exists")
+        self.uploads += 1
+        self.objects[path] = file
+
+    def list(self, prefix, options=None):
+        if prefix == "":
+            return [{"name": "a@x.com", "id": None}]
+        return [
+            {"name": "one.mp3", "id": "1", "metadata": {"eTag": '"abc"', "size": 100}},
+            {"name": "two.mp3", "id": "2", "metadata": {"eTag": '"abc"', "size": 100}},
+            {"name": "three.mp3", "id": "3", "metadata": {"eTag": '"def"', "size": 50}},
+        ]
+
+
+class FakeClient:
+    def __init__(self, bucket):
+        self.storage = self
+        self._bucket = bucket
+
+    def from_(self, name):
+        return self._bucket
+
+
+class Resp:
+    def __init__(self, status, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400: raise requests.HTTPError(str(self.status_code))
+
+
+class FakeTus:
+    """Accepts PATCHes in order; the second part fails once in flight."""
+    def __init__(self):
+        self.received = bytearray()
+        self.patches = 0
+        self.failed = False
+
+    def post(self, url, headers=None, timeout=None):
+        assert headers["Upload-Length"]
+        return Resp(201, {"Location": "/storage/v1/upload/resumable/upload-1"})
+
+    def head(self, url, headers=None, timeout=None):
+        return Resp(200, {"Upload-Offset": str(len(self.received))})
+
+    def patch(self, url, data=None, headers=None, timeout=None):
+        self.patches += 1
+        if int(headers["Upload-Offset"]) != len(self.received): return Resp(409)
+        if len(self.received) and not self.failed:
+            self.failed = True
+            raise requests.ConnectionError("connection reset")
+        self.received.extend(data)
+        return Resp(204, {"Upload-Offset": str(len(self.received))})
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    fake = FakeBucket()
+    monkeypatch.setattr(storage_engine, "get_storage_client", lambda: FakeClient(fake))
+    for k in storage_engine._upload_stats: storage_engine._upload_stats[k] = 0
+    return fake
+
+
+def test_same_audio_is_stored_once(bucket):
+    audio = b"ID3" + b"x" * 1000
+    first = storage_engine.upload_audio("a@x.com", audio)
+    second = storage_engine.upload_audio("a@x.com", audio)
+
+    assert first == second == f"a@x.com/{hashlib.sha256(audio).hexdigest()}.mp3"
+    assert bucket.uploads == 1
+    stats = storage_engine.get_upload_stats()
+    assert stats["duplicates_skipped"] == 1
+    assert stats["bytes_reclaimed"] == len(audio)
+
+
+def test_large_upload_resumes_failed_part(bucket, monkeypatch):
+    tus = FakeTus()
+    monkeypatch.setattr(storage_engine, "CHUNK_SIZE", 1000)
+    monkeypatch.setattr(storage_engine, "RESUMABLE_THRESHOLD", 1500)
+    monkeypatch.setattr(storage_engine, "RETRY_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(storage_engine, "_get_credentials", lambda: ("https://proj.supabase.co", "key"))
+    monkeypatch.setattr(storage_engine, "_get_http", lambda: tus)
+
+    audio = bytes(range(256)) * 12  # 3072 bytes -> 4 parts
+    path = storage_engine.upload_audio("a@x.com", audio)
+
+    assert path.endswith(".mp3")
+    assert bytes(tus.received) == audio
+    assert tus.patches == 5  # one retried part, nothing re-sent from the start
+    stats = storage_engine.get_upload_stats()
+    assert stats["resumable_uploads"] == 1
+    assert stats["chunk_retries"] == 1
+
+
+def test_duplicate_report_counts_reclaimable_bytes(bucket):
+    report = storage_engine.duplicate_report()
+    assert report["objects"] == 3
+    assert report["duplicate_objects"] == 1
+    assert report["reclaimable_bytes"] == 100
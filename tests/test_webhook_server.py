@@ -0,0 +1,122 @@
+import threading
+from urllib.parse import urlencode
+
+import requests
+from twilio.request_validator import RequestValidator
+
+import webhook_server
+
+AUTH_TOKEN = "test_auth_token"
+
+
+class FakeTwilio:
+    """Posts signed callbacks the way Twilio does (form-encoded + X-Twilio-Signature)."""
+
+    def __init__(self, base_url, auth_token=AUTH_TOKEN):
+        self.base_url = base_url
+        self.validator = RequestValidator(auth_token)
+
+    def post(self, path, params, sign=True):
+        url = f"{self.base_url}{path}"
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        if sign: headers["X-Twilio-Signature"] = self.validator.compute_signature(url, params)
+        return requests.post(url, data=urlencode(params), headers=headers, timeout=5)
+
+
+def _start(handler, on_call_status=None, on_recording_status=None):
+    server = webhook_server.create_server(host="127.0.0.1", port=0, handler=handler, auth_token=AUTH_TOKEN,
+                                          base_url="http://placeholder", on_call_status=on_call_status,
+                                          on_recording_status=on_recording_status)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    server.RequestHandlerClass.base_url = base
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, FakeTwilio(base)
+
+
+def test_signed_recording_callback_is_enqueued_once():
+    jobs = []
+    server, twilio = _start(lambda job: jobs.append(job) or True)
+    try:
+        params = {"CallSid": "CA1", "RecordingSid": "RE1", "RecordingStatus": "completed",
+                  "RecordingUrl": "https://api.twilio.com/2010-04-01/Accounts/AC1/Recordings/RE1"}
+        assert twilio.post("/twilio/recording-status", params).status_code == 200
+        # Twilio retry of the same recording
+        assert twilio.post("/twilio/recording-status", params).status_code == 200
+        server.RequestHandlerClass.ingest.join()
+        assert [j["recording_sid"] for j in jobs] == ["RE1"]
+    finally:
+        server.shutdown()
+
+
+def test_unsigned_or_forged_callbacks_are_rejected():
+    jobs = []
+    server, twilio = _start(lambda job: jobs.append(job) or True)
+    try:
+        params = {"CallSid": "CA2", "RecordingSid": "RE2", "RecordingUrl": "https://api.twilio.com/x/RE2"}
+        assert twilio.post("/twilio/recording-status", params, sign=False).status_code == 403
+        forged = FakeTwilio(twilio.base_url, auth_token="wrong")
+        assert forged.post("/twilio/recording-status", params).status_code == 403
+        server.RequestHandlerClass.ingest.join()
+        assert jobs == []
+    finally:
+        server.shutdown()
+
+
+def test_call_status_hook_receives_params():
+    seen = []
+    server, twilio = _start(lambda job: True, on_call_status=seen.append)
+    try:
+        twilio.post("/twilio/call-status", {"CallSid": "CA3", "CallStatus": "no-answer"})
+        assert seen and seen[0]["CallStatus"] == "no-answer"
+    finally:
+        server.shutdown()
+
+
+def test_unmatched_recordings_are_retried_then_released():
+    calls = []
+    results = iter([False, RuntimeError("download failed"), True])
+
+    def handler(job):
+        calls.append(job.get("attempt", 0))
+        result = next(results)
+        if isinstance(result, Exception): raise result
+        return result
+
+    ingest = webhook_server.IngestQueue(handler=handler, workers=1, max_attempts=3, retry_seconds=0.01)
+    job = {"call_sid": "CA4", "recording_sid": "RE4", "recording_url": "https://api.twilio.com/x/RE4"}
+    assert ingest.submit(job)
+    assert ingest.submit(job) is False  # still owned while retrying
+    assert ingest.join(timeout=5)
+    assert calls == [0, 1, 2]
+
+    # Out of retries: the SID is released so a Twilio retry can submit it again
+    gave_up = webhook_server.IngestQueue(handler=lambda job: False, workers=1, max_attempts=2, retry_seconds=0.01)
+    assert gave_up.submit(job)
+    assert gave_up.join(timeout=5)
+    assert gave_up.submit(job)
+
+
+def test_recording_work_waits_for_an_owner_and_is_not_repeated(monkeypatch):
+    work, writes = [], []
+    owners = iter([None, "heir@x.com"])
+    monkeypatch.setattr(webhook_server.database, "get_owner_email_by_sid", lambda sid: next(owners))
+    monkeypatch.setattr(webhook_server.ai_engine, "fetch_recording_audio", lambda path: work.append("download") or b"mp3")
+    monkeypatch.setattr(webhook_server.heirloom_engine, "store_and_transcribe", lambda audio, owner: work.append(owner) or ("Once", "heir@x.com/a.mp3"))
+    monkeypatch.setattr(webhook_server.database, "update_draft_by_sid", lambda *a, **kw: writes.append(kw["audio_ref"]) or len(writes) > 1)
+
+    job = {"call_sid": "CA5", "recording_sid": "RE5", "recording_url": "https://api.twilio.com/x/RE5"}
+    assert webhook_server.process_recording(job) is False  # no draft yet: nothing downloaded or paid for
+    assert work == []
+    assert webhook_server.process_recording(job) is False  # DB write failed
+    assert webhook_server.process_recording(job) is True   # retry only redoes the write
+    assert work == ["download", "heir@x.com"]
+    assert writes == ["heir@x.com/a.mp3"] * 2
+
+
+def test_storage_route_is_404_without_the_storage_engine(monkeypatch):
+    monkeypatch.setattr(webhook_server, "storage_engine", None)
+    server, twilio = _start(lambda job: True)
+    try:
+        assert requests.get(f"{twilio.base_url}/storage/heir/story.mp3?expires=1&sig=x", timeout=5).status_code == 404
+    finally:
+        server.shutdown()
@@ -0,0 +1,76 @@
+import pytest
+
+import mailer
+import zip_index
+from address_standard import StandardAddress, check_address, zip_warning
+from tests.test_address_cache import ADDR, SENDER, postgrid  # noqa: F401 (fixture)
+
+
+@pytest.fixture
+def full_index(tmp_path):
+    source = tmp_path / "zips.csv"
+    source.write_text("zip,city,state\n78701,Austin,TX\n78701,Downtown,TX\n02101,Boston,Massachusetts\n")
+    count, err = zip_index.build_index(str(source), str(tmp_path / "index"))
+    assert (count, err) == (2, None)
+    zip_index.configure(str(tmp_path / "index"))
+    yield
+    zip_index.configure()
+
+
+def test_pasted_blocks_parse_offline():
+    addr = StandardAddress.from_text("Jane Heir\n12 Elm St\nSuite 200\nNew York NY 10001-2345\nUSA")
+    assert (addr.name, addr.street, addr.address_line2, addr.city, addr.state, addr.zip_code) == \
+        ("Jane Heir", "12 Elm St", "Suite 200", "New York", "NY", "10001-2345")
+    addr = StandardAddress.from_text("Jane Heir, 12 Elm St, Charleston, West Virginia 25301")
+    assert (addr.name, addr.street, addr.city, addr.state, addr.zip_code) == ("Jane Heir", "12 Elm St", "Charleston", "WV", "25301")
+    # A return address without a street keeps the city line out of address_line1
+    addr = StandardAddress.from_text("VerbaPost HQ\nFranklin, TN")
+    assert (addr.name, addr.street, addr.city, addr.state) == ("VerbaPost HQ", "", "Franklin", "TN")
+
+
+def test_obviously_bad_addresses_are_caught_locally():
+    base = {"street": "1 Main St", "city": "Austin", "state": "TX", "zip": "78701"}
+    assert check_address(base)[1] is None
+    assert check_address({**base, "state": "Texas"})[0].state == "TX"
+    assert check_address({**base, "zip": "7870"})[1] == "Invalid ZIP"
+    assert check_address({**base, "state": "Texxas"})[1] == "Invalid State"
+    assert check_address({**base, "street": " "})[1] == "Missing street"
+    assert check_address({**base, "zip": "06390", "state": "NY"})[1] is None
+
+
+def test_zip3_table_verdicts_are_only_warnings():
+    # Alta, WY is served from an Idaho ZIP3: the coarse table must not block it
+    alta = {"street": "1 Main St", "city": "Alta", "state": "WY", "zip": "83414"}
+    assert check_address(alta)[1] is None and zip_warning(alta) == "ZIP/State mismatch"
+    unknown = {**alta, "zip": "00012"}
+    assert check_address(unknown)[1] is None and zip_warning(unknown) == "Unknown ZIP"
+    assert zip_warning({**alta, "zip": "78701", "state": "TX"}) is None
+    problems, warnings = zip_index.zip_state_problems(["78701", "78701", "00012", "96910"], ["TX", "MA", "TX", "GU"])
+    assert list(problems) == ["", "", "", ""]
+    assert list(warnings) == ["", "ZIP/State mismatch", "Unknown ZIP", ""]
+
+
+def test_full_index_verdicts_are_rejections(full_index):
+    base = {"street": "1 Main St", "city": "Austin", "state": "TX", "zip": "78701"}
+    assert check_address({**base, "state": "MA"})[1] == "ZIP/State mismatch"
+    assert check_address({**base, "zip": "00012"})[1] == "Unknown ZIP"
+    # Not in the (partial) full index: falls back to a ZIP3 warning
+    assert check_address({**base, "zip": "78702", "state": "MA"})[1] is None
+    problems, warnings = zip_index.zip_state_problems(["78701", "00012", "78702"], ["MA", "TX", "MA"])
+    assert list(problems) == ["ZIP/State mismatch", "Unknown ZIP", ""]
+    assert list(warnings) == ["", "", "ZIP/State mismatch"]
+
+
+def test_full_index_is_memory_mapped_and_fills_the_city(full_index):
+    assert zip_index.has_full_index()
+    assert zip_index.lookup("78701")["city"] == "AUSTIN"
+    addr, err = check_address({"street": "1 Main St", "city": "", "state": "", "zip": "02101"})
+    assert err is None and (addr.city, addr.state) == ("Boston", "MA")
+    assert StandardAddress.from_text("Jane\n1 Main St\n78701").city == "Austin"
+
+
+def test_local_rejections_never_reach_postgrid(postgrid, full_index):
+    bad = {**ADDR, "state": "CA"}
+    assert mailer.validate_address(bad) == (False, "ZIP/State mismatch")
+    assert mailer.submit_letter(b"%PDF", bad, SENDER) == (None, "Invalid Address: ZIP/State mismatch")
+    assert postgrid.calls == []
@@ -5,7 +5,9 @@ import base64
 import os
 import json
 import requests
+from functools import partial
 from sqlalchemy import text
+from address_standard import StandardAddress
 
 # --- MODULE IMPORTS ---
 try: import database
@@ -22,10 +24,35 @@ try: import ai_engine
 except ImportError: ai_engine = None
 try: import email_engine
 except ImportError: email_engine = None
+try: import client_registry
+except ImportError: client_registry = None
+try: import recording_sync
+except ImportError: recording_sync = None
+try: import storage_engine
+except ImportError: storage_engine = None
+try: import rendition_engine
+except ImportError: rendition_engine = None
+try: import print_engine
+except ImportError: print_engine = None
+try: import render_cache
+except ImportError: render_cache = None
+try: import book_engine
+except ImportError: book_engine = None
+try: import mailer
+except ImportError: mailer = None
+try: import bulk_engine
+except ImportError: bulk_engine = None
 
 # --- HELPER FUNCTIONS ---
 
 def get_orphaned_calls():
+    # Preferred: SQL anti-join against the local recordings mirror, once it has synced
+    # (a fresh deploy's empty mirror would report every call as accounted for)
+    if database and hasattr(database, "get_orphaned_recordings") and recording_sync and recording_sync.mirror_ready():
+        orphans = database.get_orphaned_recordings()
+        if orphans is not None: return orphans
+
+    # Fallback: live Twilio scan (only sees the 50 most recent recordings)
     if not ai_engine or not database: return []
     twilio_calls = ai_engine.get_all_twilio_recordings(limit=50)
     if not twilio_calls: return []
@@ -112,38 +139,67 @@ def map_profile_to_addr(profile, name_override=None):
 
 def parse_address_text(raw_text):
     """
-    Robustly parses a text block into address components.
+    Parses a text block into address components (offline parser shared with
+    bulk, signup and mailer; see address_standard.StandardAddress.from_text).
     """
     if not raw_text: return {}
-    
-    parts = [p.strip() for p in raw_text.split("\n") if p.strip()]
-    
-    data = {
-        "name": "", "address_line1": "", "city": "", "state": "", "zip_code": ""
+    addr = StandardAddress.from_text(raw_text)
+    return {
+        "name": addr.name, "address_line1": addr.street, "address_line2": addr.address_line2,
+        "city": addr.city, "state": addr.state, "zip_code": addr.zip_code
     }
-    
-    if len(parts) >= 1:
-        data["name"] = parts[0]
-    
-    if len(parts) >= 2:
-        data["address_line1"] = parts[1]
-        
-    if len(parts) >= 3:
-        line3 = parts[2]
-        if "," in line3:
-            c_split = line3.split(",")
-            data["city"] = c_split[0].strip()
-            rest = c_split[1].strip()
-            r_split = rest.split(" ")
-            if len(r_split) > 1:
-                data["zip_code"] = r_split[-1]
-                data["state"] = " ".join(r_split[:-1])
-            else:
-                data["state"] = rest
-        else:
-            data["city"] = line3
-            
-    return data
+
+# --- PDF DOWNLOADS ---
+# PDFs are produced when the download is clicked (Streamlit's deferred data)
+# and served from its media endpoint, so nothing is base64'd into the page
+# and no PDF bytes are kept in session state between reruns.
+
+def _render_or_error(render):
+    pdf_bytes = render()
+    if pdf_bytes: return pdf_bytes
+    return letter_format._create_error_pdf("Render failed. Check the address and try again.") if letter_format else b""
+
+def _read_file(path):
+    with open(path, "rb") as f: return f.read()
+
+def pdf_download(container, label, render, file_name, key=None):
+    """Download button that renders on click. render: zero-arg callable -> PDF bytes."""
+    container.download_button(label, data=partial(_render_or_error, render), file_name=file_name, mime="application/pdf", key=key, on_click="ignore")
+
+def _item_envelope(item):
+    to_obj, from_obj = print_engine.envelope_addresses(item, database.get_user_profile)
+    return envelope_format.create_envelope(to_obj, from_obj)
+
+def _family_book(client_id):
+    pdf_bytes, err = book_engine.compile_book(client_id)
+    return pdf_bytes or letter_format._create_error_pdf(f"Family book failed: {err}")
+
+def _queue_labels(items):
+    jobs = print_engine.build_jobs(items, database.get_user_profile)
+    return envelope_format.create_label_sheet([j["envelope"][0] for j in jobs if j["envelope"]], layout="5160")
+
+# --- CAMPAIGN PROGRESS ---
+# Campaigns are sent by campaign_worker; this view only reads their job rows,
+# so it survives reruns, closed tabs and restarts.
+
+def _campaign_csv(job_id):
+    return bulk_engine.report_csv(database.get_campaign_recipients(job_id))
+
+@st.fragment(run_every=3)
+def _campaign_progress():
+    jobs = database.get_campaign_jobs(limit=5)
+    if not jobs:
+        st.caption("No campaigns yet.")
+        return
+    for job in jobs:
+        done = job["sent"] + job["failed"] + job["duplicates"]
+        st.progress(done / job["total"] if job["total"] else 1.0,
+                    text=f"Campaign #{job['id']} — {job['status']}: {job['sent']} sent, {job['failed']} failed, {job['duplicates']} duplicates of {job['total']}")
+        c1, c2 = st.columns(2)
+        c1.download_button("📄 Report CSV", data=partial(_campaign_csv, job["id"]), file_name=f"campaign_{job['id']}.csv",
+                           mime="text/csv", key=f"campaign_csv_{job['id']}", on_click="ignore")
+        if job["status"] in ("Queued", "Running") and c2.button("⏹️ Cancel", key=f"campaign_cancel_{job['id']}"):
+            database.cancel_campaign_job(job["id"])
 
 # --- MAIN RENDER ---
 
@@ -201,11 +257,63 @@ def render_admin_console():
                         })
                 
                 if not queue_items: st.info("Queue is empty.")
+
+                # --- BATCH PRINT RUN ---
+                approved = [i for i in queue_items if i['status'] == 'Approved']
+                if print_engine and approved:
+                    b1, b2, b3 = st.columns([3, 1, 1])
+                    interleave = b2.checkbox("Interleave envelopes", key="print_interleave", help="One file: each letter followed by its envelope")
+                    if envelope_format:
+                        pdf_download(b3, "🏷️ Labels (Avery 5160)", partial(_queue_labels, approved), "labels_5160.pdf", key="print_labels")
+                    if b1.button(f"🖨️ Print All Approved ({len(approved)})", type="primary"):
+                        bar = st.progress(0.0, text="Rendering...")
+                        for ev in print_engine.run_print_job(approved, get_profile=database.get_user_profile, created_by=st.session_state.get("user_email"), interleave=interleave):
+                            if ev["event"] == "progress":
+                                bar.progress(ev["done"] / ev["total"], text=f"Rendered {ev['done']}/{ev['total']}")
+                            elif ev["event"] == "error":
+                                st.error(f"Print Run Failed: {ev['error']}")
+                            else:
+                                # Only file paths survive the rerun; the merged PDFs stay on disk
+                                st.session_state.print_run = {
+                                    "run_id": ev["run_id"], "letter_pages": ev["letter_pages"], "seconds": ev["seconds"],
+                                    "failed": ev["failed"], "files": print_engine.save_run_files(ev)
+                                }
+                        bar.empty()
+
+                    run = st.session_state.get("print_run")
+                    if run:
+                        st.success(f"Print run {run['run_id'] or '(unrecorded)'}: {run['letter_pages']} letter pages in {run['seconds']:.1f}s")
+                        labels = {"combined": "⬇️ Letters + Envelopes", "letters": "⬇️ All Letters", "envelopes": "✉️ All Envelopes"}
+                        cols = st.columns(2)
+                        for col, (kind, path) in zip(cols * 2, run["files"].items()):
+                            if os.path.exists(path):
+                                col.download_button(labels[kind], data=partial(_read_file, path), file_name=os.path.basename(path), mime="application/pdf", key=f"print_dl_{kind}", on_click="ignore")
+                        for (item_type, item_id), err in run['failed'].items():
+                            st.warning(f"{item_type} #{item_id}: {err}")
+                    st.divider()
+
+                # --- FAMILY BOOKS (every approved/sent story for one client) ---
+                if book_engine and letter_format:
+                    with st.expander("📚 Family Books"):
+                        book_clients = database.get_book_clients()
+                        if not book_clients:
+                            st.caption("No client has approved stories yet.")
+                        else:
+                            chosen = st.selectbox(
+                                "Client", book_clients, key="book_client",
+                                format_func=lambda c: f"{c['name']} ({c['stories']} stories, {c['firm_name'] or c['advisor_email']})"
+                            )
+                            pdf_download(st, "📚 Download Family Book", partial(_family_book, chosen['id']),
+                                         f"family_book_{chosen['id']}.pdf", key=f"book_dl_{chosen['id']}")
+
+                printed = database.get_latest_print_runs([(i['type'], i['id']) for i in queue_items]) if queue_items else {}
                 
                 for item in queue_items:
                     icon = "🏰" if item['type'] == "Heirloom" else "🛒"
                     with st.expander(f"{icon} {item['type']} | {item['email']}"):
                         st.text_area("Content", item['content'], height=100, disabled=True)
+                        if (item['type'], item['id']) in printed:
+                            st.caption(f"🖨️ In print run #{printed[(item['type'], item['id'])]}")
                         
                         # --- ADDRESS VERIFICATION ---
                         addr = item['meta'].get('heir_address', {})
@@ -216,56 +324,15 @@ def render_admin_console():
 
                         c1, c2, c3 = st.columns(3)
                         
-                        # --- BUTTON 1: LETTER PDF ---
-                        if c1.button("⬇️ Letter PDF", key=f"pdf_{item['type']}_{item['id']}"):
-                            if letter_format:
-                                tier = "Heirloom" if item['type'] == "Heirloom" else "Standard"
-                                firm_name = item['meta'].get('firm_name', 'VerbaPost')
-                                storyteller = item['meta'].get('storyteller', 'The Family')
-                                question = item['meta'].get('prompt')
-                                
-                                pdf_bytes = letter_format.create_pdf(
-                                    body_text=item['content'], 
-                                    to_addr={}, 
-                                    from_addr={'name': storyteller}, 
-                                    advisor_firm=firm_name, 
-                                    audio_url=str(item['id']) if tier == "Heirloom" else None,
-                                    is_marketing=False,
-                                    question_text=question 
-                                )
-                                b64 = base64.b64encode(pdf_bytes).decode('latin-1')
-                                href = f'<a href="data:application/pdf;base64,{b64}" download="letter_{item["id"]}.pdf">Download Letter</a>'
-                                st.markdown(href, unsafe_allow_html=True)
-
-                        # --- BUTTON 2: ENVELOPE PDF ---
-                        if c2.button("✉️ Envelope", key=f"env_{item['type']}_{item['id']}"):
-                            if envelope_format:
-                                to_obj = {}
-                                from_obj = {}
-                                if item['type'] == "Heirloom":
-                                    # FROM: Advisor
-                                    adv_profile = database.get_user_profile(item['meta'].get('advisor_email_raw'))
-                                    from_obj = map_profile_to_addr(adv_profile, name_override=item['meta'].get('firm_name'))
-                                    
-                                    # TO: Heir (Using fetched address data directly)
-                                    addr_data = item['meta'].get('heir_address', {})
-                                    to_obj = {
-                                        "name": item['meta'].get('heir_name'),
-                                        "address_line1": addr_data.get('line1', ''),
-                                        "city": addr_data.get('city', ''),
-                                        "state": addr_data.get('state', ''),
-                                        "zip_code": addr_data.get('zip', '')
-                                    }
-                                else:
-                                    from_obj = {"name": "VerbaPost Fulfillment", "address_line1": "123 Legacy Lane", "city": "Nashville", "state": "TN", "zip_code": "37203"}
-                                    u_profile = database.get_user_profile(item['email'])
-                                    to_obj = map_profile_to_addr(u_profile)
-
-                                env_bytes = envelope_format.create_envelope(to_obj, from_obj)
-                                if env_bytes:
-                                    b64_env = base64.b64encode(env_bytes).decode('latin-1')
-                                    href_env = f'<a href="data:application/pdf;base64,{b64_env}" download="envelope_{item["id"]}.pdf">Download Envelope</a>'
-                                    st.markdown(href_env, unsafe_allow_html=True)
+                        # --- BUTTON 1: LETTER PDF (rendered on click) ---
+                        if letter_format and print_engine:
+                            pdf_download(c1, "⬇️ Letter PDF", partial(letter_format.create_pdf, **print_engine.letter_kwargs(item)),
+                                         f"letter_{item['id']}.pdf", key=f"pdf_{item['type']}_{item['id']}")
+
+                        # --- BUTTON 2: ENVELOPE PDF (addresses looked up on click) ---
+                        if envelope_format and print_engine:
+                            pdf_download(c2, "✉️ Envelope", partial(_item_envelope, item),
+                                         f"envelope_{item['id']}.pdf", key=f"env_{item['type']}_{item['id']}")
 
                         # --- BUTTON 3: MARK SENT ---
                         if c3.button("✅ Mark Sent", key=f"sent_{item['type']}_{item['id']}"):
@@ -291,41 +358,65 @@ def render_admin_console():
             m_tier = st.selectbox("Style", ["Vintage", "Standard"])
         m_body = st.text_area("Letter Body", height=300, value="Dear Client...")
         
-        # --- MARKETING BUTTONS ---
+        # --- MARKETING BUTTONS (rendered on click) ---
         mb1, mb2 = st.columns(2)
-        
-        with mb1:
-            if st.button("📄 Generate Letter PDF"):
-                if letter_format:
-                    to_obj = parse_address_text(f"{m_name}\n{m_addr}")
-                    from_obj = parse_address_text(m_from) 
-                    
-                    pdf_bytes = letter_format.create_pdf(
-                        body_text=m_body, 
-                        to_addr=to_obj, 
-                        from_addr=from_obj,
-                        advisor_firm="VerbaPost Marketing",
-                        is_marketing=True 
-                    )
-                    b64_pdf = base64.b64encode(pdf_bytes).decode('latin-1')
-                    pdf_display = f'<iframe src="data:application/pdf;base64,{b64_pdf}" width="100%" height="500"></iframe>'
-                    st.markdown(pdf_display, unsafe_allow_html=True)
-
-        with mb2:
-             if st.button("✉️ Generate Envelope PDF"):
-                if envelope_format:
-                    to_obj = parse_address_text(f"{m_name}\n{m_addr}")
-                    from_obj = parse_address_text(m_from)
-
-                    env_bytes = envelope_format.create_envelope(to_obj, from_obj)
-                    if env_bytes:
-                        b64_env = base64.b64encode(env_bytes).decode('latin-1')
-                        href_env = f'<a href="data:application/pdf;base64,{b64_env}" download="envelope_marketing.pdf">Download Envelope</a>'
-                        st.markdown(href_env, unsafe_allow_html=True)
+        to_obj = parse_address_text(f"{m_name}\n{m_addr}")
+        from_obj = parse_address_text(m_from)
+
+        if letter_format:
+            pdf_download(mb1, "📄 Download Letter PDF", partial(
+                letter_format.create_pdf, body_text=m_body, to_addr=to_obj, from_addr=from_obj,
+                advisor_firm="VerbaPost Marketing", is_marketing=True
+            ), "letter_marketing.pdf", key="mkt_letter")
+
+        if envelope_format:
+            pdf_download(mb2, "✉️ Download Envelope PDF", partial(envelope_format.create_envelope, to_obj, from_obj),
+                         "envelope_marketing.pdf", key="mkt_envelope")
+
+        # --- BULK CAMPAIGN (sent in the background, see campaign_worker) ---
+        if bulk_engine and database:
+            with st.expander("📬 Bulk Campaign (CSV)"):
+                st.caption("Columns: name, street, city, state, zip. Sends the letter body and return address above to every row.")
+                upload = st.file_uploader("Recipient List", type=["csv"], key="campaign_csv")
+                if upload and st.button("🔍 Preview", key="preview_campaign"):
+                    with st.spinner("Checking recipient list..."):
+                        preview, err = bulk_engine.preview_csv(upload)
+                    upload.seek(0)
+                    if err: st.error(f"Campaign Error: {err}")
+                    else:
+                        c1, c2, c3, c4 = st.columns(4)
+                        c1.metric("Rows", preview["rows"])
+                        c2.metric("Skipped", preview["rejected"])
+                        c3.metric("Duplicates", preview["duplicates"])
+                        c4.metric("Letters", preview["mail_pieces"], f"${preview['estimated_total']:,.2f}", delta_color="off")
+                        if preview["duplicate_rows"]:
+                            st.caption("Suppressed as duplicates (same person at the same address after USPS normalization):")
+                            st.dataframe(pd.DataFrame(preview["duplicate_rows"]), use_container_width=True)
+                        if preview["rejected_rows"]:
+                            st.dataframe(pd.DataFrame(preview["rejected_rows"]), use_container_width=True)
+                        if preview["warning_rows"]:
+                            st.caption(f"{preview['warnings']} ZIPs look wrong by the ZIP3 table (still sent; PostGrid decides):")
+                            st.dataframe(pd.DataFrame(preview["warning_rows"]), use_container_width=True)
+                if upload and st.button("🚀 Queue Campaign", key="queue_campaign"):
+                    upload.seek(0)
+                    with st.spinner("Reading recipient list..."):
+                        job_id, summary, err = bulk_engine.process_campaign_csv(upload, m_body, from_obj, st.session_state.get("user_email"))
+                    if err: st.error(f"Campaign Error: {err}")
+                    else: st.success(f"Campaign #{job_id} queued: {summary['accepted']} recipients ({summary['duplicates']} duplicates suppressed).")
+                    if summary and summary["rejected"]:
+                        st.warning(f"{summary['rejected']} rows skipped (missing fields, bad ZIP or state).")
+                        st.dataframe(pd.DataFrame(summary["rejected_rows"]), use_container_width=True)
+                _campaign_progress()
 
     # --- TAB 3: GHOSTS ---
     with tabs[2]:
         st.subheader("👻 Orphaned Recordings")
+        if recording_sync:
+            if st.button("🔄 Sync Recordings Now"):
+                with st.spinner("Mirroring Twilio recordings..."):
+                    count, err = recording_sync.sync_twilio_recordings()
+                if err: st.error(f"Sync Error: {err}")
+                else: st.success(f"Synced {count} recordings.")
         if st.button("🔍 Scan Twilio Logs"):
             orphans = get_orphaned_calls()
             if not orphans: st.success("✅ All calls accounted for.")
@@ -350,4 +441,48 @@ def render_admin_console():
     with tabs[4]:
         st.subheader("Diagnostics")
         if st.button("Run Check"):
-            for s, n, m in check_service_health(): st.markdown(f"**{s} {n}**: {m}")
\ No newline at end of file
+            for s, n, m in check_service_health(): st.markdown(f"**{s} {n}**: {m}")
+
+        # Vendor client reuse (hits = calls served by an already-built client)
+        if client_registry:
+            stats = client_registry.get_stats()
+            if stats:
+                st.caption("Vendor Client Registry")
+                st.dataframe(pd.DataFrame.from_dict(stats, orient="index"), use_container_width=True)
+
+        # Signed playback links served from cache vs. signed against Supabase
+        if storage_engine:
+            url_stats = storage_engine.get_signed_url_stats()
+            st.caption(f"Signed URL Cache — hit rate {url_stats['hit_rate']:.0%}")
+            st.dataframe(pd.DataFrame([url_stats]), use_container_width=True)
+
+            # Content-addressed uploads: bytes not stored because the audio was already in the vault
+            up = storage_engine.get_upload_stats()
+            st.caption(f"Audio Uploads — {up['uploads']} stored, {up['duplicates_skipped']} duplicates skipped ({up['bytes_reclaimed'] / 1e6:.1f} MB reclaimed)")
+            if st.button("🔍 Scan Vault for Duplicates"):
+                with st.spinner("Listing vault objects..."):
+                    report = storage_engine.duplicate_report()
+                if report is None:
+                    st.error("Scan failed. Check storage configuration.")
+                else:
+                    st.metric("Reclaimable", f"{report['reclaimable_bytes'] / 1e6:.1f} MB", f"{report['duplicate_objects']} duplicate objects")
+                    if report["groups"]:
+                        st.dataframe(pd.DataFrame([{"size": g["size"], "copies": len(g["paths"]), "paths": ", ".join(g["paths"])} for g in report["groups"]]), use_container_width=True)
+
+        # Letter/envelope PDFs served from disk instead of re-rendered
+        if render_cache:
+            rc = render_cache.get_stats()
+            st.caption(f"PDF Render Cache — hit rate {rc['hit_rate']:.0%}, {(rc['size_bytes'] or 0) / 1e6:.1f} of {rc['max_bytes'] / 1e6:.0f} MB, {rc['evictions']} evicted")
+
+        # PostGrid address checks answered from the fingerprint cache (this process)
+        if mailer:
+            ac = mailer.get_address_cache_stats()
+            st.caption(f"Address Validation Cache — hit rate {ac['hit_rate']:.0%}, {ac['api_calls']} PostGrid contact calls, {ac['memory_entries']} addresses in memory")
+
+        # Phone-friendly playback copies for recordings ingested before renditions existed
+        if rendition_engine and database:
+            if not rendition_engine.ffmpeg_available():
+                st.caption("Playback renditions disabled: ffmpeg not installed.")
+            elif st.button("🎚️ Build Playback Renditions"):
+                queued = rendition_engine.backfill(database.get_vault_audio_refs())
+                st.success(f"Queued {queued} recordings for transcoding (recordings that already have renditions are skipped).")
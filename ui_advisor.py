@@ -13,6 +13,8 @@ def render_advisor_portal():
     import payment_engine
     import email_engine 
     import audit_engine 
+    try: import rendition_engine
+    except ImportError: rendition_engine = None
 
     # --- 1. AUTH & PROFILE ---
     if not st.session_state.get("authenticated"):
@@ -234,6 +236,11 @@ def render_advisor_portal():
         if not projects:
             st.info("No recordings pending review.")
         else:
+            # Vault copies are storage paths: sign them all in one round trip.
+            # The list plays the short preview; the full rendition opens on demand.
+            vault_paths = [p['audio_ref'] for p in projects if p.get('audio_ref') and "http" not in str(p['audio_ref'])]
+            previews = rendition_engine.get_playback_urls(vault_paths, kind="preview") if (rendition_engine and vault_paths) else {}
+            full = rendition_engine.get_playback_urls(vault_paths) if (rendition_engine and vault_paths) else {}
             for p in projects:
                 with st.expander(f"📁 {p.get('heir_name', 'Unknown')} - {p.get('created_at', 'Undated')}"):
                     c1, c2 = st.columns([3, 1])
@@ -241,9 +248,15 @@ def render_advisor_portal():
                     with c1:
                         st.write(f"**Transcript Preview:** {str(p.get('content', ''))[:150]}...")
                         # Audio Player Logic
-                        audio_src = p.get('audio_ref') or p.get('tracking_number')
+                        audio_src, audio_format = previews.get(p.get('audio_ref'), (None, None))
+                        full_src, _ = full.get(p.get('audio_ref'), (None, None))
+                        if not audio_src:
+                            audio_src, audio_format = p.get('audio_ref') or p.get('tracking_number'), "audio/mp3"
+                            if audio_src and "http" not in str(audio_src): audio_src = p.get('tracking_number')
                         if audio_src and "http" in str(audio_src):
-                             st.audio(audio_src)
+                             st.audio(audio_src, format=audio_format)
+                             if full_src and full_src != audio_src:
+                                 st.link_button("▶️ Full Recording", full_src)
                         else:
                             st.caption("Audio processing...")
 
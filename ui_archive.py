@@ -1,5 +1,7 @@
 import streamlit as st
 import database
+try: import rendition_engine
+except ImportError: rendition_engine = None
 
 def render_heir_vault(project_id):
     """
@@ -52,10 +54,16 @@ def render_heir_vault(project_id):
             # UNLOCKED STATE
             # Try audio_ref first, fall back to tracking_number if it holds the URL
             audio_url = project.get('audio_ref') or project.get('tracking_number')
+            audio_format = "audio/mp3"
+
+            # Vault copies are storage paths: play the phone-friendly rendition
+            if audio_url and "http" not in audio_url and rendition_engine:
+                vault_url, vault_format = rendition_engine.get_playback_url(audio_url)
+                audio_url, audio_format = (vault_url, vault_format) if vault_url else (project.get('tracking_number'), audio_format)
             
             if audio_url and "http" in audio_url:
                 st.success("🔓 Audio Unlocked - Ready to Play")
-                st.audio(audio_url, format="audio/mp3")
+                st.audio(audio_url, format=audio_format)
                 st.balloons()
             else:
                 st.warning("Audio file is pending upload or missing.")
@@ -1,6 +1,7 @@
 import streamlit as st
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 import database
 import ai_engine
 import mailer
@@ -9,11 +10,31 @@ import letter_format
 import audit_engine 
 import logging
 import analytics
+try: import rendition_engine
+except ImportError: rendition_engine = None
 
 # --- CONFIGURATION ---
 CREDIT_COST = 1 
+# With webhooks on, a draft still waiting this long after its call is polled
+# anyway (missed or exhausted callback), so no story is stuck for good.
+WEBHOOK_GRACE = timedelta(minutes=15)
 logger = logging.getLogger(__name__)
 
+def _draft_created_utc(draft):
+    created = draft.get('created_at')
+    if not isinstance(created, datetime):
+        try: created = datetime.fromisoformat(str(created).replace("Z", "+00:00"))
+        except (TypeError, ValueError): return None
+    if created.tzinfo: created = created.astimezone(timezone.utc).replace(tzinfo=None)
+    return created
+
+def _needs_poll(draft, now=None):
+    """Pending draft the dashboard should look up itself rather than wait on the webhook."""
+    if not draft.get('call_sid'): return False
+    if not ai_engine.webhooks_enabled(): return True
+    created = _draft_created_utc(draft)
+    return created is None or (now or datetime.utcnow()) - created > WEBHOOK_GRACE
+
 # ==========================================
 # 🎧 PUBLIC PLAYER (QR Code Access)
 # ==========================================
@@ -43,6 +64,7 @@ def render_public_player(audio_id):
     st.markdown("<div style='text-align: center; margin-bottom: 20px;'><h1>🎙️ The Family Legacy Archive</h1></div>", unsafe_allow_html=True)
     
     audio_url = None
+    audio_format = "audio/mp3"
     story_title = "Private Recording"
     story_date = "Unknown Date"
     storyteller = "Family Member"
@@ -58,6 +80,11 @@ def render_public_player(audio_id):
                 draft_data = database.get_public_draft(audio_id)
                 if draft_data:
                     audio_url = draft_data.get("url")
+                    # Prefer the low-bitrate vault rendition over the full Twilio MP3
+                    audio_ref = draft_data.get("audio_ref")
+                    if audio_ref and "http" not in audio_ref and rendition_engine:
+                        vault_url, vault_format = rendition_engine.get_playback_url(audio_ref)
+                        if vault_url: audio_url, audio_format = vault_url, vault_format
                     story_title = draft_data.get("title")
                     story_date = draft_data.get("date")
                     storyteller = draft_data.get("storyteller")
@@ -73,7 +100,7 @@ def render_public_player(audio_id):
             <br>
         """, unsafe_allow_html=True)
         
-        st.audio(audio_url, format="audio/mp3")
+        st.audio(audio_url, format=audio_format)
         st.markdown("---")
         
         st.markdown("""
@@ -202,6 +229,30 @@ def render_dashboard():
                     else:
                         st.error(f"Call Failed: {err}")
 
+    # --- SCHEDULED CALLS (dialed by interview_scheduler.py) ---
+    with st.expander("🗓️ Schedule this Interview for Later"):
+        tz_name = profile.get("timezone") or "America/Chicago"
+        try: local_tz = ZoneInfo(tz_name)
+        except Exception: local_tz = ZoneInfo("America/Chicago")
+        sc1, sc2 = st.columns(2)
+        sched_date = sc1.date_input("Call Date", value=datetime.now(local_tz).date() + timedelta(days=1), key="sched_date")
+        sched_time = sc2.time_input("Call Time", value=datetime.strptime("10:00", "%H:%M").time(), key="sched_time")
+        st.caption(f"Times are in {local_tz.key}.")
+        if st.button("🗓️ Schedule Call", use_container_width=True):
+            clean_phone = "".join(filter(str.isdigit, target_phone))
+            if not clean_phone or len(clean_phone) < 10:
+                st.error("⚠️ Please enter a valid 10-digit phone number.")
+            else:
+                local_dt = datetime.combine(sched_date, sched_time).replace(tzinfo=local_tz)
+                utc_dt = local_dt.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+                pid = database.schedule_interview(user_email, clean_phone, custom_question, utc_dt)
+                if pid:
+                    if audit_engine:
+                        audit_engine.log_event(user_email, "Interview Scheduled", metadata={"project_id": pid, "when_utc": utc_dt.isoformat()})
+                    st.success(f"✅ Call scheduled for {local_dt.strftime('%B %d at %I:%M %p')}.")
+                else:
+                    st.error("Could not schedule the call. Please contact your advisor.")
+
     st.divider()
 
     # --- SECTION 2: THE VAULT (INBOX) ---
@@ -210,7 +261,9 @@ def render_dashboard():
     if st.button("🔄 Check for New Stories"):
         with st.spinner("Syncing with Biographer..."):
             all_drafts = database.get_user_drafts(user_email)
-            pending = [d for d in all_drafts if d.get('call_sid')]
+            # Twilio pushes finished recordings to webhook_server; with webhooks on
+            # only drafts the callback should long since have filled are polled
+            pending = [d for d in all_drafts if _needs_poll(d)]
             synced_count = 0
             for p in pending:
                 sid = p.get('call_sid')
@@ -6,6 +6,7 @@ def render_login_page():
     Unified Auth Page.
     """
     # --- LAZY IMPORTS (CRITICAL FIX) ---
+    import address_standard
     import auth_engine
     import database
     import mailer
@@ -83,14 +84,19 @@ def render_login_page():
             
             if st.form_submit_button("Create Account", use_container_width=True):
                 with st.spinner("Creating account..."):
-                    # Validate Address First
-                    is_valid, val_result = mailer.validate_address({
-                        "street": s_street, "city": s_city, 
+                    # Validate Address First (offline check, then PostGrid with the normalized address)
+                    addr, val_result = address_standard.check_address({
+                        "name": full_name, "street": s_street, "city": s_city, 
                         "state": s_state, "zip": s_zip
                     })
+                    is_valid = val_result is None
+                    if is_valid:
+                        is_valid, val_result = mailer.validate_address(addr.to_postgrid_payload())
                     
                     if not is_valid:
                         st.error(f"Address Error: {val_result}")
+                        zip_hint = address_standard.zip_warning(addr)
+                        if zip_hint: st.caption(f"Offline ZIP check: {zip_hint}")
                     else:
                         # Create Auth User
                         user, error = auth_engine.sign_up(new_email, new_pass, {"full_name": full_name})
@@ -0,0 +1,339 @@
+"""
+Twilio callback receiver (runs next to Streamlit).
+
+    python webhook_server.py            # listens on WEBHOOK_PORT (default 8081)
+
+Twilio posts call-status and recording-status callbacks here (see
+ai_engine.trigger_outbound_call). Requests are signature-checked, answered
+immediately, and the download + transcription is handed to a small worker
+pool, so stories land in the archive seconds after the call ends instead of
+when someone clicks "Check for New Stories".
+
+With storage.backend = "local" it also serves signed /storage/<path> links
+(HMAC-checked, streamed, Range-aware) for the filesystem backend.
+"""
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# --- IMPORTS ---
+try: import secrets_manager
+except ImportError: secrets_manager = None
+try: import database
+except ImportError: database = None
+try: import ai_engine
+except ImportError: ai_engine = None
+try: import heirloom_engine
+except ImportError: heirloom_engine = None
+try: import storage_engine
+except ImportError: storage_engine = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+DEFAULT_PORT = 8081
+WORKER_COUNT = 2
+FAILED_CALL_STATUSES = {"busy", "no-answer", "failed", "canceled"}
+# A job that fails (download error, draft not written yet) is retried with
+# backoff: 30s, 1m, 2m, 4m. After that the SID is released for a Twilio
+# retry or the dashboard's poll fallback.
+INGEST_MAX_ATTEMPTS = 5
+INGEST_RETRY_SECONDS = 30
+
+_server = None
+_server_lock = threading.Lock()
+
+def _get_secret(key):
+    if secrets_manager: return secrets_manager.get_secret(key)
+    return os.environ.get(key.upper().replace(".", "_"))
+
+# ==========================================
+# 🧵 INGEST QUEUE
+# ==========================================
+
+def process_recording(job):
+    """
+    Default job handler: download once, then vault upload and transcription
+    run concurrently (heirloom_engine tee), then fill the waiting draft.
+    job = {"call_sid", "recording_sid", "recording_url"}
+    Nothing is downloaded, stored or transcribed until a project / draft
+    owns the call (False = retry later). The transcript and vault path are
+    kept on the job, so a retry after a failed DB write only redoes the write.
+    """
+    if not ai_engine or not database: return False
+    audio_url = f"{job['recording_url']}.mp3"
+
+    if "transcript" not in job:
+        # Checked first: the upload and Whisper call are paid work, and a retry would repeat them
+        owner = database.get_owner_email_by_sid(job["call_sid"])
+        if not owner: return False
+        if not heirloom_engine:
+            transcript = ai_engine.transcribe_recording_url(audio_url, job["call_sid"])
+            if transcript is None: return False
+            job.update(transcript=transcript, storage_path=None)
+        else:
+            audio_bytes = ai_engine.fetch_recording_audio(audio_url.replace("https://api.twilio.com", ""))
+            if not audio_bytes: return False
+            transcript, storage_path = heirloom_engine.store_and_transcribe(audio_bytes, owner)
+            job.update(transcript=transcript or "[Audio captured. Transcription unavailable.]", storage_path=storage_path)
+
+    return database.update_draft_by_sid(job["call_sid"], job["transcript"], audio_url, audio_ref=job["storage_path"])
+
+class IngestQueue:
+    """
+    In-process work queue. Twilio retries callbacks it thinks failed, so a
+    recording SID is only processed once per process; jobs that fail or
+    find no draft are requeued with backoff instead of dropped.
+    """
+    def __init__(self, handler=process_recording, workers=WORKER_COUNT,
+                 max_attempts=INGEST_MAX_ATTEMPTS, retry_seconds=INGEST_RETRY_SECONDS):
+        self.handler = handler
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self._queue = queue.Queue()
+        self._seen = set()
+        self._seen_lock = threading.Lock()
+        # Jobs submitted and not yet finished or given up (including ones waiting to retry)
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._run, name=f"recording-ingest-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, job):
+        with self._seen_lock:
+            if job["recording_sid"] in self._seen: return False
+            self._seen.add(job["recording_sid"])
+        with self._idle: self._pending += 1
+        self._queue.put(job)
+        return True
+
+    def join(self, timeout=None):
+        """Waits until every submitted job has succeeded or used up its retries."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _finish(self):
+        with self._idle:
+            self._pending -= 1
+            self._idle.notify_all()
+
+    def _retry(self, job):
+        attempt = job.get("attempt", 0) + 1
+        if attempt >= self.max_attempts:
+            logger.warning(f"Ingest {job['recording_sid']}: giving up after {attempt} attempts")
+            # Let a Twilio retry (or the poller) pick it up again
+            with self._seen_lock: self._seen.discard(job["recording_sid"])
+            return self._finish()
+        timer = threading.Timer(self.retry_seconds * 2 ** (attempt - 1), self._queue.put, args=({**job, "attempt": attempt},))
+        timer.daemon = True
+        timer.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            ok = False
+            try:
+                ok = self.handler(job)
+                logger.info(f"Ingest {job['recording_sid']} (call {job['call_sid']}): {'done' if ok else 'no match, will retry'}")
+            except Exception as e:
+                logger.error(f"Ingest Error for {job.get('recording_sid')}: {e}")
+            finally:
+                if ok: self._finish()
+                else: self._retry(job)
+                self._queue.task_done()
+
+# ==========================================
+# 🌐 HTTP HANDLER
+# ==========================================
+
+class TwilioCallbackHandler(BaseHTTPRequestHandler):
+    # Set per server in create_server()
+    ingest = None
+    validator = None
+    base_url = None
+    on_call_status = None
+    on_recording_status = None
+
+    def log_message(self, fmt, *args):
+        logger.info("webhook: " + fmt % args)
+
+    def _reply(self, code, body=b""):
+        self.send_response(code)
+        self.send_header("Content-Type", "text/xml" if body else "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body: self.wfile.write(body)
+
+    def _public_url(self):
+        # Twilio signs the URL it called, which is the public one, not our bind address
+        if self.base_url: return f"{self.base_url}{self.path}"
+        host = self.headers.get("Host", "localhost")
+        return f"http://{host}{self.path}"
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == "/healthz": return self._reply(200, b"ok")
+        if parts.path.startswith("/storage/"): return self._serve_storage(parts)
+        self._reply(404)
+
+    def _serve_storage(self, parts):
+        if not storage_engine: return self._reply(404)
+        backend = storage_engine.get_backend()
+        if not isinstance(backend, storage_engine.LocalBackend): return self._reply(404)
+        storage_path = unquote(parts.path[len("/storage/"):])
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        try:
+            if not backend.verify(storage_path, query.get("expires"), query.get("sig")): return self._reply(403)
+            meta = backend.stat(storage_path)
+        except ValueError:
+            return self._reply(404)
+        if not meta: return self._reply(404)
+
+        size = meta["size"]
+        byte_range = _parse_range(self.headers.get("Range"), size)
+        if byte_range is False:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            return self.end_headers()
+        start, end = byte_range or (0, size - 1)
+
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", meta.get("content_type") or "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1 if size else 0))
+        self.send_header("Accept-Ranges", "bytes")
+        if byte_range: self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if not size: return
+        for chunk in backend.open_stream(storage_path, start=start, end=end):
+            self.wfile.write(chunk)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8") if length else ""
+        params = {k: v[0] for k, v in parse_qs(raw, keep_blank_values=True).items()}
+
+        if self.validator is not None:
+            signature = self.headers.get("X-Twilio-Signature", "")
+            if not self.validator.validate(self._public_url(), params, signature):
+                logger.warning(f"Rejected unsigned callback on {self.path}")
+                return self._reply(403)
+
+        route = urlsplit(self.path).path
+        if route == "/twilio/recording-status":
+            self._handle_recording(params)
+        elif route == "/twilio/call-status":
+            self._handle_call_status(params)
+        else:
+            return self._reply(404)
+        # Empty TwiML: acknowledge fast, work happens on the queue
+        self._reply(200, b"<Response></Response>")
+
+    def _handle_recording(self, params):
+        if params.get("RecordingStatus", "completed") != "completed": return
+        call_sid = params.get("CallSid")
+        recording_sid = params.get("RecordingSid")
+        recording_url = params.get("RecordingUrl")
+        if not (call_sid and recording_sid and recording_url): return
+        if self.on_recording_status: self.on_recording_status(params)
+        self.ingest.submit({"call_sid": call_sid, "recording_sid": recording_sid, "recording_url": recording_url})
+
+    def _handle_call_status(self, params):
+        if self.on_call_status: self.on_call_status(params)
+
+def _parse_range(header, size):
+    """'bytes=a-b' -> (start, end) inclusive; None for no/unsupported header, False if unsatisfiable."""
+    if not header or not header.startswith("bytes=") or "," in header: return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the final N bytes
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start, end = int(first), (int(last) if last else size - 1)
+    except ValueError:
+        return None
+    if start >= size or start > end: return False
+    return start, min(end, size - 1)
+
+def handle_call_status(params):
+    """
+    Default call-status hook: feeds the phone index and makes unanswered/failed
+    calls stop showing 'Waiting for recording...'.
+    """
+    status = params.get("CallStatus")
+    call_sid = params.get("CallSid")
+    if not database or not call_sid: return
+    direction = params.get("Direction") or ""
+    phone = params.get("From") if direction.startswith("inbound") else params.get("To")
+    database.upsert_twilio_calls([{
+        "call_sid": call_sid, "phone": phone, "direction": direction or None,
+        "status": status, "date_created": None, "synced_at": datetime.utcnow()
+    }])
+    if status in FAILED_CALL_STATUSES:
+        database.set_status_by_sid(call_sid, "Call Failed")
+
+def handle_recording_status(params):
+    """Default recording hook: mirror row now, so the phone index is current before the sync job runs."""
+    if not database: return
+    base = params["RecordingUrl"].replace("https://api.twilio.com", "")
+    try: duration = int(params.get("RecordingDuration") or 0)
+    except ValueError: duration = None
+    database.upsert_twilio_recordings([{
+        "recording_sid": params["RecordingSid"], "call_sid": params["CallSid"],
+        "date_created": datetime.utcnow(), "duration": duration,
+        "uri": f"{base}.mp3", "media_url": f"{params['RecordingUrl']}.mp3", "synced_at": datetime.utcnow()
+    }])
+
+def create_server(host="0.0.0.0", port=DEFAULT_PORT, handler=process_recording, auth_token=None, base_url=None, verify=True, workers=WORKER_COUNT, on_call_status=handle_call_status, on_recording_status=handle_recording_status):
+    """
+    Builds (but does not start) the callback server.
+    verify=False is for local fakes only; production always checks X-Twilio-Signature.
+    """
+    validator = None
+    if verify:
+        from twilio.request_validator import RequestValidator
+        auth_token = auth_token or _get_secret("twilio.auth_token")
+        if not auth_token: raise ValueError("twilio.auth_token is required to verify callbacks")
+        validator = RequestValidator(auth_token)
+
+    handler_cls = type("BoundTwilioCallbackHandler", (TwilioCallbackHandler,), {
+        "ingest": IngestQueue(handler=handler, workers=workers),
+        "validator": validator,
+        "base_url": (base_url or _get_secret("webhook.base_url") or "").rstrip("/") or None,
+        "on_call_status": staticmethod(on_call_status) if on_call_status else None,
+        "on_recording_status": staticmethod(on_recording_status) if on_recording_status else None,
+    })
+    return ThreadingHTTPServer((host, port), handler_cls)
+
+def ensure_running():
+    """
+    Starts the server in a daemon thread inside the current (Streamlit) process,
+    once, if a webhook port is configured. Returns the server or None.
+    """
+    global _server
+    port = _get_secret("webhook.port")
+    if not port: return None
+    with _server_lock:
+        if _server: return _server
+        try:
+            _server = create_server(port=int(port))
+        except Exception as e:
+            logger.error(f"Webhook Server Start Failed: {e}")
+            return None
+        threading.Thread(target=_server.serve_forever, name="twilio-webhooks", daemon=True).start()
+        logger.info(f"Webhook server listening on :{port}")
+        return _server
+
+if __name__ == "__main__":
+    port = int(_get_secret("webhook.port") or DEFAULT_PORT)
+    server = create_server(port=port)
+    logger.info(f"Webhook server listening on :{port}")
+    server.serve_forever()
@@ -0,0 +1,218 @@
+"""
+Offline ZIP code -> city / state lookups.
+
+Two tiers, both array-backed so a lookup is an index, not a search:
+ - Built in: the USPS ZIP3 (first three digits) -> state allocation, a
+   1,000-byte table. Always available but coarse (border towns, new ZIPs),
+   so its verdicts are only warnings; PostGrid has the final say.
+ - Optional full index: every 5-digit ZIP -> primary city + state, compiled
+   by build_index() from a zip,city,state CSV (e.g. the GeoNames US postal
+   code dump) into zip_index.dir and memory-mapped on first use, so worker
+   processes share the pages and nothing is parsed at import. Its verdicts
+   are confirmed: unassigned ZIPs and ZIPs from another state are rejected.
+"""
+import csv
+import logging
+import os
+import threading
+
+import numpy as np
+
+# --- IMPORTS ---
+try: import secrets_manager
+except ImportError: secrets_manager = None
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+DEFAULT_DIR = os.path.join("data", "zip_index")
+TABLE_FILE = "zips.npy"
+CITIES_FILE = "cities.txt"
+TABLE_DTYPE = np.dtype([("city", "<u2"), ("state", "u1")])
+
+# Index 0 = unknown / unassigned; SHARED marks a ZIP3 used by several
+# territories (checked against SHARED_PREFIXES).
+STATE_CODES = (
+    "", "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID", "IL", "IN", "IA", "KS",
+    "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", "NM", "NY", "NC", "ND",
+    "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY",
+    "PR", "VI", "GU", "AS", "MP", "MH", "FM", "PW", "AA", "AE", "AP",
+)
+STATE_IDS = {code: i for i, code in enumerate(STATE_CODES) if code}
+SHARED = 255
+
+STATE_NAMES = {
+    "ALABAMA": "AL", "ALASKA": "AK", "ARIZONA": "AZ", "ARKANSAS": "AR", "CALIFORNIA": "CA", "COLORADO": "CO",
+    "CONNECTICUT": "CT", "DELAWARE": "DE", "DISTRICT OF COLUMBIA": "DC", "WASHINGTON DC": "DC", "FLORIDA": "FL",
+    "GEORGIA": "GA", "HAWAII": "HI", "IDAHO": "ID", "ILLINOIS": "IL", "INDIANA": "IN", "IOWA": "IA", "KANSAS": "KS",
+    "KENTUCKY": "KY", "LOUISIANA": "LA", "MAINE": "ME", "MARYLAND": "MD", "MASSACHUSETTS": "MA", "MICHIGAN": "MI",
+    "MINNESOTA": "MN", "MISSISSIPPI": "MS", "MISSOURI": "MO", "MONTANA": "MT", "NEBRASKA": "NE", "NEVADA": "NV",
+    "NEW HAMPSHIRE": "NH", "NEW JERSEY": "NJ", "NEW MEXICO": "NM", "NEW YORK": "NY", "NORTH CAROLINA": "NC",
+    "NORTH DAKOTA": "ND", "OHIO": "OH", "OKLAHOMA": "OK", "OREGON": "OR", "PENNSYLVANIA": "PA", "RHODE ISLAND": "RI",
+    "SOUTH CAROLINA": "SC", "SOUTH DAKOTA": "SD", "TENNESSEE": "TN", "TEXAS": "TX", "UTAH": "UT", "VERMONT": "VT",
+    "VIRGINIA": "VA", "WASHINGTON": "WA", "WEST VIRGINIA": "WV", "WISCONSIN": "WI", "WYOMING": "WY",
+    "PUERTO RICO": "PR", "VIRGIN ISLANDS": "VI", "GUAM": "GU", "AMERICAN SAMOA": "AS", "NORTHERN MARIANA ISLANDS": "MP",
+    "MARSHALL ISLANDS": "MH", "MICRONESIA": "FM", "PALAU": "PW",
+}
+
+# USPS ZIP3 allocation as inclusive (first, last, state) ranges; unused
+# prefixes inside a state's block are left with that state.
+ZIP3_RANGES = (
+    (5, 5, "NY"), (6, 7, "PR"), (8, 8, "VI"), (9, 9, "PR"), (10, 27, "MA"), (28, 29, "RI"), (30, 38, "NH"),
+    (39, 49, "ME"), (50, 54, "VT"), (55, 55, "MA"), (56, 59, "VT"), (60, 69, "CT"), (70, 89, "NJ"), (90, 99, "AE"),
+    (100, 149, "NY"), (150, 196, "PA"), (197, 199, "DE"), (200, 200, "DC"), (201, 201, "VA"), (202, 205, "DC"),
+    (206, 219, "MD"), (220, 246, "VA"), (247, 269, "WV"), (270, 289, "NC"), (290, 299, "SC"), (300, 319, "GA"),
+    (320, 339, "FL"), (340, 340, "AA"), (341, 349, "FL"), (350, 369, "AL"), (370, 385, "TN"), (386, 397, "MS"),
+    (398, 399, "GA"), (400, 429, "KY"), (430, 459, "OH"), (460, 479, "IN"), (480, 499, "MI"), (500, 529, "IA"),
+    (530, 549, "WI"), (550, 568, "MN"), (569, 569, "DC"), (570, 579, "SD"), (580, 589, "ND"), (590, 599, "MT"),
+    (600, 629, "IL"), (630, 659, "MO"), (660, 679, "KS"), (680, 699, "NE"), (700, 715, "LA"), (716, 729, "AR"),
+    (730, 732, "OK"), (733, 733, "TX"), (734, 749, "OK"), (750, 799, "TX"), (800, 819, "CO"), (820, 831, "WY"),
+    (832, 839, "ID"), (840, 849, "UT"), (850, 869, "AZ"), (870, 884, "NM"), (885, 885, "TX"), (886, 888, "NM"),
+    (889, 899, "NV"), (900, 961, "CA"), (962, 966, "AP"), (967, 968, "HI"), (969, 969, "GU"), (970, 979, "OR"),
+    (980, 994, "WA"), (995, 999, "AK"),
+)
+SHARED_PREFIXES = {967: {"HI", "AS"}, 969: {"GU", "MP", "MH", "FM", "PW"}}
+# ZIPs delivered across a state line (the ZIP3 says one state, the town is in another)
+CROSS_STATE_ZIPS = {"06390": "NY", "42223": "TN", "73949": "TX", "84536": "AZ", "89439": "CA", "97635": "CA"}
+
+def _build_prefix_table():
+    table = np.zeros(1000, dtype=np.uint8)
+    for first, last, state in ZIP3_RANGES: table[first:last + 1] = STATE_IDS[state]
+    for prefix in SHARED_PREFIXES: table[prefix] = SHARED
+    return table
+
+PREFIX_TABLE = _build_prefix_table()
+
+_lock = threading.Lock()
+_state = {"dir": None, "loaded": False, "table": None, "cities": None}
+
+def _get_secret(key):
+    if secrets_manager: return secrets_manager.get_secret(key)
+    return None
+
+def _directory():
+    return _state["dir"] or _get_secret("zip_index.dir") or DEFAULT_DIR
+
+def configure(directory=None):
+    """Points at another index directory (tests, benchmarks). No directory = back to settings."""
+    with _lock:
+        _state.update({"dir": directory, "loaded": False, "table": None, "cities": None})
+
+def _full_index():
+    """(table, cities) memory-mapped from disk, or (None, None) when no index is installed."""
+    if not _state["loaded"]:
+        with _lock:
+            if not _state["loaded"]:
+                directory = _directory()
+                try:
+                    table = np.load(os.path.join(directory, TABLE_FILE), mmap_mode="r")
+                    with open(os.path.join(directory, CITIES_FILE), encoding="utf-8") as f:
+                        cities = [""] + f.read().splitlines()
+                    _state["table"], _state["cities"] = table, cities
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.error(f"ZIP Index Load Error: {e}")
+                _state["loaded"] = True
+    return _state["table"], _state["cities"]
+
+def has_full_index():
+    return _full_index()[0] is not None
+
+def build_index(csv_path, directory=None):
+    """
+    Compiles a zip,city,state CSV (header names as given; the first row for a
+    ZIP is its primary city) into the on-disk index. Returns (zip_count, error).
+    """
+    directory = directory or _directory()
+    table = np.zeros(100000, dtype=TABLE_DTYPE)
+    city_ids, count = {}, 0
+    try:
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                row = {str(k).strip().lower(): str(v or "").strip() for k, v in row.items()}
+                digits = row.get("zip", "")[:5]
+                state = STATE_IDS.get(state_code(row.get("state")))
+                if not (digits.isdigit() and len(digits) == 5 and state): continue
+                z = int(digits)
+                if table[z]["state"]: continue
+                city = row.get("city", "").upper()
+                table[z] = (city_ids.setdefault(city, len(city_ids) + 1) if city else 0, state)
+                count += 1
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, TABLE_FILE), table)
+        with open(os.path.join(directory, CITIES_FILE), "w", encoding="utf-8") as f:
+            f.write("\n".join(city_ids))
+    except Exception as e:
+        logger.error(f"ZIP Index Build Error: {e}")
+        return 0, str(e)
+    configure(_state["dir"])
+    return count, None
+
+# ==========================================
+# 🔎 LOOKUPS
+# ==========================================
+
+def state_code(value):
+    """Two-letter code for "TX" / "tx" / "Texas" / "N. Carolina"-style input; "" if unknown."""
+    text = " ".join(str(value or "").upper().replace(".", " ").split())
+    if text in STATE_IDS: return text
+    if text in STATE_NAMES: return STATE_NAMES[text]
+    for short, full in (("N ", "NORTH "), ("S ", "SOUTH "), ("W ", "WEST ")):
+        if text.startswith(short) and full + text[len(short):] in STATE_NAMES: return STATE_NAMES[full + text[len(short):]]
+    return ""
+
+def lookup(zip5):
+    """
+    {"zip", "city", "state", "states", "confirmed"} for a 5-digit ZIP ("city"
+    is None without the full index, "state" is None for ZIP3s shared by
+    territories; "states" is every state it may be mailed in; "confirmed" is
+    True when the full index has this ZIP, False for a ZIP3 guess), or None
+    if the ZIP is malformed or unassigned.
+    """
+    z = str(zip5 or "")
+    if not (len(z) == 5 and z.isdigit()): return None
+    table, cities = _full_index()
+    confirmed = table is not None and bool(table[int(z)]["state"])
+    if confirmed:
+        entry = table[int(z)]
+        state, city = STATE_CODES[entry["state"]], cities[entry["city"]] or None
+    else:
+        prefix_id = int(PREFIX_TABLE[int(z[:3])])
+        if not prefix_id: return None
+        state, city = (None, None) if prefix_id == SHARED else (STATE_CODES[prefix_id], None)
+    states = set(SHARED_PREFIXES[int(z[:3])]) if state is None else {state}
+    if z in CROSS_STATE_ZIPS: states.add(CROSS_STATE_ZIPS[z])
+    return {"zip": z, "city": city, "state": state, "states": states, "confirmed": confirmed}
+
+def zip_state_problems(zips, states):
+    """
+    Column version of the lookup() checks for 5-digit ZIP and 2-letter state
+    sequences. Returns (problems, warnings), two arrays of "" / "Unknown ZIP" /
+    "ZIP/State mismatch": problems are confirmed by the full index, warnings
+    are ZIP3-table guesses.
+    """
+    zips = np.asarray(zips, dtype=str)
+    numbers = np.array([int(z) if len(z) == 5 and z.isdigit() else -1 for z in zips], dtype=np.int64)
+    ok = numbers >= 0
+    known = np.zeros(len(numbers), dtype=np.uint8)
+    known[ok] = PREFIX_TABLE[numbers[ok] // 100]
+    table, _ = _full_index()
+    exact = np.zeros(len(numbers), dtype=np.uint8)
+    if table is not None:
+        exact[ok] = np.asarray(table["state"])[numbers[ok]]
+        known = np.where(exact > 0, exact, known)
+    given = np.array([STATE_IDS.get(s, 0) for s in states], dtype=np.uint8)
+
+    problems = np.full(len(numbers), "", dtype=object)
+    mismatch = ok & (known != 0) & (known != SHARED) & (known != given)
+    for i in np.flatnonzero(mismatch):
+        # Rare: ZIPs that legitimately cross a state line
+        if CROSS_STATE_ZIPS.get(zips[i]) == STATE_CODES[given[i]]: mismatch[i] = False
+    problems[mismatch] = "ZIP/State mismatch"
+    problems[ok & (known == 0)] = "Unknown ZIP"
+    # Only the full index can say a ZIP is unassigned or in another state
+    confirmed = (exact > 0) | ((known == 0) & (table is not None))
+    warnings = np.where(confirmed, "", problems)
+    problems[~confirmed] = ""
+    return problems, warnings